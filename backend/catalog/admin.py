@@ -1,8 +1,24 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, ProductPriceHistory, StockMovement
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'sku', 'sale_price', 'stock_quantity', 'updated_at')
     search_fields = ('name', 'sku')
     list_filter = ('updated_at',)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kind', 'quantity', 'sale', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name', 'product__sku')
+    raw_id_fields = ('product', 'sale')
+
+
+@admin.register(ProductPriceHistory)
+class ProductPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('product', 'sale_price_before', 'sale_price_after', 'cost_price_before', 'cost_price_after', 'changed_at', 'reason')
+    list_filter = ('changed_at',)
+    search_fields = ('product__name', 'product__sku', 'batch')
+    raw_id_fields = ('product',)
@@ -0,0 +1,44 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework import filters
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Busca de produtos apoiada nos índices do PostgreSQL (ver migração 0003).
+
+    - SKU exato (ex: leitura de código de barras): busca direta no índice único do SKU;
+    - demais termos: `icontains` em nome, SKU e descrição, atendido pelos índices
+      GIN de trigramas (pg_trgm) sobre UPPER(campo), em vez de varrer a tabela;
+    - sem `?ordering=`, o resultado vem ordenado por relevância: SKUs que começam
+      com o termo primeiro e, depois, a similaridade do nome com a busca.
+
+    Em outros bancos, cai no SearchFilter padrão sobre `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        search = ' '.join(terms)
+        if len(terms) == 1:
+            exact = queryset.filter(sku=search)
+            if exact.exists():
+                return exact
+
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term) | Q(sku__icontains=term) | Q(description__icontains=term)
+            )
+
+        queryset = queryset.annotate(
+            sku_prefix=Case(
+                When(sku__istartswith=search, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity('name', search),
+        )
+        return queryset.order_by('-sku_prefix', '-similarity', 'name', 'id')
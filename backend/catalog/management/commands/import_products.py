@@ -1,72 +1,161 @@
 import csv
 from decimal import Decimal, InvalidOperation
+from itertools import islice
 from django.core.management.base import BaseCommand
-from catalog.models import Product
+from django.db import transaction
+from catalog.models import Product, StockMovement
+from core import counters
+
+# Campos que vêm do CSV; são os únicos atualizados em produtos já existentes
+# (pays_commission, por exemplo, é mantido como está no sistema).
+IMPORTED_FIELDS = ['name', 'description', 'sale_price', 'cost_price', 'stock_quantity']
+
+
+# Função para limpar e converter valores monetários
+def clean_price(price_str):
+    if not price_str:
+        return Decimal('0.00')
+    try:
+        # Remove o ponto de milhar e substitui a vírgula decimal por ponto
+        cleaned_str = price_str.replace('.', '').replace(',', '.')
+        return Decimal(cleaned_str).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return Decimal('0.00')
+
+
+# Função para limpar e converter valores inteiros
+def clean_int(int_str):
+    return int(clean_price(int_str))
+
+
+def parse_row(index, row):
+    """ Converte uma linha do CSV nos campos do produto, ou None se a linha não tem descrição. """
+    name_val = (row.get('Descrição') or '').strip()
+    if not name_val:
+        return None
+
+    # O SKU é único. Se estiver vazio, usamos o ID do CSV ou o número da linha como fallback.
+    sku_val = (row.get('Código') or '').strip()
+    if not sku_val:
+        csv_id = (row.get('ID') or '').strip()
+        if csv_id:
+            sku_val = f'CSV-ID-{csv_id}'
+        else:
+            # Se Código e ID estiverem vazios, o número da linha garante a unicidade.
+            sku_val = f'AUTOGEN-SKU-{index}'
+
+    return {
+        'sku': sku_val,
+        'name': name_val,
+        'description': (row.get('Descrição Complementar') or '').strip() or None,
+        'sale_price': clean_price(row.get('Preço', '0,00')),
+        'cost_price': clean_price(row.get('Preço de custo', '0,00')),
+        'stock_quantity': clean_int(row.get('Estoque', '0')),
+    }
+
 
 class Command(BaseCommand):
-    help = 'Importa produtos de um arquivo CSV para o banco de dados.'
+    help = (
+        'Importa produtos de um arquivo CSV para o banco de dados. Por padrão faz um upsert pelo SKU: '
+        'cria os produtos novos e atualiza os existentes, sem apagar nada (o histórico de vendas é preservado).'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='O caminho para o arquivo CSV a ser importado.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Linhas do CSV por lote/transação.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta o que seria criado/atualizado, sem gravar.')
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Comportamento antigo: apaga todos os produtos antes de importar. Falha se algum produto tiver vendas.',
+        )
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
+        dry_run = kwargs['dry_run']
         self.stdout.write(self.style.SUCCESS(f'Iniciando a importação do arquivo: {csv_file_path}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Simulação (--dry-run): nada será gravado.'))
 
-        # Limpa a tabela de produtos antes de importar para evitar duplicatas
-        Product.objects.all().delete()
-        self.stdout.write(self.style.WARNING('Tabela de produtos existente foi limpa.'))
-
+        totals = {'created': 0, 'updated': 0, 'unchanged': 0}
         try:
             with open(csv_file_path, mode='r', encoding='utf-8') as file:
                 reader = csv.DictReader(file, delimiter=';')
 
-                created_count = 0
-                # Usamos enumerate para ter um índice único para cada linha
-                for index, row in enumerate(reader, start=1):
-                    name_val = row.get('Descrição', '').strip()
-                    if not name_val:
-                        continue
-
-                    # O SKU é único. Se estiver vazio, usamos o ID do CSV ou o número da linha como fallback.
-                    sku_val = row.get('Código', '').strip()
-                    if not sku_val:
-                        csv_id = row.get('ID', '').strip()
-                        if csv_id:
-                            sku_val = f'CSV-ID-{csv_id}'
-                        else:
-                            # Se Código e ID estiverem vazios, o número da linha garante a unicidade.
-                            sku_val = f'AUTOGEN-SKU-{index}'
-
-                    # Função para limpar e converter valores monetários
-                    def clean_price(price_str):
-                        if not price_str:
-                            return Decimal('0.00')
-                        try:
-                            # Remove o ponto de milhar e substitui a vírgula decimal por ponto
-                            cleaned_str = price_str.replace('.', '').replace(',', '.')
-                            return Decimal(cleaned_str)
-                        except InvalidOperation:
-                            return Decimal('0.00')
-
-                    # Função para limpar e converter valores inteiros
-                    def clean_int(int_str):
-                        return int(clean_price(int_str))
-
-                    Product.objects.create(
-                        name=name_val,
-                        sku=sku_val,
-                        description=row.get('Descrição Complementar', '').strip() or None,
-                        sale_price=clean_price(row.get('Preço', '0,00')),
-                        cost_price=clean_price(row.get('Preço de custo', '0,00')),
-                        stock_quantity=clean_int(row.get('Estoque', '0')),
-                    )
-                    created_count += 1
-
-                self.stdout.write(self.style.SUCCESS(f'\nImportação concluída!'))
-                self.stdout.write(f'Total de produtos criados: {created_count}')
+                if kwargs['replace'] and not dry_run:
+                    # Limpa a tabela de produtos antes de importar para evitar duplicatas
+                    Product.objects.all().delete()
+                    self.stdout.write(self.style.WARNING('Tabela de produtos existente foi limpa.'))
 
+                # Usamos enumerate para ter um índice único para cada linha
+                rows = enumerate(reader, start=1)
+                while chunk := list(islice(rows, kwargs['chunk_size'])):
+                    for key, count in self.upsert_chunk(chunk, dry_run).items():
+                        totals[key] += count
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR(f'Arquivo não encontrado: {csv_file_path}'))
+            return
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ocorreu um erro: {e}'))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'Ocorreu um erro: {e}'))
+            return
+        finally:
+            # bulk_create não dispara os sinais que mantêm o total de produtos do dashboard
+            if not dry_run:
+                counters.invalidate(Product)
+
+        self.stdout.write(self.style.SUCCESS(f'\nImportação concluída!'))
+        self.stdout.write(
+            f"Produtos criados: {totals['created']} | atualizados: {totals['updated']} | sem alteração: {totals['unchanged']}"
+        )
+
+    @transaction.atomic
+    def upsert_chunk(self, chunk, dry_run):
+        """
+        Grava um lote com um único INSERT ... ON CONFLICT (sku) DO UPDATE.
+        Os produtos já existentes são lidos antes (uma consulta por lote) para
+        separar os atualizados dos que não mudaram, que nem chegam a ser gravados.
+        """
+        # Um SKU repetido no mesmo lote faria o ON CONFLICT falhar; vale a última linha.
+        parsed = {}
+        for index, row in chunk:
+            data = parse_row(index, row)
+            if data is not None:
+                parsed[data['sku']] = data
+
+        # Bloqueados em ordem de pk: o saldo lido é a base da movimentação de importação
+        existing_rows = Product.objects.filter(sku__in=parsed).values('sku', *IMPORTED_FIELDS)
+        if not dry_run:
+            existing_rows = existing_rows.select_for_update().order_by('pk')
+        existing = {product['sku']: product for product in existing_rows}
+
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+        to_write = []
+        for sku, data in parsed.items():
+            current = existing.get(sku)
+            if current is None:
+                counts['created'] += 1
+            elif any(current[field] != data[field] for field in IMPORTED_FIELDS):
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+            to_write.append(Product(**data))
+
+        if to_write and not dry_run:
+            written = Product.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=IMPORTED_FIELDS + ['updated_at'],
+            )
+            # O saldo do arquivo substitui o anterior; o livro de estoque registra a diferença
+            movements = []
+            for product in written:
+                previous = existing[product.sku]['stock_quantity'] if product.sku in existing else 0
+                if product.stock_quantity != previous:
+                    movements.append(StockMovement(
+                        product_id=product.pk,
+                        quantity=product.stock_quantity - previous,
+                        kind=StockMovement.MovementKind.IMPORT,
+                    ))
+            StockMovement.objects.bulk_create(movements)
+        return counts
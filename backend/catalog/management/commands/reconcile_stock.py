@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from catalog.models import Product, StockMovement
+
+# Saldo de cada produto segundo o livro de estoque (0 para produtos sem movimentação)
+LEDGER_SQL = """
+SELECT p.id, p.sku, p.stock_quantity, COALESCE(SUM(m.quantity), 0) AS ledger
+FROM {product} p
+LEFT JOIN {movement} m ON m.product_id = p.id
+GROUP BY p.id
+HAVING p.stock_quantity <> COALESCE(SUM(m.quantity), 0)
+ORDER BY p.id
+"""
+
+REBUILD_SQL = """
+UPDATE {product} p
+SET stock_quantity = COALESCE(l.total, 0), updated_at = NOW()
+FROM {product} x
+LEFT JOIN (SELECT product_id, SUM(quantity) AS total FROM {movement} GROUP BY product_id) l ON l.product_id = x.id
+WHERE p.id = x.id AND p.stock_quantity <> COALESCE(l.total, 0)
+"""
+
+
+class Command(BaseCommand):
+    help = 'Confere os saldos de estoque com o livro de movimentações e recalcula os divergentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista as divergências, sem corrigir.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        tables = {'product': Product._meta.db_table, 'movement': StockMovement._meta.db_table}
+        with connection.cursor() as cursor:
+            # Impede alterações de saldo e novas movimentações durante a conferência
+            # (leituras continuam liberadas). Mesma ordem dos escritores: produto, depois livro.
+            cursor.execute(f"LOCK TABLE {tables['product']} IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(f"LOCK TABLE {tables['movement']} IN SHARE MODE")
+            cursor.execute(LEDGER_SQL.format(**tables))
+            divergent = cursor.fetchall()
+
+            if not divergent:
+                self.stdout.write(self.style.SUCCESS('Todos os saldos conferem com o livro de estoque.'))
+                return
+
+            for product_id, sku, stock, ledger in divergent[:20]:
+                self.stdout.write(f'  {sku} (#{product_id}): saldo {stock}, livro {ledger}')
+            if len(divergent) > 20:
+                self.stdout.write(f'  ... e mais {len(divergent) - 20} produtos')
+
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f'{len(divergent)} produtos com saldo divergente (nada foi alterado).'))
+                return
+
+            cursor.execute(REBUILD_SQL.format(**tables))
+            self.stdout.write(self.style.SUCCESS(f'{cursor.rowcount} saldos recalculados a partir do livro de estoque.'))
@@ -0,0 +1,50 @@
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Reajusta em massa os preços dos produtos (percentual ou valor fixo), em um único UPDATE, '
+        'registrando os preços anteriores no histórico de preços.'
+    )
+
+    def add_arguments(self, parser):
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument('--percent', type=str, help='Reajuste percentual, ex: 7,5 ou -10.')
+        change.add_argument('--amount', type=str, help='Valor somado ao preço, ex: 2,50 ou -1.')
+        parser.add_argument('--target', choices=list(Product.REPRICE_TARGETS), default='sale_price', help='Preço reajustado.')
+        parser.add_argument('--rounding', choices=list(Product.REPRICE_ROUNDINGS), default='cent', help='Arredondamento do novo preço.')
+        parser.add_argument('--sku-prefix', type=str, help='Apenas produtos cujo SKU começa com este prefixo.')
+        parser.add_argument('--ids', type=str, help='Apenas os produtos informados, separados por vírgula.')
+        parser.add_argument('--all', action='store_true', help='Confirma o reajuste de todos os produtos (sem filtro).')
+        parser.add_argument('--reason', type=str, default='', help='Motivo gravado no histórico.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa quantos produtos seriam reajustados.')
+
+    def handle(self, *args, **options):
+        change, raw_value = ('percent', options['percent']) if options['percent'] is not None else ('absolute', options['amount'])
+        try:
+            value = Decimal(raw_value.replace(',', '.'))
+        except InvalidOperation:
+            raise CommandError(f'Valor inválido: {raw_value}')
+
+        queryset = Product.objects.all()
+        if options['ids']:
+            try:
+                ids = [int(pk) for pk in options['ids'].split(',') if pk.strip()]
+            except ValueError:
+                raise CommandError(f"IDs inválidos: {options['ids']}")
+            queryset = queryset.filter(pk__in=ids)
+        if options['sku_prefix']:
+            queryset = queryset.filter(sku__startswith=options['sku_prefix'])
+        if not (options['ids'] or options['sku_prefix'] or options['all']):
+            raise CommandError('Informe --ids, --sku-prefix ou confirme com --all.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{queryset.count()} produtos seriam reajustados (nada foi alterado).'))
+            return
+
+        batch, updated = Product.reprice(
+            queryset, change, value, target=options['target'], rounding=options['rounding'], reason=options['reason'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{updated} produtos reajustados (lote {batch}).'))
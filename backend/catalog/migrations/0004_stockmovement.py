@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def open_ledger(apps, schema_editor):
+    """
+    Abre o livro de estoque a partir dos saldos atuais. As vendas já concluídas
+    entram como saídas e o saldo inicial é calculado para que a soma do livro
+    seja igual ao saldo atual; assim, estornar ou editar uma venda antiga
+    movimenta apenas a diferença.
+    """
+    Product = apps.get_model('catalog', 'Product')
+    SaleItem = apps.get_model('sales', 'SaleItem')
+    StockMovement = apps.get_model('catalog', 'StockMovement')
+
+    sold = (
+        SaleItem.objects
+        .filter(sale__status='COMPLETED')
+        .order_by()
+        .values_list('sale_id', 'product_id', 'sale__completed_at')
+        .annotate(total=Sum('quantity'))
+    )
+    sold_by_product = {}
+    movements = []
+    for sale_id, product_id, completed_at, quantity in sold:
+        sold_by_product[product_id] = sold_by_product.get(product_id, 0) + quantity
+        movements.append(StockMovement(
+            product_id=product_id, sale_id=sale_id, kind='SALE', quantity=-quantity,
+            created_at=completed_at or django.utils.timezone.now(),
+        ))
+
+    for product_id, stock, created_at in Product.objects.values_list('pk', 'stock_quantity', 'created_at').iterator():
+        opening = stock + sold_by_product.get(product_id, 0)
+        if opening:
+            movements.append(StockMovement(product_id=product_id, kind='OPENING', quantity=opening, created_at=created_at))
+
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_search_indexes'),
+        ('sales', '0007_sale_legacy_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('OPENING', 'Saldo Inicial'), ('ADJUSTMENT', 'Ajuste'), ('IMPORT', 'Importação'), ('SALE', 'Venda'), ('SALE_REVERSAL', 'Estorno de Venda')], max_length=15, verbose_name='Tipo')),
+                ('quantity', models.IntegerField(verbose_name='Quantidade')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='catalog.product', verbose_name='Produto')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='sales.sale', verbose_name='Venda')),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
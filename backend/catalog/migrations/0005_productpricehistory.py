@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.UUIDField(db_index=True, verbose_name='Lote')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='Motivo')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Alterado em')),
+                ('sale_price_before', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Venda Anterior')),
+                ('sale_price_after', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Venda Novo')),
+                ('cost_price_before', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Custo Anterior')),
+                ('cost_price_after', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Custo Novo')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='catalog.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Preço',
+                'verbose_name_plural': 'Históricos de Preço',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['product', 'changed_at'], name='price_history_product_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+import uuid
+from collections import defaultdict
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 class Product(models.Model):
     name = models.CharField(max_length=255, verbose_name="Nome")
@@ -14,7 +20,215 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Saldo no momento da leitura; ver save()
+        instance._loaded_stock = instance.__dict__.get('stock_quantity')
+        return instance
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        """
+        O saldo é mantido pelo livro de estoque (StockMovement). Alterar o saldo
+        manualmente gera um ajuste com a diferença para o valor gravado. Se o
+        saldo não foi alterado, prevalece o do banco, para que salvar um produto
+        lido antes de uma venda concorrente não desfaça a baixa feita por ela.
+        """
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            if self.stock_quantity:
+                StockMovement.objects.create(
+                    product=self, quantity=self.stock_quantity, kind=StockMovement.MovementKind.OPENING,
+                )
+            self._loaded_stock = self.stock_quantity
+            return
+
+        current = Product.objects.select_for_update().filter(pk=self.pk).values_list('stock_quantity', flat=True).first()
+        update_fields = kwargs.get('update_fields')
+        writes_stock = current is not None and (update_fields is None or 'stock_quantity' in update_fields)
+        if writes_stock and self.stock_quantity == getattr(self, '_loaded_stock', current):
+            self.stock_quantity = current
+
+        super().save(*args, **kwargs)
+
+        if writes_stock and self.stock_quantity != current:
+            StockMovement.objects.create(
+                product=self, quantity=self.stock_quantity - current, kind=StockMovement.MovementKind.ADJUSTMENT,
+            )
+        self._loaded_stock = self.stock_quantity
+
+    # Reajuste de preços: tipos de alteração e regras de arredondamento (ver reprice)
+    REPRICE_CHANGES = {
+        'percent': '{column} * (1 + %s / 100.0)',
+        'absolute': '{column} + %s',
+    }
+    REPRICE_ROUNDINGS = {
+        'cent': 'ROUND({value}, 2)',
+        'unit': 'ROUND({value}, 0)',
+        # Preço "quebrado": sobe até o próximo ,90 (12,34 -> 12,90)
+        'ninety': 'CEIL({value} - 0.90) + 0.90',
+    }
+    REPRICE_TARGETS = {
+        'sale_price': ['sale_price'],
+        'cost_price': ['cost_price'],
+        'both': ['sale_price', 'cost_price'],
+    }
+
+    @classmethod
+    def reprice(cls, queryset, change, value, target='sale_price', rounding='cent', reason=''):
+        """
+        Reajusta os preços dos produtos de `queryset` com um único UPDATE e grava
+        os preços anteriores em ProductPriceHistory no mesmo comando (CTE), sem
+        trazer os produtos para o Python. Produtos cujo preço não muda não são
+        tocados. Retorna (lote, quantidade de produtos alterados).
+        """
+        assignments, changed = [], []
+        for column in cls.REPRICE_TARGETS[target]:
+            new_price = 'GREATEST({}, 0)'.format(cls.REPRICE_ROUNDINGS[rounding].format(
+                value=cls.REPRICE_CHANGES[change].format(column=f'p.{column}'),
+            ))
+            assignments.append(f'{column} = {new_price}')
+            changed.append(f'{new_price} <> p.{column}')
+
+        ids_sql, ids_params = queryset.order_by().values('pk').query.sql_with_params()
+        sql = REPRICE_SQL.format(
+            product=cls._meta.db_table,
+            history=ProductPriceHistory._meta.db_table,
+            assignments=', '.join(assignments),
+            ids=ids_sql,
+            changed=' OR '.join(changed),
+        )
+        batch = uuid.uuid4()
+        # Parâmetros na ordem em que aparecem no SQL: SET, subconsulta, WHERE e histórico
+        params = [value] * len(assignments) + list(ids_params) + [value] * len(changed) + [batch, reason]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return batch, cursor.rowcount
+
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
-        ordering = ['name']
\ No newline at end of file
+        ordering = ['name']
+        # Índices de trigramas (pg_trgm) para a busca com icontains, que o Django
+        # gera como UPPER(campo) LIKE UPPER('%termo%'). Ver catalog.filters.
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_trgm'),
+            GinIndex(OpClass(Upper('sku'), name='gin_trgm_ops'), name='product_sku_trgm'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='product_description_trgm'),
+        ]
+
+
+# Reajuste em massa (Product.reprice): os preços antigos são lidos com FOR UPDATE
+# antes do UPDATE e gravados no histórico, tudo em um único comando.
+REPRICE_SQL = """
+WITH updated AS (
+    UPDATE {product} p
+    SET {assignments}, updated_at = NOW()
+    FROM (
+        SELECT id, sale_price, cost_price FROM {product}
+        WHERE id IN ({ids})
+        FOR UPDATE
+    ) old
+    WHERE p.id = old.id AND ({changed})
+    RETURNING p.id, old.sale_price AS old_sale_price, p.sale_price, old.cost_price AS old_cost_price, p.cost_price
+)
+INSERT INTO {history} (
+    product_id, batch, reason, changed_at,
+    sale_price_before, sale_price_after, cost_price_before, cost_price_after
+)
+SELECT id, %s, %s, NOW(), old_sale_price, sale_price, old_cost_price, cost_price
+FROM updated
+"""
+
+
+class ProductPriceHistory(models.Model):
+    """
+    Histórico de preços: uma linha por produto a cada reajuste (ver Product.reprice).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history', verbose_name="Produto")
+    # Identifica o reajuste em massa que gerou a alteração
+    batch = models.UUIDField(db_index=True, verbose_name="Lote")
+    reason = models.CharField(max_length=255, blank=True, verbose_name="Motivo")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Alterado em")
+    sale_price_before = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Preço de Venda Anterior")
+    sale_price_after = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Preço de Venda Novo")
+    cost_price_before = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Preço de Custo Anterior")
+    cost_price_after = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Preço de Custo Novo")
+
+    def __str__(self):
+        return f"{self.product_id}: {self.sale_price_before} -> {self.sale_price_after}"
+
+    class Meta:
+        verbose_name = "Histórico de Preço"
+        verbose_name_plural = "Históricos de Preço"
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['product', 'changed_at'], name='price_history_product_idx'),
+        ]
+
+
+class StockMovement(models.Model):
+    """
+    Livro de estoque: cada entrada (quantidade positiva) ou saída (negativa) de
+    um produto. O saldo em Product.stock_quantity é a soma das movimentações
+    (ver o comando reconcile_stock).
+    """
+    class MovementKind(models.TextChoices):
+        OPENING = 'OPENING', 'Saldo Inicial'
+        ADJUSTMENT = 'ADJUSTMENT', 'Ajuste'
+        IMPORT = 'IMPORT', 'Importação'
+        SALE = 'SALE', 'Venda'
+        SALE_REVERSAL = 'SALE_REVERSAL', 'Estorno de Venda'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements', verbose_name="Produto")
+    kind = models.CharField(max_length=15, choices=MovementKind.choices, verbose_name="Tipo")
+    quantity = models.IntegerField(verbose_name="Quantidade")
+    sale = models.ForeignKey(
+        'sales.Sale', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='stock_movements', verbose_name="Venda",
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Data")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} de {self.quantity} ({self.product_id})"
+
+    class Meta:
+        verbose_name = "Movimentação de Estoque"
+        verbose_name_plural = "Movimentações de Estoque"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+        ]
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, movements):
+        """
+        Grava as movimentações e atualiza os saldos com um único
+        UPDATE ... SET stock_quantity = stock_quantity + CASE ... (F()), sem
+        ler o saldo no Python. Antes, os produtos são bloqueados em ordem de pk,
+        para que lotes concorrentes travem as linhas sempre na mesma ordem.
+        """
+        movements = [movement for movement in movements if movement.quantity]
+        deltas = defaultdict(int)
+        for movement in movements:
+            deltas[movement.product_id] += movement.quantity
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+
+        if deltas:
+            list(
+                Product.objects.select_for_update()
+                .filter(pk__in=list(deltas))
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            # updated_at também muda: é a versão usada no GET condicional (core.conditional)
+            Product.objects.filter(pk__in=list(deltas)).update(
+                updated_at=timezone.now(),
+                stock_quantity=F('stock_quantity') + Case(
+                    *[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+                    default=Value(0),
+                )
+            )
+        return cls.objects.bulk_create(movements)
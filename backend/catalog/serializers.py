@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetMixin
 from .models import Product
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
@@ -17,3 +18,26 @@ class ProductSerializer(serializers.ModelSerializer):
             'created_at', 
             'updated_at'
         ]
+
+
+class ProductRepriceSerializer(serializers.Serializer):
+    """
+    Parâmetros do reajuste em massa (ver Product.reprice). Os produtos são os
+    da listagem filtrada (?search=) restritos por `ids` e/ou `sku_prefix`;
+    sem nenhum filtro, é preciso confirmar com `all`.
+    """
+    change = serializers.ChoiceField(choices=list(Product.REPRICE_CHANGES))
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+    target = serializers.ChoiceField(choices=list(Product.REPRICE_TARGETS), default='sale_price')
+    rounding = serializers.ChoiceField(choices=list(Product.REPRICE_ROUNDINGS), default='cent')
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    sku_prefix = serializers.CharField(max_length=100, required=False)
+    all = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        has_filter = 'ids' in attrs or 'sku_prefix' in attrs or self.context.get('has_search')
+        if not has_filter and not attrs['all']:
+            raise serializers.ValidationError('Informe os produtos (ids, sku_prefix ou ?search=) ou confirme com "all".')
+        return attrs
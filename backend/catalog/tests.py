@@ -1,8 +1,19 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
-from .models import Product
+from customers.models import Customer
+from sales.models import Sale, SaleItem
+from .models import Product, ProductPriceHistory, StockMovement
 
 
 class ProductAPITests(APITestCase):
@@ -79,3 +90,219 @@ class ProductAPITests(APITestCase):
         response = self.client.delete(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Product.objects.count(), 1)
+
+
+class ImportProductsCommandTests(APITestCase):
+    """
+    Testes para o comando import_products (upsert pelo SKU).
+    """
+
+    CSV_CONTENT = (
+        'ID;Código;Descrição;Descrição Complementar;Preço;Preço de custo;Estoque\n'
+        '1;LP-001;Laptop Pro;;5.600,00;4.000,00;8\n'
+        '2;MG-002;Mouse Gamer;;250,00;0,00;50\n'
+        '3;;Teclado;Mecânico;350,90;200,00;5\n'
+    )
+
+    def setUp(self):
+        self.laptop = Product.objects.create(name='Laptop Pro', sku='LP-001', sale_price=Decimal('5500.00'), stock_quantity=10)
+        Product.objects.create(name='Mouse Gamer', sku='MG-002', sale_price=Decimal('250.00'), stock_quantity=50)
+        # Produto com venda: o PROTECT impediria apagar a tabela
+        sale = Sale.objects.create(customer=Customer.objects.create(name='Cliente', person_type='F'), total_amount=Decimal('5500.00'))
+        SaleItem.objects.create(sale=sale, product=self.laptop, quantity=1, unit_price=Decimal('5500.00'))
+
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write(self.CSV_CONTENT)
+        self.addCleanup(os.remove, self.path)
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_products', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_upsert_creates_and_updates_by_sku(self):
+        """
+        Garante que produtos existentes são atualizados no lugar (mantendo o id e as vendas) e os novos, criados.
+        """
+        output = self.run_import('--chunk-size', '2')
+
+        self.assertIn('Produtos criados: 1 | atualizados: 1 | sem alteração: 1', output)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.sale_price, Decimal('5600.00'))
+        self.assertEqual(self.laptop.stock_quantity, 8)
+        self.assertEqual(self.laptop.saleitem_set.count(), 1)
+        self.assertEqual(Product.objects.get(sku='CSV-ID-3').description, 'Mecânico')
+
+    def test_dry_run_writes_nothing(self):
+        """
+        Garante que a simulação apenas conta as alterações.
+        """
+        output = self.run_import('--dry-run')
+
+        self.assertIn('Produtos criados: 1 | atualizados: 1 | sem alteração: 1', output)
+        self.assertEqual(Product.objects.count(), 2)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.sale_price, Decimal('5500.00'))
+
+
+class ProductSearchTests(APITestCase):
+    """
+    Testes para a busca de produtos (índices de trigramas e SKU).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('product-list')
+
+        Product.objects.create(name='Cabo HDMI 2 metros', sku='CB-HDMI-2', sale_price=Decimal('30.00'))
+        Product.objects.create(name='Adaptador HDMI para VGA', sku='AD-001', sale_price=Decimal('45.00'))
+        Product.objects.create(name='Mouse sem fio', sku='MS-100', sale_price=Decimal('80.00'), description='Receptor USB nano')
+        Product.objects.create(name='Mouse com fio', sku='MS-1001', sale_price=Decimal('40.00'))
+
+    def search(self, term):
+        response = self.client.get(self.url, {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['sku'] for product in response.data['results']]
+
+    def test_exact_sku_returns_only_that_product(self):
+        self.assertEqual(self.search('MS-100'), ['MS-100'])
+
+    def test_sku_prefix_comes_first(self):
+        Product.objects.create(name='Capa MS-10 (acessório)', sku='CP-010', sale_price=Decimal('10.00'))
+        self.assertEqual(set(self.search('MS-10')[:2]), {'MS-100', 'MS-1001'})
+
+    def test_search_is_case_insensitive_and_matches_every_word(self):
+        self.assertEqual(set(self.search('hdmi')), {'CB-HDMI-2', 'AD-001'})
+        self.assertEqual(self.search('cabo hdmi'), ['CB-HDMI-2'])
+
+    def test_results_are_ranked_by_similarity(self):
+        Product.objects.create(name='Capa para teclado com iluminação', sku='CP-001', sale_price=Decimal('60.00'))
+        Product.objects.create(name='Teclado', sku='TC-001', sale_price=Decimal('90.00'))
+        self.assertEqual(self.search('teclado'), ['TC-001', 'CP-001'])
+
+    def test_description_is_searchable(self):
+        self.assertEqual(self.search('nano'), ['MS-100'])
+
+    def test_explicit_ordering_wins(self):
+        response = self.client.get(self.url, {'search': 'mouse', 'ordering': 'sale_price'})
+        self.assertEqual([product['sku'] for product in response.data['results']], ['MS-1001', 'MS-100'])
+
+
+class ProductRepriceTests(APITestCase):
+    """
+    Testes para o reajuste de preços em massa.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('product-reprice')
+
+        self.cable = Product.objects.create(name='Cabo', sku='FORN-001', sale_price=Decimal('10.00'), cost_price=Decimal('5.00'))
+        self.plug = Product.objects.create(name='Plugue', sku='FORN-002', sale_price=Decimal('12.34'), cost_price=Decimal('6.00'))
+        self.other = Product.objects.create(name='Outro', sku='OUT-001', sale_price=Decimal('50.00'))
+
+    def prices(self):
+        return dict(Product.objects.values_list('sku', 'sale_price'))
+
+    def test_percent_reprice_with_history(self):
+        """
+        Garante que o reajuste atinge só os produtos filtrados e grava os preços anteriores.
+        """
+        response = self.client.post(self.url, {'change': 'percent', 'value': '10', 'sku_prefix': 'FORN-', 'reason': 'Tabela nova'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.prices(), {'FORN-001': Decimal('11.00'), 'FORN-002': Decimal('13.57'), 'OUT-001': Decimal('50.00')})
+        history = ProductPriceHistory.objects.get(product=self.plug)
+        self.assertEqual((history.sale_price_before, history.sale_price_after), (Decimal('12.34'), Decimal('13.57')))
+        self.assertEqual((history.cost_price_before, history.cost_price_after), (Decimal('6.00'), Decimal('6.00')))
+        self.assertEqual(history.batch, response.data['batch'])
+
+    def test_absolute_reprice_with_rounding_and_search(self):
+        """
+        Garante que o valor fixo, o arredondamento e o filtro da listagem (?search=) são aplicados.
+        """
+        response = self.client.post(f'{self.url}?search=plugue', {'change': 'absolute', 'value': '1.00', 'rounding': 'ninety', 'target': 'both'}, format='json')
+
+        self.assertEqual(response.data['updated'], 1)
+        self.plug.refresh_from_db()
+        self.assertEqual((self.plug.sale_price, self.plug.cost_price), (Decimal('13.90'), Decimal('7.90')))
+
+    def test_reprice_requires_a_filter_and_supports_dry_run(self):
+        response = self.client.post(self.url, {'change': 'percent', 'value': '5'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {'change': 'percent', 'value': '5', 'all': True, 'dry_run': True}, format='json')
+        self.assertEqual(response.data, {'matched': 3})
+        self.assertEqual(self.prices()['OUT-001'], Decimal('50.00'))
+        self.assertFalse(ProductPriceHistory.objects.exists())
+
+    def test_reprice_command(self):
+        out = StringIO()
+        call_command('reprice_products', '--percent', '-50', '--ids', f'{self.other.pk}', stdout=out)
+
+        self.assertIn('1 produtos reajustados', out.getvalue())
+        self.assertEqual(self.prices()['OUT-001'], Decimal('25.00'))
+
+    def test_reprice_command_rejects_invalid_ids(self):
+        """
+        Garante que IDs inválidos em --ids param o comando com uma mensagem, sem reajustar nada.
+        """
+        with self.assertRaisesMessage(CommandError, 'IDs inválidos: 1,a'):
+            call_command('reprice_products', '--percent', '10', '--ids', '1,a', stdout=StringIO())
+        self.assertFalse(ProductPriceHistory.objects.exists())
+
+
+class ProductConditionalGetTests(APITestCase):
+    """
+    Testes para o GET condicional (ETag) da listagem e do detalhe de produtos.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name='Laptop Pro', sku='LP-001', sale_price=Decimal('5500.00'), stock_quantity=10)
+        self.list_url = reverse('product-list')
+        self.detail_url = reverse('product-detail', kwargs={'pk': self.product.pk})
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_list_and_detail_return_304(self):
+        for url in (self.list_url, self.detail_url):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            self.assertIn('no-cache', first['Cache-Control'])
+
+            with CaptureQueriesContext(connection) as queries:
+                second = self.revalidate(url, first)
+
+            self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(second.content, b'')
+            self.assertEqual(len(queries), 1)
+
+    def test_changes_invalidate_the_etag(self):
+        """
+        Garante que edição, baixa de estoque (UPDATE com F()) e exclusão mudam a versão.
+        """
+        other = Product.objects.create(name='Mouse', sku='MS-001', sale_price=Decimal('50.00'))
+        first = self.client.get(self.list_url)
+
+        self.client.patch(self.detail_url, {'sale_price': '5000.00'}, format='json')
+        second = self.revalidate(self.list_url, first)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+
+        detail = self.client.get(self.detail_url)
+        StockMovement.apply([StockMovement(product_id=self.product.pk, quantity=-1, kind=StockMovement.MovementKind.SALE)])
+        self.assertEqual(self.revalidate(self.detail_url, detail).status_code, status.HTTP_200_OK)
+
+        other.delete()
+        self.assertEqual(self.revalidate(self.list_url, second).status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query_string(self):
+        first = self.client.get(self.list_url)
+        response = self.client.get(self.list_url, {'search': 'mouse'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
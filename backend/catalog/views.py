@@ -1,16 +1,59 @@
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .filters import ProductSearchFilter
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductRepriceSerializer, ProductSerializer
+from core.conditional import ConditionalGetMixin
+from core.fieldsets import SparseFieldsetViewMixin
+from core.pagination import OptionalKeysetPagination
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint que permite que os produtos sejam visualizados ou editados.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'sku']
-    ordering_fields = ['name', 'sale_price', 'stock_quantity']
\ No newline at end of file
+    filter_backends = [ProductSearchFilter, filters.OrderingFilter]
+    search_fields = ['name', 'sku', 'description']
+    ordering_fields = ['name', 'sale_price', 'stock_quantity']
+
+    def get_serializer_class(self):
+        if self.action == 'reprice':
+            return ProductRepriceSerializer
+        return ProductSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['has_search'] = bool(self.request.query_params.get(ProductSearchFilter.search_param))
+        return context
+
+    @action(detail=False, methods=['post'])
+    def reprice(self, request):
+        """
+        Reajusta de uma vez os preços de um conjunto de produtos (ex: tabela nova
+        do fornecedor), em um único UPDATE, registrando os preços anteriores no
+        histórico. Com `dry_run`, apenas informa quantos produtos seriam afetados.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'ids' in params:
+            queryset = queryset.filter(pk__in=params['ids'])
+        if 'sku_prefix' in params:
+            queryset = queryset.filter(sku__startswith=params['sku_prefix'])
+
+        if params['dry_run']:
+            return Response({'matched': queryset.count()})
+
+        batch, updated = Product.reprice(
+            queryset, params['change'], params['value'],
+            target=params['target'], rounding=params['rounding'], reason=params['reason'],
+        )
+        return Response({'batch': batch, 'updated': updated})
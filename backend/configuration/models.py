@@ -7,6 +7,8 @@ class CompanySettings(models.Model):
         default=6.00,
         verbose_name="Alíquota Padrão de Imposto (%)"
     )
+    # Usado no GET condicional das configurações (ETag / Last-Modified)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
 
     def save(self, *args, **kwargs):
         # Garante que haverá apenas uma instância deste modelo
@@ -1,6 +1,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated # Importar
+from core.conditional import make_etag, not_modified, set_validators
 from .models import CompanySettings
 from .serializers import CompanySettingsSerializer
 
@@ -13,8 +14,13 @@ class CompanySettingsView(APIView):
 
     def get(self, request):
         settings = CompanySettings.load()
+        # GET condicional: sem alteração desde a última leitura, responde 304
+        etag = make_etag(request, settings.updated_at.isoformat())
+        response = not_modified(request, etag, settings.updated_at)
+        if response is not None:
+            return response
         serializer = CompanySettingsSerializer(settings)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, settings.updated_at)
 
     def patch(self, request):
         settings = CompanySettings.load()
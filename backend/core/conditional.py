@@ -0,0 +1,78 @@
+"""
+GET condicional (ETag / Last-Modified) para leituras que mudam pouco.
+
+O cliente guarda a resposta e, nas próximas vezes, envia If-None-Match; se
+nada mudou, a resposta é um 304 vazio, sem consultar as linhas nem serializar.
+Com `Cache-Control: private, no-cache` o navegador revalida toda vez, então
+o frontend não precisa fazer nada além do que o próprio navegador já faz.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(request, *parts):
+    """
+    ETag da representação: muda com os `parts` (versão dos dados), com a URL
+    (filtros, página) e com o formato da resposta (JSON ou API navegável).
+    """
+    key = '|'.join(str(part) for part in (request.get_full_path(), request.accepted_media_type, *parts))
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified=None):
+    """ Retorna um 304 se o cliente já tem esta versão; senão, None. """
+    return get_conditional_response(
+        request._request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional para viewsets de modelos com `updated_at`.
+
+    - listagem: a versão é MAX(updated_at) + COUNT(*) do queryset filtrado (a
+      contagem percebe exclusões). Sem Last-Modified, pois a precisão de segundos
+      do cabeçalho e as exclusões não mudariam a data;
+    - detalhe: a versão é o `updated_at` do registro.
+
+    Alterações feitas com queryset.update() devem atualizar `updated_at`.
+    """
+    conditional_field = 'updated_at'
+
+    def use_conditional_get(self, request):
+        """ Sobrescreva para desligar quando a resposta depende de outras tabelas. """
+        return True
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_conditional_get(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        version = queryset.aggregate(last=Max(self.conditional_field), count=Count('pk'))
+        etag = make_etag(request, version['last'], version['count'])
+        return not_modified(request, etag) or set_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_conditional_get(request):
+            return super().retrieve(request, *args, **kwargs)
+        instance = self.get_object()
+        last_modified = getattr(instance, self.conditional_field)
+        etag = make_etag(request, instance.pk, last_modified.isoformat())
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = set_validators(Response(self.get_serializer(instance).data), etag, last_modified)
+        return response
@@ -0,0 +1,84 @@
+"""
+Contadores de registros em cache, usados no dashboard no lugar de COUNT(*).
+
+O total de cada modelo fica no cache e é incrementado/decrementado pelos sinais
+post_save/post_delete (ver `track`). Para tabelas muito grandes, em vez do
+COUNT(*) exato é usada a estimativa do PostgreSQL (pg_class.reltuples).
+Carga em massa que não dispara sinais (bulk_create, COPY) deve chamar `invalidate`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+# Tempo de vida dos contadores; limita a divergência entre processos e
+# alterações que não passam pelos sinais.
+COUNTERS_TIMEOUT = getattr(settings, 'COUNTERS_TIMEOUT', 300)
+# A partir deste número estimado de linhas, o total passa a ser a estimativa do banco.
+COUNTERS_ESTIMATE_THRESHOLD = getattr(settings, 'COUNTERS_ESTIMATE_THRESHOLD', 1_000_000)
+
+
+def _key(model, kind):
+    return f'counters:{kind}:{model._meta.label_lower}'
+
+
+def get_count(model):
+    """
+    Retorna uma tupla (total, exato). `exato` é False quando o total é a estimativa do banco.
+    """
+    exact = cache.get(_key(model, 'exact'))
+    if exact is not None:
+        return exact, True
+    estimated = cache.get(_key(model, 'estimated'))
+    if estimated is not None:
+        return estimated, False
+
+    estimated = _estimate(model)
+    if estimated is not None and estimated >= COUNTERS_ESTIMATE_THRESHOLD:
+        cache.set(_key(model, 'estimated'), estimated, COUNTERS_TIMEOUT)
+        return estimated, False
+
+    exact = model._default_manager.count()
+    cache.set(_key(model, 'exact'), exact, COUNTERS_TIMEOUT)
+    return exact, True
+
+
+def invalidate(model):
+    cache.delete_many([_key(model, 'exact'), _key(model, 'estimated')])
+
+
+def _estimate(model):
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples = -1 enquanto a tabela nunca foi analisada (VACUUM/ANALYZE)
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def _increment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Só após o commit, para um rollback não deixar o contador adiantado
+        transaction.on_commit(lambda: _add(sender, 1))
+
+
+def _decrement(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _add(sender, -1))
+
+
+def _add(model, delta):
+    try:
+        cache.incr(_key(model, 'exact'), delta)
+    except ValueError:
+        # Contador fora do cache: será recalculado na próxima leitura
+        pass
+
+
+def track(*models):
+    """ Liga os sinais que mantêm os contadores dos modelos informados. """
+    for model in models:
+        post_save.connect(_increment, sender=model, dispatch_uid=f'counters-save-{model._meta.label_lower}')
+        post_delete.connect(_decrement, sender=model, dispatch_uid=f'counters-delete-{model._meta.label_lower}')
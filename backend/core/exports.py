@@ -0,0 +1,84 @@
+import csv
+import datetime
+import decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+
+
+class Echo:
+    """ "Arquivo" que só devolve o que recebe, para o csv.writer gerar as linhas sob demanda. """
+
+    def write(self, value):
+        return value
+
+
+class CSVExportMixin:
+    """
+    Adiciona ao viewset a ação `export/`, que gera um CSV de toda a lista
+    respeitando os filtros do viewset (busca e ordenação).
+
+    As linhas são lidas com `values_list().iterator()` — no PostgreSQL, um cursor
+    no servidor — e escritas direto na resposta, então o uso de memória não
+    depende da quantidade de linhas e o cabeçalho sai antes do fim da consulta.
+
+    `export_fields` é uma lista de (cabeçalho, campo), em que o campo é um
+    caminho do ORM ('customer__name') ou uma expressão (Concat(...)).
+    """
+    export_fields = []
+    export_filename = 'export'
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+
+        columns, expressions = [], {}
+        for index, (_, field) in enumerate(self.export_fields):
+            if isinstance(field, str):
+                columns.append(field)
+            else:
+                alias = f'export_{index}'
+                expressions[alias] = field
+                columns.append(alias)
+        rows = queryset.annotate(**expressions).values_list(*columns).iterator(chunk_size=self.export_chunk_size)
+
+        response = StreamingHttpResponse(self.stream_csv(rows, queryset.model), content_type='text/csv; charset=utf-8')
+        filename = f"{self.export_filename}_{timezone.localdate():%Y-%m-%d}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def stream_csv(self, rows, model):
+        writer = csv.writer(Echo(), delimiter=';')
+        choices = [self.choices_for(model, field) for _, field in self.export_fields]
+        # BOM para o Excel reconhecer o UTF-8 (acentos)
+        yield '\ufeff' + writer.writerow([header for header, _ in self.export_fields])
+        for row in rows:
+            yield writer.writerow([
+                self.format_value(labels.get(value, value) if labels else value)
+                for value, labels in zip(row, choices)
+            ])
+
+    @staticmethod
+    def choices_for(model, field):
+        """ Rótulos das opções (ex: 'PENDING' -> 'Pendente') para campos diretos com choices. """
+        if not isinstance(field, str) or '__' in field:
+            return None
+        model_field = model._meta.get_field(field)
+        return dict(model_field.flatchoices) if model_field.choices else None
+
+    @staticmethod
+    def format_value(value):
+        # Formato das planilhas em pt-BR: vírgula decimal e datas dd/mm/aaaa
+        if value is None:
+            return ''
+        if isinstance(value, decimal.Decimal):
+            return str(value).replace('.', ',')
+        if isinstance(value, datetime.datetime):
+            return timezone.localtime(value).strftime('%d/%m/%Y %H:%M')
+        if isinstance(value, datetime.date):
+            return value.strftime('%d/%m/%Y')
+        if isinstance(value, bool):
+            return 'Sim' if value else 'Não'
+        return value
@@ -0,0 +1,157 @@
+"""
+Campos esparsos: o cliente escolhe as colunas da resposta com `?fields=` ou
+`?omit=` (nomes separados por vírgula; ponto para campos aninhados):
+
+    /api/v1/customers/?fields=id,name,city
+    /api/v1/sales/42/?fields=id,status,customer.name,customer.phone
+    /api/v1/sales/?omit=installments,customer.contacts
+
+- SparseFieldsetMixin (serializers): remove os campos não pedidos, em qualquer
+  nível de aninhamento (o serializer aninhado também precisa do mixin);
+- SparseFieldsetViewMixin (viewsets): adia (defer) as colunas do modelo e das
+  relações do select_related que nenhum campo restante usa, para que nem sejam
+  lidas do banco.
+
+Só vale para leituras (GET); escritas sempre usam o serializer completo.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_fieldset(value):
+    """ 'id,customer.name,customer.city' -> {'id': {}, 'customer': {'name': {}, 'city': {}}} """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin para ModelSerializer que aplica `?fields=` e `?omit=` da requisição
+    ao nível do serializer (raiz ou aninhado, ex: `customer.name`).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+
+        include = self.get_fieldset(request, FIELDS_PARAM)
+        omit = self.get_fieldset(request, OMIT_PARAM)
+        for param, fieldset in ((FIELDS_PARAM, include), (OMIT_PARAM, omit)):
+            unknown = set(fieldset) - set(fields)
+            if unknown:
+                prefix = ''.join(f'{name}.' for name in self.get_fieldset_path())
+                raise serializers.ValidationError({param: [f'Campo desconhecido: {prefix}{name}' for name in sorted(unknown)]})
+
+        for name in list(fields):
+            if (include and name not in include) or (name in omit and not omit[name]):
+                del fields[name]
+        return fields
+
+    def get_fieldset_path(self):
+        """ Nomes dos campos do serializer raiz até este (vazio na raiz). """
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return path[::-1]
+
+    def get_fieldset(self, request, param):
+        """ Parte de `?fields=`/`?omit=` que se aplica a este nível; {} se não restringe nada. """
+        node = parse_fieldset(request.query_params.get(param, ''))
+        for name in self.get_fieldset_path():
+            node = node.get(name) or {}
+        return node
+
+
+def model_columns(model, related, prefix=''):
+    """ Todas as colunas do modelo e das relações do select_related, exceto chaves. """
+    columns = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.name in related:
+            columns += model_columns(field.related_model, related[field.name], f'{prefix}{field.name}__')
+        else:
+            columns.append(prefix + field.name)
+    return columns
+
+
+def unused_columns(serializer, model, related, prefix='', annotations=()):
+    """
+    Colunas de `model` que nenhum campo do serializer lê, prefixadas para o defer().
+    Percorre as relações do select_related (`related`) que têm serializer
+    aninhado. Se algum campo depende de um método ou propriedade, não dá para
+    saber o que ele lê e nada é adiado naquele nível. Campos que leem
+    anotações do queryset (`annotations`) não usam colunas.
+    """
+    used = set()
+    nested = {}
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            return []
+        if field.source_attrs[0] in annotations:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return []
+        used.add(model_field.name)
+        if isinstance(field, serializers.Serializer) and model_field.name in related:
+            nested[model_field.name] = field
+
+    columns = []
+    for model_field in model._meta.concrete_fields:
+        name = model_field.name
+        if model_field.primary_key:
+            continue
+        if name in related:
+            # A chave do select_related nunca é adiada; as colunas da relação, sim
+            related_model = model_field.related_model
+            if name in nested:
+                columns += unused_columns(nested[name], related_model, related[name], f'{prefix}{name}__')
+            elif name not in used:
+                columns += model_columns(related_model, related[name], f'{prefix}{name}__')
+        elif name not in used:
+            columns.append(prefix + name)
+    return columns
+
+
+class SparseFieldsetViewMixin:
+    """
+    Mixin para viewsets cujo serializer usa SparseFieldsetMixin: quando a
+    requisição traz `?fields=`/`?omit=`, as colunas que não aparecem na resposta
+    são adiadas no queryset. As colunas da ordenação (usadas pelo cursor da
+    paginação) e o `conditional_field` do GET condicional são sempre lidos.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if self.action not in self.sparse_actions or not (params.get(FIELDS_PARAM) or params.get(OMIT_PARAM)):
+            return queryset
+
+        related = queryset.query.select_related
+        if not isinstance(related, dict):
+            related = {}
+        keep = {field.lstrip('-') for field in queryset.query.order_by or queryset.model._meta.ordering if isinstance(field, str)}
+        keep.add(getattr(self, 'conditional_field', None))
+        deferred = [
+            column for column in unused_columns(self.get_serializer(), queryset.model, related, annotations=queryset.query.annotations)
+            if column not in keep
+        ]
+        return queryset.defer(*deferred) if deferred else queryset
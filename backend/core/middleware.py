@@ -0,0 +1,97 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.sql')
+
+# Listas de parâmetros (IN (%s, %s, ...)) de tamanhos diferentes contam como a mesma consulta
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+def fingerprint(sql):
+    """
+    Forma normalizada de uma consulta, usada para encontrar consultas repetidas
+    (o sinal típico de N+1). O SQL chega com os parâmetros ainda como %s.
+    """
+    return _PLACEHOLDER_LIST.sub('%s, ...', ' '.join(sql.split()))
+
+
+class QueryRecorder:
+    """
+    Wrapper de execução (connection.execute_wrapper) que conta as consultas,
+    soma o tempo gasto no banco e agrupa as consultas pelo fingerprint.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """ Consultas executadas mais de uma vez, da mais repetida para a menos. """
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n > 1]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Mede as consultas SQL de cada requisição: quantidade, tempo total no banco
+    e consultas repetidas. Os números vão no cabeçalho `Server-Timing` (visível
+    na aba Network do navegador) e numa linha de log estruturada (logger `core.sql`),
+    que sobe para WARNING quando uma consulta se repete demais.
+
+    Em respostas em streaming (ex: exportação CSV) só entram as consultas feitas
+    antes de o corpo começar a ser enviado.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'SQL_INSTRUMENTATION', True)
+        self.duplicate_threshold = getattr(settings, 'SQL_DUPLICATE_QUERY_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        duplicates = recorder.duplicates()
+        duplicated = sum(n - 1 for _, n in duplicates)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries, {duplicated} duplicated", '
+            f'app;dur={total * 1000:.1f}'
+        )
+
+        stats = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'duplicated': duplicated,
+            'db_ms': round(recorder.duration * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'top_duplicates': [{'sql': sql[:200], 'count': n} for sql, n in duplicates[:3]],
+        }
+        level = logging.WARNING if duplicates and duplicates[0][1] >= self.duplicate_threshold else logging.INFO
+        logger.log(level, json.dumps(stats, ensure_ascii=False), extra={'sql_stats': stats})
+        return response
@@ -0,0 +1,215 @@
+import base64
+import datetime
+import decimal
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre a ordenação do queryset.
+
+    O cursor guarda os valores da ordenação da última (ou primeira) linha da
+    página e a próxima página é buscada com um WHERE sobre esses valores, em vez
+    de OFFSET. Não há COUNT(*), então o custo de cada página é o mesmo do início
+    ao fim da lista. O `id` entra como desempate para que linhas com o mesmo
+    valor (ex: mesmo vencimento) nunca sejam puladas nem repetidas.
+
+    Os campos da ordenação precisam ser colunas não nulas: `a > NULL` nunca é
+    verdadeiro e um relacionamento não cabe no cursor. Outras ordenações (ex:
+    `?ordering=email`) respondem 400.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'KEYSET_PAGINATION_MAX_PAGE_SIZE', 100)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+    invalid_ordering_message = 'A paginação por cursor não aceita ordenar por "{field}" (campo opcional ou relacionamento).'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = [self.invert(field) for field in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Vindo de um cursor, existe ao menos a linha que o originou do outro lado
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Usa a ordenação já aplicada ao queryset (inclusive pelo OrderingFilter)
+        ou a ordenação padrão do modelo, acrescentando o `id` como desempate.
+        """
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(field, str) for field in ordering):
+            raise ValueError('KeysetPagination só suporta ordenação por nomes de campos.')
+        for field in ordering:
+            if not self.is_keyset_field(queryset.model, field.lstrip('-')):
+                raise ValidationError({'ordering': [self.invalid_ordering_message.format(field=field.lstrip('-'))]})
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    @staticmethod
+    def is_keyset_field(model, name):
+        """ O caminho `name` (ex: customer__name) termina em uma coluna e não passa por nulos nem por listas. """
+        attrs = name.split('__')
+        for index, attr in enumerate(attrs):
+            try:
+                field = model._meta.pk if attr == 'pk' else model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return False
+            last = index == len(attrs) - 1
+            if field.null or field.many_to_many or field.one_to_many or (field.is_relation and last):
+                return False
+            if not last:
+                if not field.is_relation:
+                    return False
+                model = field.related_model
+        return True
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        position = [self.value_of(obj, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)}, default=self.encode_value)
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def encode_value(value):
+        # Sem truncar os microssegundos (como faria o DjangoJSONEncoder): o
+        # cursor precisa do valor exato para não pular nem repetir linhas.
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        raise TypeError(f'Valor não suportado no cursor: {value!r}')
+
+    @staticmethod
+    def value_of(obj, field):
+        for attr in field.split('__'):
+            obj = getattr(obj, 'pk' if attr == 'pk' else attr)
+        return obj
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """
+        Monta o WHERE "depois de `position`" para uma ordenação composta:
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {previous.lstrip('-'): value for previous, value in zip(ordering[:index], position)}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': position[index]}))
+        return reduce(or_, conditions)
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Mantém a paginação por número de página como padrão e passa para o modo
+    keyset quando o cliente envia `?pagination=cursor` (ou um `?cursor=`).
+    Os viewsets aderem a esse modo definindo `pagination_class`.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if request.query_params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # 3rd Party Apps
     'rest_framework',
@@ -70,10 +72,20 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Tamanho máximo de página (?page_size=) no modo de paginação por cursor
+# (core.pagination.KeysetPagination), usado pelas listas grandes.
+KEYSET_PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('KEYSET_PAGINATION_MAX_PAGE_SIZE', '100'))
+
+# Quando ativo, a conclusão de uma venda apenas registra o pedido no outbox
+# financeiro; os lançamentos são gerados pelo comando `process_financial_outbox`.
+FINANCE_ASYNC_POSTING = os.environ.get('FINANCE_ASYNC_POSTING', '1') == '1'
+
 MIDDLEWARE = [
     # CORS Middleware: Deve vir antes de middlewares que geram respostas,
     # como o CommonMiddleware.
     'corsheaders.middleware.CorsMiddleware',
+    # Conta e mede as consultas SQL de cada requisição (cabeçalho Server-Timing e log core.sql)
+    'core.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +104,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
 ]
+# Permite que o frontend leia as métricas de SQL (core.middleware)
+CORS_EXPOSE_HEADERS = ['Server-Timing']
 
 ROOT_URLCONF = 'core.urls'
 
@@ -168,3 +182,24 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Instrumentação de SQL por requisição (core.middleware.QueryInstrumentationMiddleware).
+# O log passa a WARNING quando uma mesma consulta se repete este número de vezes.
+SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') == '1'
+SQL_DUPLICATE_QUERY_THRESHOLD = int(os.environ.get('SQL_DUPLICATE_QUERY_THRESHOLD', '5'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.sql': {
+            'handlers': ['console'],
+            # Nos testes só as requisições com consultas repetidas aparecem
+            'level': os.environ.get('SQL_LOG_LEVEL', 'WARNING' if 'test' in sys.argv else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware import fingerprint
+
+
+class QueryBudgetMixin:
+    """
+    Orçamento de consultas para os testes dos endpoints.
+
+    Diferente do assertNumQueries, o limite é um teto: o teste só falha quando
+    o endpoint passa do orçamento, e a mensagem lista as consultas repetidas
+    para facilitar achar o N+1. Os testes devem criar várias linhas, para que
+    uma consulta por linha estoure o orçamento.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed <= budget:
+            return
+
+        counts = {}
+        for query in context.captured_queries:
+            key = fingerprint(query['sql'])
+            counts[key] = counts.get(key, 0) + 1
+        repeated = sorted(((n, sql) for sql, n in counts.items() if n > 1), reverse=True)
+        if repeated:
+            details = 'Repetidas:\n' + '\n'.join(f'{n}x {sql}' for n, sql in repeated)
+        else:
+            details = 'Consultas:\n' + '\n'.join(query['sql'] for query in context.captured_queries)
+        self.fail(f'{executed} consultas executadas, orçamento de {budget}. {details}')
+
+    def get_within_budget(self, budget, url, data=None, **extra):
+        """ Faz um GET em `url` dentro do orçamento e devolve a resposta. """
+        with self.assertQueryBudget(budget):
+            return self.client.get(url, data, **extra)
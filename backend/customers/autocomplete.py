@@ -0,0 +1,100 @@
+"""
+Autocompletar de clientes (formulário de vendas).
+
+Devolve só as colunas exibidas na lista de sugestões para os primeiros
+clientes cujo nome, nome fantasia ou CPF/CNPJ começa com o texto digitado.
+As consultas de prefixo usam os índices UPPER(...) COLLATE "C" do nome e do
+nome fantasia e o de `cpf_cnpj_digits` (ver Customer.Meta.indexes).
+
+Cada processo guarda os prefixos mais recentes em um LRU limitado. Os sinais
+post_save/post_delete de Customer (e as importações em massa) chamam
+`invalidate`, que limpa o LRU local e incrementa uma versão no cache do Django;
+os outros processos percebem a nova versão quando o cache é compartilhado
+(Redis/Memcached). O tempo de vida das entradas limita a divergência nos demais casos.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Collate, Upper
+from .filters import NUMERIC_SEARCH
+from .models import Customer
+
+AUTOCOMPLETE_FIELDS = ('id', 'name', 'fantasy_name', 'cpf_cnpj', 'city')
+# Prefixos guardados por processo e tempo de vida de cada um (segundos)
+AUTOCOMPLETE_CACHE_SIZE = getattr(settings, 'CUSTOMER_AUTOCOMPLETE_CACHE_SIZE', 1024)
+AUTOCOMPLETE_CACHE_TIMEOUT = getattr(settings, 'CUSTOMER_AUTOCOMPLETE_CACHE_TIMEOUT', 60)
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+VERSION_KEY = 'customers:autocomplete:version'
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version():
+    # Uma versão nova (ex: cache reiniciado) nunca coincide com as anteriores
+    return cache.get_or_set(VERSION_KEY, lambda: int(time.time()), None)
+
+
+def search(term, limit=10):
+    """ Sugestões para `term` (lista de dicionários com AUTOCOMPLETE_FIELDS). """
+    term = ' '.join(term.split()).upper()
+    if not term:
+        return []
+    limit = min(max(limit, 1), AUTOCOMPLETE_MAX_LIMIT)
+
+    key = (_version(), term, limit)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(key)
+            return entry[1]
+
+    results = _query(term, limit)
+    with _lock:
+        _entries[key] = (now + AUTOCOMPLETE_CACHE_TIMEOUT, results)
+        _entries.move_to_end(key)
+        while len(_entries) > AUTOCOMPLETE_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return results
+
+
+def _query(term, limit):
+    digits = re.sub(r'\D', '', term)
+    if digits and NUMERIC_SEARCH.fullmatch(term):
+        customers = Customer.objects.filter(cpf_cnpj_digits__startswith=digits).order_by('name', 'id')
+        return list(customers.values(*AUTOCOMPLETE_FIELDS)[:limit])
+
+    # Uma consulta por coluna, cada uma percorrendo o seu índice já na ordem
+    # (com um OR, o banco teria de ler e ordenar todos os clientes do prefixo)
+    found = {}
+    for field in ('name', 'fantasy_name'):
+        customers = (
+            Customer.objects
+            .annotate(prefix_key=Collate(Upper(field), 'C'))
+            .filter(prefix_key__startswith=term)
+            .order_by('prefix_key', 'id')
+            .values(*AUTOCOMPLETE_FIELDS)
+        )
+        for customer in customers[:limit]:
+            # Ordena pela coluna que casou com o prefixo (a menor, se casaram as duas)
+            sort_key = (customer[field].upper(), customer['id'])
+            if customer['id'] not in found or sort_key < found[customer['id']][0]:
+                found[customer['id']] = (sort_key, customer)
+    return [customer for _, customer in sorted(found.values(), key=lambda entry: entry[0])[:limit]]
+
+
+def invalidate():
+    """ Descarta as sugestões em cache, neste processo e (com cache compartilhado) nos demais. """
+    with _lock:
+        _entries.clear()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Versão fora do cache: a próxima leitura cria uma nova
+        pass
@@ -0,0 +1,230 @@
+"""
+Detecção e junção de clientes duplicados.
+
+Comparar todos os pares de clientes é inviável (200 mil clientes dão 20 bilhões
+de pares). Cada cliente entra em alguns blocos, pelas chaves:
+
+- dígitos do CPF/CNPJ e e-mail sem diferenciar maiúsculas (coincidência = duplicado);
+- últimos 8 dígitos do fone e do celular (ignora DDD e o nono dígito);
+- chave fonética do primeiro e do último nome (ignora acentos, pontuação,
+  preposições e sufixos como LTDA).
+
+Só os pares dentro de um mesmo bloco recebem uma pontuação, que combina a
+semelhança dos nomes (trigramas, como o pg_trgm), o telefone e a cidade. Blocos
+maiores que `max_block` (ex: um telefone de fachada em milhares de cadastros)
+são ignorados. Pares acima do limite formam grupos; clientes com documentos
+diferentes nunca ficam no mesmo grupo.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+
+from django.db import connection, transaction
+from finance.models import AccountReceivable
+from sales.models import Sale
+from .models import Customer
+
+DUPLICATE_FIELDS = (
+    'id', 'name', 'fantasy_name', 'cpf_cnpj_digits', 'phone_digits', 'cell_phone_digits', 'email', 'city',
+)
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_MAX_BLOCK = 200
+
+# Palavras que não distinguem um cliente de outro
+NAME_STOPWORDS = {
+    'DA', 'DAS', 'DE', 'DO', 'DOS', 'E', 'LTDA', 'ME', 'EPP', 'EIRELI', 'SA', 'S', 'A', 'CIA', 'MEI',
+}
+PHONETIC_RULES = [
+    (re.compile(pattern), replacement) for pattern, replacement in (
+        (r'PH', 'F'), (r'[CS]H', 'X'), (r'LH', 'L'), (r'NH', 'N'), (r'H', ''),
+        (r'Y', 'I'), (r'W', 'V'), (r'K|Q', 'C'), (r'C(?=[EI])', 'S'), (r'Z', 'S'),
+        (r'SS', 'S'), (r'(?<=[AEIOU])S(?=[AEIOU])', 'Z'), (r'(.)\1+', r'\1'),
+    )
+]
+
+
+def normalize_name(value):
+    """ 'José da Silva & Cia. Ltda' -> ['JOSE', 'SILVA'] """
+    value = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode().upper()
+    return [word for word in re.findall(r'[A-Z0-9]+', value) if word not in NAME_STOPWORDS]
+
+
+def phonetic(word):
+    """ Chave fonética simplificada para o português ('SOUZA' e 'SOUSA' -> 'SOUZA'). """
+    for pattern, replacement in PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+def trigrams(words):
+    """ Trigramas das palavras, com o preenchimento do pg_trgm (dois espaços antes, um depois). """
+    grams = set()
+    for word in words:
+        padded = f'  {word.lower()} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """ Semelhança entre dois conjuntos de trigramas, de 0 a 1 (como similarity() do pg_trgm). """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class Candidate:
+    __slots__ = ('id', 'row', 'document', 'email', 'phones', 'city', 'grams', 'keys')
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.row = row
+        self.document = row['cpf_cnpj_digits'] if len(row['cpf_cnpj_digits'] or '') in (11, 14) else None
+        self.email = (row['email'] or '').lower() or None
+        self.phones = {digits[-8:] for digits in (row['phone_digits'], row['cell_phone_digits']) if len(digits or '') >= 8}
+        self.city = ' '.join(normalize_name(row['city'])) or None
+
+        words = normalize_name(row['name'])
+        self.grams = trigrams(words)
+        self.keys = []
+        if self.document:
+            self.keys.append(('document', self.document))
+        if self.email:
+            self.keys.append(('email', self.email))
+        self.keys += [('phone', phone) for phone in self.phones]
+        if words:
+            self.keys.append(('name', phonetic(words[0]), phonetic(words[-1])))
+
+
+def score(a, b):
+    """ Pontuação (0 a 1) e motivo de `a` e `b` serem o mesmo cliente. """
+    if a.document and a.document == b.document:
+        return 1.0, 'CPF/CNPJ'
+    if a.document and b.document:
+        return 0.0, ''
+    if a.email and a.email == b.email:
+        return 1.0, 'E-mail'
+
+    name = similarity(a.grams, b.grams)
+    reasons = [f'nome {name:.0%}']
+    value = 0.7 * name
+    if a.phones & b.phones:
+        value += 0.2
+        reasons.append('fone')
+    elif a.phones and b.phones:
+        # Homônimos: mesmo nome, telefones diferentes
+        value -= 0.1
+    if a.city and a.city == b.city:
+        value += 0.1
+        reasons.append('cidade')
+    return value, ', '.join(reasons)
+
+
+def find_duplicates(queryset=None, threshold=DEFAULT_THRESHOLD, max_block=DEFAULT_MAX_BLOCK):
+    """
+    Agrupa os clientes duplicados de `queryset` (padrão: todos).
+
+    Retorna (grupos, blocos ignorados). Cada grupo é um dicionário com `survivor`
+    (a linha do cliente mantido: o que tem documento ou, entre eles, o mais
+    antigo) e `duplicates` (lista de (linha, pontuação, motivo) dos demais).
+    """
+    queryset = Customer.objects.all() if queryset is None else queryset
+    candidates = {}
+    blocks = defaultdict(list)
+    for row in queryset.order_by('id').values(*DUPLICATE_FIELDS).iterator(chunk_size=5000):
+        candidate = Candidate(row)
+        candidates[candidate.id] = candidate
+        for key in candidate.keys:
+            blocks[key].append(candidate)
+
+    # Union-find dos pares acima do limite; cada raiz guarda o documento do grupo
+    parent = {}
+    documents = {}
+
+    def find(pk):
+        while parent[pk] != pk:
+            pk = parent[pk]
+        return pk
+
+    matches = {}
+    skipped = 0
+    for members in blocks.values():
+        if len(members) > max_block:
+            skipped += 1
+            continue
+        for a, b in combinations(members, 2):
+            pair = (a.id, b.id)
+            if pair in matches:
+                continue
+            value, reason = score(a, b)
+            if value < threshold:
+                continue
+            parent.setdefault(a.id, a.id)
+            parent.setdefault(b.id, b.id)
+            root_a, root_b = find(a.id), find(b.id)
+            if root_a == root_b:
+                matches[pair] = (value, reason)
+                continue
+            document_a = documents.get(root_a, a.document)
+            document_b = documents.get(root_b, b.document)
+            if document_a and document_b and document_a != document_b:
+                continue
+            matches[pair] = (value, reason)
+            parent[root_b] = root_a
+            documents[root_a] = document_a or document_b
+
+    members = defaultdict(list)
+    for pk in parent:
+        members[find(pk)].append(candidates[pk])
+
+    best = {}
+    for (a, b), match in matches.items():
+        for pk in (a, b):
+            if pk not in best or match[0] > best[pk][0]:
+                best[pk] = match
+
+    groups = []
+    for group in members.values():
+        if len(group) < 2:
+            # Par rejeitado pelos documentos: o cliente ficou sozinho
+            continue
+        group.sort(key=lambda candidate: (candidate.document is None, candidate.id))
+        survivor, *duplicates = group
+        groups.append({
+            'survivor': survivor.row,
+            'duplicates': [(candidate.row, *best[candidate.id]) for candidate in duplicates],
+        })
+    groups.sort(key=lambda group: group['survivor']['id'])
+    return groups, skipped
+
+
+# Troca o cliente das referências em um único comando por tabela
+REPOINT_SQL = """
+UPDATE {table} t SET customer_id = m.survivor_id{touch}
+FROM (VALUES {placeholders}) AS m(duplicate_id, survivor_id)
+WHERE t.customer_id = m.duplicate_id
+"""
+
+
+def merge(groups, chunk_size=5000):
+    """
+    Passa as vendas e as contas a receber dos duplicados para o cliente mantido
+    e exclui os duplicados. Os demais dados do cliente mantido não mudam.
+    Retorna (vendas, recebíveis, clientes excluídos).
+    """
+    pairs = [(row['id'], group['survivor']['id']) for group in groups for row, _, _ in group['duplicates']]
+    totals = [0, 0, 0]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start:start + chunk_size]
+            placeholders = ', '.join(['(%s::bigint, %s::bigint)'] * len(chunk))
+            params = [pk for pair in chunk for pk in pair]
+            for index, (model, touch) in enumerate(((Sale, ''), (AccountReceivable, ', updated_at = NOW()'))):
+                cursor.execute(
+                    REPOINT_SQL.format(table=model._meta.db_table, touch=touch, placeholders=placeholders), params,
+                )
+                totals[index] += cursor.rowcount
+            # Sem referências, a exclusão não esbarra no PROTECT; os sinais atualizam contador e autocompletar
+            _, deleted = Customer.objects.filter(pk__in=[duplicate for duplicate, _ in chunk]).delete()
+            totals[2] += deleted.get(Customer._meta.label, 0)
+    return tuple(totals)
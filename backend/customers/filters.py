@@ -0,0 +1,58 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework import filters
+
+# Busca formada só por dígitos e pontuação: CPF/CNPJ, telefone ou código
+NUMERIC_SEARCH = re.compile(r'[\d\s.\-/()+]+')
+
+
+class CustomerSearchFilter(filters.SearchFilter):
+    """
+    Busca de clientes apoiada nas colunas geradas do modelo (ver migração 0002).
+    O caminho depende do que foi digitado:
+
+    - CPF/CNPJ completo (com ou sem pontuação): busca exata em `cpf_cnpj_digits`;
+    - outros números: prefixo dos dígitos do documento, fone ou celular (índices
+      B-tree com varchar_pattern_ops) ou código exato;
+    - e-mail (contém '@'): prefixo do e-mail, sem diferenciar maiúsculas;
+    - texto: busca textual em `search_vector` (nome, fantasia, código, e-mail e
+      cidade) com prefixo em cada palavra, ordenada por relevância.
+
+    Em outros bancos, cai no SearchFilter padrão sobre `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        search = ' '.join(terms)
+        if NUMERIC_SEARCH.fullmatch(search):
+            digits = re.sub(r'\D', '', search)
+            if len(digits) in (11, 14):
+                exact = queryset.filter(cpf_cnpj_digits=digits)
+                if exact.exists():
+                    return exact
+            return queryset.filter(
+                Q(cpf_cnpj_digits__startswith=digits)
+                | Q(phone_digits__startswith=digits)
+                | Q(cell_phone_digits__startswith=digits)
+                | Q(code=search)
+            )
+
+        if '@' in search:
+            return queryset.filter(email__istartswith=search)
+
+        words = re.findall(r'\w+', search)
+        if not words:
+            return queryset.none()
+        # Cada palavra vira um prefixo ('maria':* & 'sil':*); as aspas isolam a sintaxe do tsquery
+        query = SearchQuery(' & '.join(f"'{word}':*" for word in words), search_type='raw', config='simple')
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'name', 'id')
+        )
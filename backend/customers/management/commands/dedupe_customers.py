@@ -0,0 +1,63 @@
+import csv
+import time
+from django.core.management.base import BaseCommand
+from customers import duplicates
+
+REPORT_COLUMNS = [
+    'Grupo', 'Cliente', 'Mantido', 'Pontuação', 'Motivo', 'Nome', 'Fantasia', 'CPF/CNPJ', 'Fone', 'Celular', 'E-mail', 'Cidade',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Procura clientes duplicados (CPF/CNPJ, e-mail, telefone e nome parecidos) e grava um relatório '
+        'dos grupos encontrados. Com --merge, passa as vendas e contas a receber dos duplicados para o '
+        'cliente mantido e exclui os duplicados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report', type=str, default='duplicate_customers.csv', help='Relatório CSV dos grupos de duplicados.')
+        parser.add_argument(
+            '--threshold', type=float, default=duplicates.DEFAULT_THRESHOLD,
+            help='Pontuação mínima (0 a 1) para considerar dois clientes o mesmo.',
+        )
+        parser.add_argument(
+            '--max-block', type=int, default=duplicates.DEFAULT_MAX_BLOCK,
+            help='Blocos (mesmo telefone, mesmo nome etc.) com mais clientes que isso são ignorados.',
+        )
+        parser.add_argument('--merge', action='store_true', help='Junta os duplicados no cliente mantido.')
+
+    def handle(self, *args, **kwargs):
+        started = time.monotonic()
+        groups, skipped = duplicates.find_duplicates(threshold=kwargs['threshold'], max_block=kwargs['max_block'])
+        self.write_report(kwargs['report'], groups)
+
+        found = sum(len(group['duplicates']) for group in groups)
+        self.stdout.write(self.style.SUCCESS(f'Análise concluída em {time.monotonic() - started:.1f}s!'))
+        self.stdout.write(f'Grupos: {len(groups)} | clientes duplicados: {found} (ver {kwargs["report"]})')
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Blocos ignorados por excederem {kwargs["max_block"]} clientes: {skipped}'))
+
+        if not kwargs['merge']:
+            return
+        if not groups:
+            self.stdout.write('Nada para juntar.')
+            return
+        sales, receivables, deleted = duplicates.merge(groups)
+        self.stdout.write(self.style.SUCCESS(
+            f'Vendas transferidas: {sales} | contas a receber transferidas: {receivables} | clientes excluídos: {deleted}'
+        ))
+
+    def write_report(self, path, groups):
+        with open(path, mode='w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(REPORT_COLUMNS)
+            for number, group in enumerate(groups, start=1):
+                rows = [(group['survivor'], 'Sim', '', '')]
+                rows += [(row, 'Não', f'{value:.2f}', reason) for row, value, reason in group['duplicates']]
+                for row, kept, value, reason in rows:
+                    writer.writerow([
+                        number, row['id'], kept, value, reason, row['name'], row['fantasy_name'] or '',
+                        row['cpf_cnpj_digits'] or '', row['phone_digits'] or '', row['cell_phone_digits'] or '',
+                        row['email'] or '', row['city'] or '',
+                    ])
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:38
+
+import customers.models
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='cell_phone_digits',
+            field=models.GeneratedField(db_persist=True, expression=customers.models.Digits('cell_phone'), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='cpf_cnpj_digits',
+            field=models.GeneratedField(db_persist=True, expression=customers.models.Digits('cpf_cnpj'), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.GeneratedField(db_persist=True, expression=customers.models.Digits('phone'), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('fantasy_name', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector('code', 'email', 'city', config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='customer_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['cpf_cnpj_digits'], name='customer_cpf_cnpj_digits_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_digits'], name='customer_phone_digits_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['cell_phone_digits'], name='customer_cell_phone_digits_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='text_pattern_ops'), name='customer_email_prefix_idx'),
+        ),
+    ]
@@ -1,6 +1,19 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Collate, Upper
 from django.conf import settings
 
+
+class Digits(models.Func):
+    """
+    Apenas os dígitos do texto (CPF/CNPJ e telefones), para buscar sem pontuação.
+    """
+    function = 'REGEXP_REPLACE'
+    template = "%(function)s(%(expressions)s, '\\D', '', 'g')"
+    output_field = models.CharField()
+
+
 class Customer(models.Model):
     # --- Choices (Opções pré-definidas) ---
     PERSON_TYPE_CHOICES = [('F', 'Pessoa Física'), ('J', 'Pessoa Jurídica')]
@@ -65,10 +78,36 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
 
+    # --- Busca (colunas geradas e mantidas pelo PostgreSQL; ver CustomerSearchFilter) ---
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config='simple')
+            + SearchVector('fantasy_name', weight='B', config='simple')
+            + SearchVector('code', 'email', 'city', weight='C', config='simple')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    cpf_cnpj_digits = models.GeneratedField(expression=Digits('cpf_cnpj'), output_field=models.CharField(max_length=20), db_persist=True)
+    phone_digits = models.GeneratedField(expression=Digits('phone'), output_field=models.CharField(max_length=20), db_persist=True)
+    cell_phone_digits = models.GeneratedField(expression=Digits('cell_phone'), output_field=models.CharField(max_length=20), db_persist=True)
+
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
-        ordering = ['name']
\ No newline at end of file
+        ordering = ['name']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='customer_search_vector_idx'),
+            # varchar_pattern_ops atende tanto a igualdade quanto o LIKE 'prefixo%'
+            models.Index(fields=['cpf_cnpj_digits'], opclasses=['varchar_pattern_ops'], name='customer_cpf_cnpj_digits_idx'),
+            models.Index(fields=['phone_digits'], opclasses=['varchar_pattern_ops'], name='customer_phone_digits_idx'),
+            models.Index(fields=['cell_phone_digits'], opclasses=['varchar_pattern_ops'], name='customer_cell_phone_digits_idx'),
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='customer_email_prefix_idx'),
+            # Autocompletar (ver customers.autocomplete): com a collation "C", o mesmo
+            # índice atende o LIKE 'PREFIXO%' e a ordenação, e o LIMIT para cedo
+            models.Index(Collate(Upper('name'), 'C'), name='customer_name_prefix_idx'),
+            models.Index(Collate(Upper('fantasy_name'), 'C'), name='customer_fantasy_prefix_idx'),
+        ]
\ No newline at end of file
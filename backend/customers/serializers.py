@@ -1,7 +1,36 @@
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetMixin
+from .autocomplete import AUTOCOMPLETE_MAX_LIMIT
 from .models import Customer
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
-        fields = '__all__'
\ No newline at end of file
+        # As colunas de busca são geradas pelo banco e não fazem parte da API
+        exclude = ['search_vector', 'cpf_cnpj_digits', 'phone_digits', 'cell_phone_digits']
+
+
+class CustomerSummarySerializer(serializers.Serializer):
+    """
+    Resumo do cliente (ver customers.summary). Os valores vêm de anotações do queryset.
+    """
+    id = serializers.IntegerField(read_only=True)
+    lifetime_value = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    sale_count = serializers.IntegerField(read_only=True)
+    last_sale_at = serializers.DateTimeField(read_only=True)
+    open_receivables = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    overdue_amount = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+
+class CustomerWithSummarySerializer(CustomerSerializer, CustomerSummarySerializer):
+    """
+    Cliente com os campos do resumo, para a listagem anotada (?summary=1).
+    """
+
+    class Meta(CustomerSerializer.Meta):
+        pass
+
+
+class CustomerAutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(allow_blank=True, default='', max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=AUTOCOMPLETE_MAX_LIMIT, default=10)
\ No newline at end of file
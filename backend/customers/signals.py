@@ -0,0 +1,11 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import autocomplete
+from .models import Customer
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_autocomplete(sender, **kwargs):
+    # Só após o commit: antes dele, outras requisições ainda leem os dados antigos
+    transaction.on_commit(autocomplete.invalidate)
@@ -0,0 +1,58 @@
+"""
+Resumo do cliente (visão 360): valor vitalício, quantidade e data da última
+venda concluída e os valores em aberto e vencidos no contas a receber.
+
+Tudo sai de um único SELECT: cada valor é uma subconsulta correlacionada
+agregada sobre Sale ou AccountReceivable, atendida pelos índices
+(customer, status) com as colunas somadas incluídas (index-only scan).
+O mesmo `with_summary` serve o detalhe (ação `summary`) e a listagem anotada.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, DecimalField, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from finance.models import AccountReceivable
+from sales.models import Sale
+from .models import Customer
+
+SUMMARY_FIELDS = ('lifetime_value', 'sale_count', 'last_sale_at', 'open_receivables', 'overdue_amount')
+# Os valores mudam com vendas e recebimentos feitos em outras telas; o cache
+# do detalhe só evita recalcular a cada abertura da ficha do cliente
+SUMMARY_CACHE_TIMEOUT = getattr(settings, 'CUSTOMER_SUMMARY_CACHE_TIMEOUT', 30)
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _aggregate(queryset, aggregate, default=None, output_field=None):
+    """ Subconsulta que agrega `queryset` (já filtrado pelo cliente externo) em um valor. """
+    value = Subquery(queryset.annotate(value=aggregate).values('value'), output_field=output_field)
+    return value if default is None else Coalesce(value, Value(default), output_field=output_field)
+
+
+def with_summary(queryset):
+    """ Anota o queryset de clientes com os campos de SUMMARY_FIELDS. """
+    completed_sales = (
+        Sale.objects
+        .filter(customer=OuterRef('pk'), status=Sale.SaleStatus.COMPLETED)
+        .order_by().values('customer')
+    )
+    open_receivables = (
+        AccountReceivable.objects
+        .filter(customer=OuterRef('pk'), status=AccountReceivable.StatusChoices.PENDING)
+        .order_by().values('customer')
+    )
+    today = timezone.localdate()
+    return queryset.annotate(
+        lifetime_value=_aggregate(completed_sales, Sum('total_amount'), Decimal('0'), MONEY),
+        sale_count=_aggregate(completed_sales, Count('pk'), 0, IntegerField()),
+        last_sale_at=_aggregate(completed_sales, Max('created_at')),
+        open_receivables=_aggregate(open_receivables, Sum('amount'), Decimal('0'), MONEY),
+        overdue_amount=_aggregate(open_receivables, Sum('amount', filter=Q(due_date__lt=today)), Decimal('0'), MONEY),
+    )
+
+
+def summary_for(customer_id):
+    """ Dicionário com `id` e SUMMARY_FIELDS do cliente, ou None se ele não existe. """
+    return with_summary(Customer.objects.filter(pk=customer_id)).values('id', *SUMMARY_FIELDS).first()
@@ -1,3 +1,436 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from finance.models import AccountReceivable
+from rest_framework import status
+from rest_framework.test import APITestCase
+from sales.models import Sale
+from . import autocomplete
+from .models import Customer
+
+
+class ImportCustomersCommandTests(APITestCase):
+    """
+    Testes para o comando import_customers (upsert por CPF/CNPJ, e-mail ou código).
+    """
+
+    CSV_CONTENT = (
+        'ID;Nome;Fantasia;CNPJ / CPF;E-mail;Fone;Endereço;Número;Complemento;Bairro;Cidade;UF;CEP\n'
+        '10;Maria Souza;;123.456.789-00;;(11) 9999-0000;;;;;São Paulo;sp;\n'
+        '11;Oficina Central;Central;;contato@central.com;;;;;;;;\n'
+        '12;Empresa Nova;;12.345.678/0001-90;nova@empresa.com;;;;;;Campinas;SP;\n'
+        ';;;;;;;;;;;;\n'
+        '13;Sem Email Válido;;;email-invalido;;;;;;;;\n'
+        '14;Empresa Nova Ltda;;12345678000190;;;;;;;;;\n'
+    )
+
+    def setUp(self):
+        self.maria = Customer.objects.create(name='Maria', person_type='F', cpf_cnpj='123.456.789-00')
+        self.central = Customer.objects.create(name='Oficina Central', fantasy_name='Central', person_type='J', email='Contato@Central.com', code='11')
+        # Cliente com venda: o PROTECT impediria apagar a tabela
+        Sale.objects.create(customer=self.maria, total_amount=Decimal('100.00'), entry_date='2024-01-10')
+
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write(self.CSV_CONTENT)
+        self.addCleanup(os.remove, self.path)
+        self.errors_path = f'{self.path}.errors.csv'
+        self.addCleanup(lambda: os.path.exists(self.errors_path) and os.remove(self.errors_path))
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_customers', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_upsert_merges_creates_and_reports_errors(self):
+        """
+        Garante que clientes existentes são atualizados no lugar, os novos são criados
+        (mesclando linhas do mesmo documento) e as linhas inválidas vão para o relatório.
+        """
+        output = self.run_import('--chunk-size', '4')
+
+        self.assertIn('Clientes criados: 1 | atualizados: 2 | sem alteração: 1', output)
+        self.assertIn('Linhas rejeitadas: 2', output)
+        self.maria.refresh_from_db()
+        self.assertEqual((self.maria.name, self.maria.code, self.maria.state), ('Maria Souza', '10', 'SP'))
+        self.assertEqual(self.maria.sale_set.count(), 1)
+
+        # As duas linhas do mesmo CNPJ viram um só cliente (no segundo lote, uma atualização)
+        company = Customer.objects.get(cpf_cnpj='12345678000190')
+        self.assertEqual((company.name, company.person_type, company.code), ('Empresa Nova Ltda', 'J', '14'))
+        self.assertEqual(Customer.objects.count(), 3)
+
+        with open(self.errors_path, encoding='utf-8') as file:
+            report = file.read().splitlines()
+        self.assertEqual(len(report), 3)
+        self.assertTrue(report[0].startswith('Linha;Erro;ID;Nome'))
+        self.assertTrue(report[1].startswith('5;Nome do cliente está vazio.'))
+        self.assertTrue(report[2].startswith('6;E-mail inválido: email-invalido'))
+
+    def test_code_owned_by_another_customer_is_rejected(self):
+        """
+        Garante que um código que já pertence a outro cliente não é movido, e sim rejeitado.
+        """
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('ID;Nome;CNPJ / CPF\n11;Maria;12345678900\n')
+
+        output = self.run_import()
+
+        self.assertIn('Linhas rejeitadas: 1', output)
+        self.maria.refresh_from_db()
+        self.assertIsNone(self.maria.code)
+
+    def test_dry_run_writes_nothing(self):
+        """
+        Garante que a simulação apenas conta as alterações.
+        """
+        output = self.run_import('--dry-run')
+
+        self.assertIn('Clientes criados: 1 | atualizados: 1 | sem alteração: 1', output)
+        self.assertEqual(Customer.objects.count(), 2)
+        self.maria.refresh_from_db()
+        self.assertEqual(self.maria.name, 'Maria')
+
+
+class CustomerSearchTests(APITestCase):
+    """
+    Testes para a busca de clientes (documento, telefone, e-mail e busca textual).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('customer-list')
+
+        self.maria = Customer.objects.create(
+            name='Maria da Silva', person_type='F', cpf_cnpj='123.456.789-00',
+            phone='(11) 3333-4444', email='maria.silva@example.com', city='Campinas',
+        )
+        self.oficina = Customer.objects.create(
+            name='Oficina Central', fantasy_name='Auto Peças Silveira', person_type='J',
+            cpf_cnpj='12.345.678/0001-90', cell_phone='(19) 98888-7777', code='500',
+        )
+        Customer.objects.create(name='João Pereira', person_type='F', cpf_cnpj='987.654.321-00', city='São José')
+
+    def search(self, term):
+        response = self.client.get(self.url, {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [customer['id'] for customer in response.data['results']]
+
+    def test_document_with_or_without_punctuation(self):
+        """
+        Garante que o CPF/CNPJ é encontrado digitado só com números ou com pontuação.
+        """
+        self.assertEqual(self.search('12345678900'), [self.maria.pk])
+        self.assertEqual(self.search('12.345.678/0001-90'), [self.oficina.pk])
+        self.assertEqual(self.search('123.456'), [self.maria.pk, self.oficina.pk])
+
+    def test_phone_prefix_and_code(self):
+        """
+        Garante que telefones são buscados pelo prefixo dos dígitos e o código, exato.
+        """
+        self.assertEqual(self.search('1133'), [self.maria.pk])
+        self.assertEqual(self.search('(19) 98888'), [self.oficina.pk])
+        self.assertEqual(self.search('500'), [self.oficina.pk])
+
+    def test_text_search_uses_prefixes_and_relevance(self):
+        """
+        Garante que a busca textual casa prefixos de palavras e prioriza o nome.
+        """
+        # 'silv' casa o nome de Maria (peso A) e o nome fantasia da oficina (peso B)
+        self.assertEqual(self.search('silv'), [self.maria.pk, self.oficina.pk])
+        self.assertEqual(self.search('maria silva'), [self.maria.pk])
+        self.assertEqual(len(self.search('são jos')), 1)
+        self.assertEqual(self.search('camp'), [self.maria.pk])
+        self.assertEqual(self.search("o'brien"), [])
+
+    def test_email_prefix(self):
+        """
+        Garante que o e-mail é buscado pelo prefixo, sem diferenciar maiúsculas.
+        """
+        self.assertEqual(self.search('Maria.Silva@exa'), [self.maria.pk])
+
+    def test_normalized_columns_follow_updates(self):
+        """
+        Garante que as colunas de busca acompanham as alterações do cadastro.
+        """
+        response = self.client.patch(
+            reverse('customer-detail', kwargs={'pk': self.maria.pk}), {'phone': '(21) 2222-0000'}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('phone_digits', response.data)
+        self.assertEqual(self.search('2122220000'), [self.maria.pk])
+        self.assertEqual(self.search('1133'), [])
+
+    def test_cursor_pagination_rejects_nullable_ordering(self):
+        """
+        Garante que o cursor recusa ordenar por um campo opcional e que campos fora da lista são ignorados.
+        """
+        response = self.client.get(self.url, {'pagination': 'cursor', 'ordering': 'city'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+        self.assertEqual(self.client.get(self.url, {'ordering': 'city'}).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, {'pagination': 'cursor', 'ordering': 'email'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [customer['id'] for customer in response.data['results']],
+            list(Customer.objects.order_by('name', 'id').values_list('id', flat=True)),
+        )
+
+
+class CustomerSparseFieldsetTests(APITestCase):
+    """
+    Testes para os campos esparsos (?fields= / ?omit=) da API de clientes.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('customer-list')
+        self.customer = Customer.objects.create(name='Maria', person_type='F', city='Campinas', observations='Longo texto')
+
+    def test_fields_limits_response_and_columns_read(self):
+        """
+        Garante que só os campos pedidos são devolvidos e que as demais colunas nem são lidas.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,name,city'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'id': self.customer.pk, 'name': 'Maria', 'city': 'Campinas'}])
+        select = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT "customers_customer"."id"'))
+        self.assertIn('"customers_customer"."city"', select)
+        self.assertNotIn('"customers_customer"."observations"', select)
+
+    def test_omit_removes_fields(self):
+        """
+        Garante que ?omit= remove os campos indicados e mantém os demais.
+        """
+        response = self.client.get(reverse('customer-detail', kwargs={'pk': self.customer.pk}), {'omit': 'observations,contacts'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('observations', response.data)
+        self.assertEqual(response.data['city'], 'Campinas')
+
+    def test_unknown_field_is_rejected(self):
+        """
+        Garante que um nome de campo inexistente devolve 400 em vez de ser ignorado.
+        """
+        response = self.client.get(self.url, {'fields': 'id,nome'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['fields'], ['Campo desconhecido: nome'])
+
+
+class CustomerAutocompleteTests(APITestCase):
+    """
+    Testes para o autocompletar de clientes e o seu cache por processo.
+    """
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('customer-autocomplete')
+
+        self.maria = Customer.objects.create(name='Maria Souza', person_type='F', cpf_cnpj='12345678900', city='Campinas', observations='x')
+        self.oficina = Customer.objects.create(name='Oficina Central', fantasy_name='Maravilha Peças', person_type='J', cpf_cnpj='12345999000190')
+        Customer.objects.create(name='Ana Lima', person_type='F')
+
+    def test_prefix_matches_name_fantasy_name_and_document(self):
+        """
+        Garante que o início do nome, do nome fantasia ou do CPF/CNPJ traz só as colunas da sugestão.
+        """
+        response = self.client.get(self.url, {'q': ' mar '})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Ordenado pela coluna que casou: MARAVILHA (fantasia) antes de MARIA (nome)
+        self.assertEqual([customer['id'] for customer in response.data], [self.oficina.pk, self.maria.pk])
+        self.assertEqual(
+            response.data[1],
+            {'id': self.maria.pk, 'name': 'Maria Souza', 'fantasy_name': None, 'cpf_cnpj': '12345678900', 'city': 'Campinas'},
+        )
+        self.assertEqual([c['id'] for c in self.client.get(self.url, {'q': '123.459'}).data], [self.oficina.pk])
+        # Mesma classificação da busca da listagem: parênteses e '+' também contam como número
+        self.assertEqual([c['id'] for c in self.client.get(self.url, {'q': '(123) 459'}).data], [self.oficina.pk])
+        self.assertEqual(self.client.get(self.url, {'q': 'mar', 'limit': 1}).data[0]['id'], self.oficina.pk)
+        self.assertEqual(self.client.get(self.url, {'q': ''}).data, [])
+
+    def test_repeated_prefix_is_served_from_cache(self):
+        """
+        Garante que o mesmo prefixo não volta ao banco.
+        """
+        self.client.get(self.url, {'q': 'mar'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'MAR'})
+        self.assertEqual(len(response.data), 2)
+
+    def test_customer_changes_invalidate_cache(self):
+        """
+        Garante que salvar ou excluir um cliente descarta as sugestões em cache.
+        """
+        self.client.get(self.url, {'q': 'mar'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Marcos Dias', person_type='F')
+        self.assertEqual(len(self.client.get(self.url, {'q': 'mar'}).data), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.maria.delete()
+        self.assertEqual(len(self.client.get(self.url, {'q': 'mar'}).data), 2)
+
+
+class CustomerSummaryTests(APITestCase):
+    """
+    Testes para o resumo do cliente (detalhe em cache e listagem anotada).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+        self.customer = Customer.objects.create(name='Maria Souza', person_type='F')
+        self.other = Customer.objects.create(name='Ana Lima', person_type='F')
+        Sale.objects.create(customer=self.customer, total_amount=Decimal('100.00'), status=Sale.SaleStatus.COMPLETED, entry_date='2025-01-10')
+        last = Sale.objects.create(customer=self.customer, total_amount=Decimal('50.50'), status=Sale.SaleStatus.COMPLETED, entry_date='2025-02-10')
+        Sale.objects.create(customer=self.customer, total_amount=Decimal('999.00'), status=Sale.SaleStatus.PENDING, entry_date='2025-03-10')
+        Sale.objects.create(customer=self.customer, total_amount=Decimal('999.00'), status=Sale.SaleStatus.CANCELED, entry_date='2025-03-10')
+        self.last_sale_at = last.created_at
+
+        today = timezone.localdate()
+        AccountReceivable.objects.bulk_create([
+            AccountReceivable(customer=self.customer, description='Vencida', amount=Decimal('30.00'), due_date=today - timedelta(days=5)),
+            AccountReceivable(customer=self.customer, description='A vencer', amount=Decimal('20.00'), due_date=today + timedelta(days=5)),
+            AccountReceivable(
+                customer=self.customer, description='Paga', amount=Decimal('70.00'),
+                due_date=today - timedelta(days=10), status=AccountReceivable.StatusChoices.PAID,
+            ),
+        ])
+
+    def test_summary_aggregates_completed_sales_and_open_receivables(self):
+        """
+        Garante que o resumo soma só as vendas concluídas e os recebíveis pendentes, em uma consulta além da busca do cliente.
+        """
+        url = reverse('customer-summary', args=[self.customer.pk])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['lifetime_value'], '150.50')
+        self.assertEqual(response.data['sale_count'], 2)
+        self.assertEqual(response.data['open_receivables'], '50.00')
+        self.assertEqual(response.data['overdue_amount'], '30.00')
+        self.assertEqual(parse_datetime(response.data['last_sale_at']), self.last_sale_at)
+
+        # Segunda abertura da ficha: só a busca do cliente, o resumo vem do cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data, response.data)
+
+    def test_summary_of_customer_without_history(self):
+        """
+        Garante zeros (e não nulos) para cliente sem vendas e 404 para cliente inexistente.
+        """
+        response = self.client.get(reverse('customer-summary', args=[self.other.pk]))
+
+        self.assertEqual(response.data['lifetime_value'], '0.00')
+        self.assertEqual(response.data['sale_count'], 0)
+        self.assertIsNone(response.data['last_sale_at'])
+        self.assertEqual(response.data['overdue_amount'], '0.00')
+        self.assertEqual(self.client.get(reverse('customer-summary', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f"{reverse('customer-list')}abc/summary/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_with_summary_flag(self):
+        """
+        Garante que `?summary=1` anota cada cliente da listagem, sem GET condicional.
+        """
+        url = reverse('customer-list')
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'summary': '1', 'fields': 'id,name,lifetime_value,overdue_amount'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(rows[self.customer.pk], {'id': self.customer.pk, 'name': 'Maria Souza', 'lifetime_value': '150.50', 'overdue_amount': '30.00'})
+        self.assertEqual(rows[self.other.pk]['lifetime_value'], '0.00')
+        self.assertNotIn('lifetime_value', self.client.get(url).data['results'][0])
+
+
+class DedupeCustomersCommandTests(APITestCase):
+    """
+    Testes para o comando dedupe_customers (detecção por blocos e junção dos duplicados).
+    """
+
+    def setUp(self):
+        self.maria = Customer.objects.create(name='Maria Souza', person_type='F', cpf_cnpj='123.456.789-00')
+        self.maria_copy = Customer.objects.create(name='Maria de Sousa', person_type='F', cpf_cnpj='12345678900')
+        self.jose = Customer.objects.create(name='José da Silva', person_type='F', phone='(19) 99876-5432', city='Campinas')
+        self.jose_copy = Customer.objects.create(name='JOSE SILVA', person_type='F', cell_phone='19 98765432', city='campinas')
+        # Homônimos com telefones diferentes e clientes com documentos diferentes não são duplicados
+        Customer.objects.create(name='Ana Lima', person_type='F', phone='1133334444', city='Santos')
+        Customer.objects.create(name='Ana Lima', person_type='F', phone='1155556666', city='Santos')
+        Customer.objects.create(name='Pedro Alves', person_type='F', cpf_cnpj='11111111111')
+        Customer.objects.create(name='Pedro Alves', person_type='F', cpf_cnpj='22222222222')
+
+        handle, self.report_path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        self.addCleanup(os.remove, self.report_path)
+
+    def run_dedupe(self, *args):
+        out = StringIO()
+        call_command('dedupe_customers', '--report', self.report_path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_report_lists_groups_without_changing_data(self):
+        """
+        Garante que só os pares do mesmo documento ou de nome e telefone parecidos formam grupos.
+        """
+        output = self.run_dedupe()
+
+        self.assertIn('Grupos: 2 | clientes duplicados: 2', output)
+        self.assertEqual(Customer.objects.count(), 8)
+        with open(self.report_path, encoding='utf-8') as file:
+            report = list(csv.reader(file, delimiter=';'))
+        self.assertEqual(report[0][:5], ['Grupo', 'Cliente', 'Mantido', 'Pontuação', 'Motivo'])
+        self.assertEqual(
+            [row[:3] for row in report[1:]],
+            [
+                ['1', str(self.maria.pk), 'Sim'], ['1', str(self.maria_copy.pk), 'Não'],
+                ['2', str(self.jose.pk), 'Sim'], ['2', str(self.jose_copy.pk), 'Não'],
+            ],
+        )
+        self.assertEqual(report[2][3:5], ['1.00', 'CPF/CNPJ'])
+        self.assertIn('fone', report[4][4])
+
+    def test_merge_repoints_sales_and_receivables(self):
+        """
+        Garante que a junção passa vendas e contas a receber para o cliente mantido e exclui o duplicado.
+        """
+        sale = Sale.objects.create(customer=self.maria_copy, total_amount=Decimal('80.00'), entry_date='2025-01-10')
+        receivable = AccountReceivable.objects.create(
+            customer=self.jose_copy, description='Parcela 1', amount=Decimal('40.00'), due_date='2025-02-10',
+        )
+
+        output = self.run_dedupe('--merge')
+
+        self.assertIn('Vendas transferidas: 1 | contas a receber transferidas: 1 | clientes excluídos: 2', output)
+        sale.refresh_from_db()
+        receivable.refresh_from_db()
+        self.assertEqual(sale.customer_id, self.maria.pk)
+        self.assertEqual(receivable.customer_id, self.jose.pk)
+        self.assertFalse(Customer.objects.filter(pk__in=[self.maria_copy.pk, self.jose_copy.pk]).exists())
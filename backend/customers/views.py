@@ -1,12 +1,76 @@
+from django.core.cache import cache
+from django.http import Http404
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from . import autocomplete, summary
+from .filters import CustomerSearchFilter
 from .models import Customer
-from .serializers import CustomerSerializer
+from .serializers import (
+    CustomerAutocompleteQuerySerializer,
+    CustomerSerializer,
+    CustomerSummarySerializer,
+    CustomerWithSummarySerializer,
+)
+from core.conditional import ConditionalGetMixin
+from core.fieldsets import SparseFieldsetViewMixin
+from core.pagination import OptionalKeysetPagination
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint que permite que os clientes sejam visualizados ou editados.
     """
     queryset = Customer.objects.all().order_by('name')
     serializer_class = CustomerSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'fantasy_name', 'cpf_cnpj', 'email', 'code', 'city', 'phone']
\ No newline at end of file
+    pagination_class = OptionalKeysetPagination
+    filter_backends = [CustomerSearchFilter, filters.OrderingFilter]
+    search_fields = ['name', 'fantasy_name', 'cpf_cnpj', 'email', 'code', 'city', 'phone']
+    ordering_fields = ['name', 'city', 'created_at']
+
+    def summary_mode(self):
+        """ Listagem anotada com o resumo de cada cliente (?summary=1). """
+        return self.action == 'list' and self.request.query_params.get('summary') in ('1', 'true')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.summary_mode():
+            queryset = summary.with_summary(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.summary_mode():
+            return CustomerWithSummarySerializer
+        return super().get_serializer_class()
+
+    def use_conditional_get(self, request):
+        # O resumo muda com vendas e recebimentos, que não alteram o updated_at do cliente
+        return not self.summary_mode()
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """
+        Visão 360 do cliente em uma consulta: valor vitalício, quantidade e data
+        da última venda concluída, total em aberto e total vencido a receber.
+        """
+        # Resolve o cliente pelo queryset do viewset (404 e permissões) antes de usar o cache
+        customer = self.get_object()
+        cache_key = f'customers:summary:{customer.pk}'
+        data = cache.get(cache_key)
+        if data is None:
+            row = summary.summary_for(customer.pk)
+            if row is None:
+                raise Http404
+            data = CustomerSummarySerializer(row).data
+            cache.set(cache_key, data, summary.SUMMARY_CACHE_TIMEOUT)
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Sugestões para o campo de cliente (ex: formulário de vendas):
+        ?q=<início do nome, nome fantasia ou CPF/CNPJ>&limit=10.
+        Devolve uma lista simples, sem paginação, só com id, nome, nome fantasia, CPF/CNPJ e cidade.
+        """
+        params = CustomerAutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(autocomplete.search(params.validated_data['q'], params.validated_data['limit']))
@@ -0,0 +1,90 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from finance.models import FinancialPostingOutbox
+from sales.models import Sale
+
+
+class Command(BaseCommand):
+    help = 'Gera os lançamentos financeiros pendentes no outbox (pode rodar em vários workers em paralelo).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Quantidade de eventos processados por transação.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Segundos de espera quando o outbox está vazio.')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Eventos com mais falhas do que isso são ignorados.')
+        parser.add_argument('--once', action='store_true', help='Esvazia o outbox e termina, em vez de ficar aguardando novos eventos.')
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        self.stdout.write(self.style.SUCCESS('Worker do outbox financeiro iniciado.'))
+
+        try:
+            while True:
+                processed = self.process_batch(options['batch_size'])
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Worker interrompido.'))
+
+    def process_batch(self, batch_size):
+        """
+        Processa um lote de eventos. O SKIP LOCKED faz cada worker pegar um lote
+        diferente, sem esperar pelos outros e sem processar o mesmo evento duas vezes.
+        Retorna a quantidade de eventos consumidos.
+        """
+        with transaction.atomic():
+            events = list(
+                FinancialPostingOutbox.objects
+                .select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True, attempts__lt=self.max_attempts)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                return 0
+
+            event_ids = [event.pk for event in events]
+            # Bloqueia as vendas (em ordem de pk) para que dois eventos da mesma
+            # venda em lotes diferentes não gerem lançamentos duplicados.
+            sale_ids = list(
+                Sale.objects.select_for_update()
+                .filter(pk__in={event.sale_id for event in events}, status=Sale.SaleStatus.COMPLETED)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+
+            try:
+                with transaction.atomic():
+                    Sale.post_financial_entries(sale_ids)
+            except Exception:
+                # Um registro problemático não pode travar o lote inteiro:
+                # reprocessa venda a venda para isolar as falhas.
+                failed_sale_ids = self.post_individually(sale_ids, event_ids)
+            else:
+                failed_sale_ids = set()
+
+            done_ids = [event.pk for event in events if event.sale_id not in failed_sale_ids]
+            FinancialPostingOutbox.objects.filter(pk__in=done_ids).update(
+                processed_at=timezone.now(), attempts=F('attempts') + 1,
+            )
+
+        self.stdout.write(f'Lote processado: {len(done_ids)} de {len(event_ids)} evento(s) concluídos.')
+        return len(event_ids)
+
+    def post_individually(self, sale_ids, event_ids):
+        failed_sale_ids = set()
+        for sale_id in sale_ids:
+            try:
+                with transaction.atomic():
+                    Sale.post_financial_entries([sale_id])
+            except Exception as e:
+                failed_sale_ids.add(sale_id)
+                FinancialPostingOutbox.objects.filter(pk__in=event_ids, sale_id=sale_id).update(
+                    attempts=F('attempts') + 1, last_error=str(e),
+                )
+                self.stdout.write(self.style.ERROR(f'Erro ao gerar lançamentos da venda #{sale_id}: {e}'))
+        return failed_sale_ids
@@ -0,0 +1,101 @@
+import csv
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from finance import reconciliation
+
+STATUS_LABELS = {
+    reconciliation.MATCHED: 'Conciliada',
+    reconciliation.AMBIGUOUS: 'Ambígua',
+    reconciliation.UNMATCHED: 'Sem correspondência',
+}
+# Conciliada, mas a conta já estava paga quando o --settle rodou
+SKIPPED_LABEL = 'Já baixada'
+
+
+class Command(BaseCommand):
+    help = (
+        'Concilia um extrato bancário (OFX ou CSV) com as contas a receber (créditos) e a pagar (débitos) '
+        'pendentes, pelo valor e pela janela de vencimento, e grava um relatório das linhas conciliadas, '
+        'ambíguas e sem correspondência. Com --settle, baixa as contas conciliadas na data do extrato.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', type=str, help='O caminho para o extrato (.ofx/.qfx ou CSV com Data;Valor;Descrição).')
+        parser.add_argument(
+            '--window', type=int, default=reconciliation.DEFAULT_WINDOW_DAYS,
+            help='Dias de tolerância entre o vencimento da conta e a data do lançamento.',
+        )
+        parser.add_argument('--report', type=str, help='Relatório da conciliação. Padrão: <extrato>.conciliacao.csv')
+        parser.add_argument('--settle', action='store_true', help='Marca como pagas as contas conciliadas.')
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['statement']
+        report_path = kwargs['report'] or f'{path}.conciliacao.csv'
+        started = time.monotonic()
+        try:
+            lines = reconciliation.parse_statement(path)
+        except FileNotFoundError:
+            self.stdout.write(self.style.ERROR(f'Arquivo não encontrado: {path}'))
+            return
+        except (reconciliation.StatementError, UnicodeDecodeError) as e:
+            self.stdout.write(self.style.ERROR(f'Extrato inválido: {e}'))
+            return
+
+        matches = reconciliation.reconcile(lines, kwargs['window'])
+        # Baixa antes do relatório: uma conta paga por outro usuário depois da
+        # conciliação não é baixada de novo e não pode constar como conciliada
+        settled = self.settle(matches) if kwargs['settle'] else None
+        self.write_report(report_path, matches, settled)
+
+        totals = defaultdict(int)
+        for match in matches:
+            totals[match.status] += 1
+        self.stdout.write(self.style.SUCCESS(f'Conciliação concluída em {time.monotonic() - started:.1f}s!'))
+        self.stdout.write(
+            f'Linhas: {len(matches)} | conciliadas: {totals[reconciliation.MATCHED]} | '
+            f'ambíguas: {totals[reconciliation.AMBIGUOUS]} | sem correspondência: {totals[reconciliation.UNMATCHED]} '
+            f'(ver {report_path})'
+        )
+
+        if settled is not None:
+            self.stdout.write(self.style.SUCCESS(f'Contas baixadas: {len(settled)}'))
+            skipped = [
+                pk for match in matches if match.status == reconciliation.MATCHED
+                for pk in match.account_ids if (match.model, pk) not in settled
+            ]
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'Contas já baixadas por outro usuário: {len(skipped)} ({", ".join(str(pk) for pk in skipped)})'
+                ))
+
+    def settle(self, matches):
+        """
+        Um UPDATE por modelo e data de pagamento (no máximo um por dia do extrato).
+        Retorna o conjunto de (modelo, id) das contas baixadas.
+        """
+        groups = defaultdict(list)
+        for match in matches:
+            if match.status == reconciliation.MATCHED:
+                groups[(match.model, match.statement.date)] += match.account_ids
+        settled = set()
+        with transaction.atomic():
+            for (model, payment_date), ids in groups.items():
+                settled.update((model, pk) for pk in model.settle_many(ids, payment_date))
+        return settled
+
+    def write_report(self, path, matches, settled=None):
+        with open(path, mode='w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(['Linha', 'Data', 'Valor', 'Descrição', 'Documento', 'Resultado', 'Tipo', 'Contas'])
+            for match in matches:
+                line = match.statement
+                label = STATUS_LABELS[match.status]
+                if settled is not None and match.status == reconciliation.MATCHED and (match.model, match.account_ids[0]) not in settled:
+                    label = SKIPPED_LABEL
+                writer.writerow([
+                    line.line, line.date.strftime('%d/%m/%Y'), str(line.amount).replace('.', ','),
+                    line.description, line.reference, label,
+                    match.model._meta.verbose_name, ','.join(str(pk) for pk in match.account_ids),
+                ])
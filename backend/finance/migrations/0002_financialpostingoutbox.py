@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+        ('sales', '0005_sale_category_sale_entry_date_sale_exit_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialPostingOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processado em')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último Erro')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='financial_outbox', to='sales.sale', verbose_name='Venda')),
+            ],
+            options={
+                'verbose_name': 'Lançamento Pendente',
+                'verbose_name_plural': 'Lançamentos Pendentes',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='finance_outbox_pending_idx')],
+            },
+        ),
+    ]
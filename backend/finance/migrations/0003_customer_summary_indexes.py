@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_prefix_indexes'),
+        ('finance', '0002_financialpostingoutbox'),
+        ('sales', '0007_sale_legacy_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountreceivable',
+            index=models.Index(fields=['customer', 'status'], include=('amount', 'due_date'), name='receivable_customer_status_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_prefix_indexes'),
+        ('finance', '0003_customer_summary_indexes'),
+        ('sales', '0008_customer_summary_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountreceivable',
+            index=models.Index(fields=['status', 'customer', 'due_date'], include=('amount', 'payment_date', 'created_at'), name='receivable_aging_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_prefix_indexes'),
+        ('finance', '0004_receivable_aging_index'),
+        ('sales', '0008_customer_summary_indexes'),
+        ('sellers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountpayable',
+            index=models.Index(fields=['status', 'due_date'], include=('amount',), name='payable_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accountpayable',
+            index=models.Index(fields=['updated_at'], name='payable_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accountreceivable',
+            index=models.Index(fields=['status', 'due_date'], include=('amount',), name='receivable_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accountreceivable',
+            index=models.Index(fields=['updated_at'], name='receivable_updated_at_idx'),
+        ),
+    ]
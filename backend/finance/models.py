@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 class FinancialAccount(models.Model):
     """ Modelo base abstrato para contas a pagar e receber. """
@@ -21,6 +22,29 @@ class FinancialAccount(models.Model):
     class Meta:
         abstract = True # Torna este modelo uma base, não uma tabela real
 
+    @classmethod
+    @transaction.atomic
+    def settle_many(cls, ids, payment_date=None):
+        """
+        Marca várias contas pendentes como pagas em um único UPDATE.
+        Contas já pagas ou canceladas são ignoradas. Retorna os ids baixados.
+        """
+        # Bloqueia as linhas em ordem de pk para evitar deadlocks entre lotes concorrentes
+        settled = list(
+            cls.objects.select_for_update()
+            .filter(pk__in=ids, status=cls.StatusChoices.PENDING)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        if settled:
+            cls.objects.filter(pk__in=settled).update(
+                status=cls.StatusChoices.PAID,
+                payment_date=payment_date or timezone.localdate(),
+                # O queryset.update não passa pelo auto_now; updated_at é a versão do cache do fluxo de caixa
+                updated_at=timezone.now(),
+            )
+        return settled
+
 class AccountReceivable(FinancialAccount):
     customer = models.ForeignKey('customers.Customer', on_delete=models.PROTECT, verbose_name="Cliente")
 
@@ -31,6 +55,19 @@ class AccountReceivable(FinancialAccount):
         verbose_name = "Conta a Receber"
         verbose_name_plural = "Contas a Receber"
         ordering = ['due_date']
+        indexes = [
+            # Resumo do cliente (customers.summary): as colunas incluídas permitem index-only scan
+            models.Index(fields=['customer', 'status'], include=['amount', 'due_date'], name='receivable_customer_status_idx'),
+            # Aging (finance.reports): as contas de um status já vêm agrupadas por cliente
+            # e com as colunas que as faixas usam, sem ler a tabela
+            models.Index(
+                fields=['status', 'customer', 'due_date'], include=['amount', 'payment_date', 'created_at'],
+                name='receivable_aging_idx',
+            ),
+            # Fluxo de caixa (finance.reports): vencimentos pendentes de um período e versão do cache
+            models.Index(fields=['status', 'due_date'], include=['amount'], name='receivable_status_due_idx'),
+            models.Index(fields=['updated_at'], name='receivable_updated_at_idx'),
+        ]
 
 class AccountPayable(FinancialAccount):
     class PayableCategory(models.TextChoices):
@@ -49,4 +86,33 @@ class AccountPayable(FinancialAccount):
     class Meta:
         verbose_name = "Conta a Pagar"
         verbose_name_plural = "Contas a Pagar"
-        ordering = ['due_date']
\ No newline at end of file
+        ordering = ['due_date']
+        indexes = [
+            # Fluxo de caixa (finance.reports): vencimentos pendentes de um período e versão do cache
+            models.Index(fields=['status', 'due_date'], include=['amount'], name='payable_status_due_idx'),
+            models.Index(fields=['updated_at'], name='payable_updated_at_idx'),
+        ]
+
+class FinancialPostingOutbox(models.Model):
+    """
+    Outbox transacional: cada linha pede a geração dos lançamentos financeiros de
+    uma venda. É gravada na mesma transação da mudança de status e consumida pelo
+    comando `process_financial_outbox`.
+    """
+    sale = models.ForeignKey('sales.Sale', on_delete=models.CASCADE, related_name='financial_outbox', verbose_name="Venda")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name="Processado em")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    last_error = models.TextField(blank=True, default='', verbose_name="Último Erro")
+
+    def __str__(self):
+        return f"Lançamentos da Venda #{self.sale_id}"
+
+    class Meta:
+        verbose_name = "Lançamento Pendente"
+        verbose_name_plural = "Lançamentos Pendentes"
+        ordering = ['id']
+        indexes = [
+            # Mantém a busca por eventos pendentes barata mesmo com milhões de linhas processadas
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='finance_outbox_pending_idx'),
+        ]
@@ -0,0 +1,188 @@
+"""
+Conciliação do extrato bancário com as contas em aberto.
+
+O extrato (OFX ou CSV) vira uma lista de StatementLine. Créditos são
+comparados com as contas a receber pendentes e débitos com as contas a pagar.
+As contas do período são carregadas uma única vez em um índice por
+(tipo, valor), com os vencimentos ordenados: cada linha do extrato encontra os
+candidatos com uma busca binária na janela de datas, sem percorrer as contas.
+
+Cada linha termina como:
+- conciliada: exatamente uma conta com o mesmo valor na janela de vencimento;
+- ambígua: mais de uma (a escolha fica para o usuário);
+- sem correspondência: nenhuma.
+Uma conta conciliada sai do índice e não casa com outra linha. Linhas de
+valor zero (tarifas zeradas, estornos) não são crédito nem débito e ficam de
+fora.
+"""
+import csv
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from .models import AccountPayable, AccountReceivable
+
+DEFAULT_WINDOW_DAYS = 5
+
+MATCHED = 'matched'
+AMBIGUOUS = 'ambiguous'
+UNMATCHED = 'unmatched'
+
+StatementLine = namedtuple('StatementLine', ['line', 'date', 'amount', 'description', 'reference'])
+Match = namedtuple('Match', ['statement', 'status', 'model', 'account_ids'])
+
+# Colunas aceitas no CSV (cabeçalho sem diferenciar maiúsculas)
+CSV_COLUMNS = {
+    'date': ('data', 'date'),
+    'amount': ('valor', 'amount'),
+    'description': ('descrição', 'descricao', 'histórico', 'historico', 'description'),
+    'reference': ('documento', 'id', 'reference'),
+}
+
+OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', re.S | re.I)
+
+
+class StatementError(Exception):
+    pass
+
+
+def parse_amount(value):
+    """
+    '1.234,56', '1,234.56', '-1234.56' ou 'R$ 10,00' -> Decimal. O separador
+    decimal é o último entre '.' e ',' (se aparece uma única vez); o outro só
+    pode separar milhares, em grupos de três dígitos.
+    """
+    value = re.sub(r'[^\d,.\-]', '', value or '')
+    integer, fraction = value, None
+    last = max(value.rfind(','), value.rfind('.'))
+    if last >= 0 and value.count(value[last]) == 1:
+        integer, fraction = value[:last], value[last + 1:]
+    groups = re.split(r'[.,]', integer)
+    if len(set(re.findall(r'[.,]', integer))) > 1 or any(len(group) != 3 for group in groups[1:]):
+        raise StatementError(f'Valor inválido: {value!r}')
+    try:
+        return Decimal(''.join(groups) + (f'.{fraction}' if fraction is not None else ''))
+    except InvalidOperation:
+        raise StatementError(f'Valor inválido: {value!r}')
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d', '%Y%m%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise StatementError(f'Data inválida: {value!r}')
+
+
+def parse_csv(file):
+    """ Extrato em CSV separado por ponto e vírgula, com Data, Valor e (opcional) Descrição e Documento. """
+    reader = csv.DictReader(file, delimiter=';')
+    headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+    columns = {
+        field: next((headers[alias] for alias in aliases if alias in headers), None)
+        for field, aliases in CSV_COLUMNS.items()
+    }
+    if not columns['date'] or not columns['amount']:
+        raise StatementError('O CSV precisa das colunas Data e Valor.')
+
+    lines = []
+    for number, row in enumerate(reader, start=2):
+        try:
+            lines.append(StatementLine(
+                number, parse_date(row[columns['date']]), parse_amount(row[columns['amount']]),
+                (row.get(columns['description']) or '').strip(), (row.get(columns['reference']) or '').strip(),
+            ))
+        except StatementError as e:
+            raise StatementError(f'Linha {number}: {e}')
+    return lines
+
+
+def ofx_tag(block, tag):
+    """ Valor de <TAG> no OFX, que pode vir em SGML (sem fechamento) ou em XML. """
+    match = re.search(rf'<{tag}>([^<\r\n]*)', block, re.I)
+    return match.group(1).strip() if match else ''
+
+
+def parse_ofx(file):
+    """ Transações (<STMTTRN>) de um extrato OFX. """
+    lines = []
+    for number, block in enumerate(OFX_TRANSACTION.findall(file.read()), start=1):
+        try:
+            lines.append(StatementLine(
+                # DTPOSTED pode trazer hora e fuso (20251030120000[-3:BRT]); só a data interessa
+                number, parse_date(ofx_tag(block, 'DTPOSTED')[:8]), parse_amount(ofx_tag(block, 'TRNAMT')),
+                ofx_tag(block, 'MEMO') or ofx_tag(block, 'NAME'), ofx_tag(block, 'FITID'),
+            ))
+        except StatementError as e:
+            raise StatementError(f'Transação {number}: {e}')
+    return lines
+
+
+def parse_statement(path):
+    """ Lê o extrato pelo formato da extensão (.ofx/.qfx ou CSV). """
+    if path.lower().endswith(('.ofx', '.qfx')):
+        # Extratos OFX de bancos brasileiros costumam vir em Latin-1
+        with open(path, encoding='latin-1') as file:
+            return parse_ofx(file)
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        return parse_csv(file)
+
+
+class OpenAccountIndex:
+    """
+    Contas pendentes de um modelo indexadas por valor; os vencimentos de cada
+    valor ficam ordenados para a busca binária da janela.
+    """
+
+    def __init__(self, model, start, end):
+        self.model = model
+        self.accounts = defaultdict(lambda: ([], []))  # valor -> (vencimentos, ids)
+        self.claimed = set()
+        accounts = (
+            model.objects
+            .filter(status=model.StatusChoices.PENDING, due_date__range=(start, end))
+            .order_by('due_date', 'pk')
+            .values_list('pk', 'amount', 'due_date')
+        )
+        for pk, amount, due_date in accounts.iterator(chunk_size=10000):
+            dates, ids = self.accounts[amount]
+            dates.append(due_date)
+            ids.append(pk)
+
+    def candidates(self, amount, start, end):
+        """ Ids ainda livres com o valor `amount` e vencimento entre `start` e `end`. """
+        if amount not in self.accounts:
+            return []
+        dates, ids = self.accounts[amount]
+        return [pk for pk in ids[bisect_left(dates, start):bisect_right(dates, end)] if pk not in self.claimed]
+
+
+def reconcile(lines, window_days=DEFAULT_WINDOW_DAYS):
+    """ Concilia as linhas do extrato (exceto as de valor zero); retorna uma lista de Match na ordem do extrato. """
+    if not lines:
+        return []
+    window = timedelta(days=window_days)
+    start = min(line.date for line in lines) - window
+    end = max(line.date for line in lines) + window
+    indexes = {
+        True: OpenAccountIndex(AccountReceivable, start, end),  # créditos
+        False: OpenAccountIndex(AccountPayable, start, end),    # débitos
+    }
+
+    matches = []
+    for line in lines:
+        if not line.amount:
+            continue
+        index = indexes[line.amount > 0]
+        candidates = index.candidates(abs(line.amount), line.date - window, line.date + window)
+        if len(candidates) == 1:
+            index.claimed.add(candidates[0])
+            status = MATCHED
+        else:
+            status = AMBIGUOUS if candidates else UNMATCHED
+        matches.append(Match(line, status, index.model, candidates))
+    return matches
@@ -0,0 +1,152 @@
+"""
+Relatórios do financeiro calculados no banco.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from customers.models import Customer
+from .models import AccountPayable, AccountReceivable
+
+# Faixas de atraso do relatório de aging: (nome, dias de atraso mínimo, máximo)
+AGING_BUCKETS = (
+    ('current', None, 0),
+    ('days_1_30', 1, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_over_90', 91, None),
+)
+
+CASH_FLOW_DAYS = 90
+CASH_FLOW_MAX_DAYS = 366
+# A chave do cache já muda com qualquer alteração ou exclusão nas contas; o
+# tempo de vida só limita a troca do dia
+CASH_FLOW_CACHE_TIMEOUT = getattr(settings, 'FINANCE_CASH_FLOW_CACHE_TIMEOUT', 300)
+
+
+def open_receivables(as_of):
+    """
+    Contas a receber em aberto na data `as_of`. Para hoje, as pendentes; para uma
+    data passada, também as que já existiam e só foram pagas depois dela.
+    """
+    pending = Q(status=AccountReceivable.StatusChoices.PENDING)
+    if as_of >= timezone.localdate():
+        return AccountReceivable.objects.filter(pending)
+    paid_later = Q(status=AccountReceivable.StatusChoices.PAID, payment_date__gt=as_of)
+    return AccountReceivable.objects.filter(pending | paid_later, created_at__date__lte=as_of)
+
+
+def aging_aggregates(as_of):
+    """
+    Um Sum condicional por faixa. Cada faixa é um intervalo de vencimento
+    (e não um cálculo de dias por linha), então a soma lê só o índice.
+    """
+    aggregates = {}
+    for name, min_days, max_days in AGING_BUCKETS:
+        condition = Q()
+        if min_days is not None:
+            condition &= Q(due_date__lte=as_of - timedelta(days=min_days))
+        if max_days is not None:
+            condition &= Q(due_date__gte=as_of - timedelta(days=max_days))
+        aggregates[name] = Sum('amount', filter=condition, default=Decimal('0'))
+    aggregates['total'] = Sum('amount', default=Decimal('0'))
+    return aggregates
+
+
+def receivables_aging(as_of=None, customer=None, limit=100):
+    """
+    Aging das contas a receber em aberto: total geral por faixa de atraso e os
+    `limit` clientes com maior saldo, cada um com as suas faixas.
+    """
+    as_of = as_of or timezone.localdate()
+    receivables = open_receivables(as_of)
+    if customer is not None:
+        receivables = receivables.filter(customer=customer)
+    aggregates = aging_aggregates(as_of)
+
+    total = receivables.aggregate(**aggregates)
+    # Agrupa só pelo id; os nomes dos clientes da página vêm depois, sem juntar
+    # a tabela de clientes a todas as contas em aberto
+    rows = list(
+        receivables.order_by()
+        .values('customer_id')
+        .annotate(**aggregates)
+        .order_by('-total', 'customer_id')[:limit]
+    )
+    names = dict(Customer.objects.filter(pk__in=[row['customer_id'] for row in rows]).values_list('pk', 'name'))
+    for row in rows:
+        row['customer_name'] = names.get(row['customer_id'])
+    return {'as_of': as_of, 'total': total, 'customers': rows}
+
+
+# Entradas (contas a receber) e saídas (contas a pagar) pendentes do período
+# somadas por período, com todos os períodos do intervalo (mesmo sem movimento)
+# e o saldo acumulado calculado por uma função de janela.
+CASH_FLOW_SQL = """
+WITH movements AS (
+    SELECT due_date, amount AS inflow, 0 AS outflow
+    FROM {receivable} WHERE status = %(pending)s AND due_date BETWEEN %(start)s AND %(end)s
+    UNION ALL
+    SELECT due_date, 0, amount
+    FROM {payable} WHERE status = %(pending)s AND due_date BETWEEN %(start)s AND %(end)s
+),
+periods AS (
+    SELECT generate_series(
+        date_trunc(%(granularity)s, %(start)s::date), %(end)s::date, ('1 ' || %(granularity)s)::interval
+    )::date AS period
+),
+totals AS (
+    SELECT date_trunc(%(granularity)s, due_date)::date AS period, SUM(inflow) AS inflow, SUM(outflow) AS outflow
+    FROM movements GROUP BY 1
+)
+SELECT
+    p.period,
+    COALESCE(t.inflow, 0) AS inflow,
+    COALESCE(t.outflow, 0) AS outflow,
+    COALESCE(t.inflow, 0) - COALESCE(t.outflow, 0) AS net,
+    SUM(COALESCE(t.inflow, 0) - COALESCE(t.outflow, 0)) OVER (ORDER BY p.period) AS balance
+FROM periods p LEFT JOIN totals t ON t.period = p.period
+ORDER BY p.period
+"""
+
+
+def cash_flow_version():
+    """
+    Última alteração e quantidade das contas a receber e a pagar. A quantidade
+    muda com as exclusões (inclusive em cascata), que não deixam um updated_at novo.
+    """
+    parts = []
+    for model in (AccountReceivable, AccountPayable):
+        version = model.objects.aggregate(last=Max('updated_at'), count=Count('pk'))
+        parts += [version['last'] and version['last'].timestamp(), version['count']]
+    return ':'.join(str(part) for part in parts)
+
+
+def cash_flow(start=None, end=None, granularity='day'):
+    """
+    Projeção do caixa: entradas, saídas, saldo do período e saldo acumulado
+    desde `start` (padrão hoje) até `end` (padrão CASH_FLOW_DAYS dias depois),
+    agrupados por dia, semana ou mês. Contas vencidas antes de `start` ficam
+    de fora (ver o aging). O resultado fica em cache até a próxima alteração
+    nas contas.
+    """
+    start = start or timezone.localdate()
+    end = end or start + timedelta(days=CASH_FLOW_DAYS)
+    cache_key = f'finance:cash_flow:{start}:{end}:{granularity}:{cash_flow_version()}'
+    periods = cache.get(cache_key)
+    if periods is None:
+        sql = CASH_FLOW_SQL.format(receivable=AccountReceivable._meta.db_table, payable=AccountPayable._meta.db_table)
+        params = {
+            'pending': AccountReceivable.StatusChoices.PENDING,
+            'start': start, 'end': end, 'granularity': granularity,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column.name for column in cursor.description]
+            periods = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cache.set(cache_key, periods, CASH_FLOW_CACHE_TIMEOUT)
+    return {'start': start, 'end': end, 'granularity': granularity, 'periods': periods}
@@ -1,4 +1,8 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
+from . import reports
 from .models import AccountPayable, AccountReceivable
 
 class AccountReceivableSerializer(serializers.ModelSerializer):
@@ -15,4 +19,74 @@ class AccountPayableSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AccountPayable
-        fields = ['id', 'description', 'category', 'amount', 'due_date', 'status', 'payment_date', 'seller_name', 'sale_id']
\ No newline at end of file
+        fields = ['id', 'description', 'category', 'amount', 'due_date', 'status', 'payment_date', 'seller_name', 'sale_id']
+
+class ReceivableAgingQuerySerializer(serializers.Serializer):
+    """
+    Valida os parâmetros de consulta do aging das contas a receber.
+    """
+    as_of = serializers.DateField(required=False)
+    customer = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(default=100, min_value=1, max_value=1000)
+
+
+class AgingBucketsSerializer(serializers.Serializer):
+    current = serializers.DecimalField(max_digits=14, decimal_places=2)
+    days_1_30 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    days_31_60 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    days_61_90 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    days_over_90 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CustomerAgingSerializer(AgingBucketsSerializer):
+    customer_id = serializers.IntegerField()
+    customer_name = serializers.CharField()
+
+
+class ReceivableAgingSerializer(serializers.Serializer):
+    as_of = serializers.DateField()
+    total = AgingBucketsSerializer()
+    customers = CustomerAgingSerializer(many=True)
+
+
+class CashFlowQuerySerializer(serializers.Serializer):
+    """
+    Valida os parâmetros de consulta do fluxo de caixa projetado.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+
+    def validate(self, attrs):
+        # O limite vale para o período efetivo, com os padrões já aplicados
+        attrs['start'] = attrs.get('start') or timezone.localdate()
+        attrs['end'] = attrs.get('end') or attrs['start'] + timedelta(days=reports.CASH_FLOW_DAYS)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('A data inicial deve ser anterior à data final.')
+        if (attrs['end'] - attrs['start']).days > reports.CASH_FLOW_MAX_DAYS:
+            raise serializers.ValidationError('O período pode ter no máximo um ano.')
+        return attrs
+
+
+class CashFlowPeriodSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    inflow = serializers.DecimalField(max_digits=14, decimal_places=2)
+    outflow = serializers.DecimalField(max_digits=14, decimal_places=2)
+    net = serializers.DecimalField(max_digits=14, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CashFlowSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    granularity = serializers.CharField()
+    periods = CashFlowPeriodSerializer(many=True)
+
+
+class BulkSettleSerializer(serializers.Serializer):
+    """
+    Recebe a lista de contas a serem baixadas em lote e a data do pagamento.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
+    payment_date = serializers.DateField(required=False)
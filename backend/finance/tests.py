@@ -1,3 +1,488 @@
-from django.test import TestCase
+import csv
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.testing import QueryBudgetMixin
+from finance import reconciliation
+from customers.models import Customer
+from sales.models import Sale
+from sellers.models import Seller
+from .models import AccountPayable, AccountReceivable
+
+
+class AccountReceivableCursorPaginationTests(APITestCase):
+    """
+    Testes para a paginação por cursor (keyset) das contas a receber.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('account-receivable-list')
+
+        customer = Customer.objects.create(name='Cliente Teste', person_type='F')
+        # Vários recebíveis com o mesmo vencimento, para exercitar o desempate por id
+        AccountReceivable.objects.bulk_create([
+            AccountReceivable(
+                customer=customer, description=f'Parcela {i}', amount=Decimal('10.00'),
+                due_date=date(2025, 10, 1 + i % 3),
+            )
+            for i in range(25)
+        ])
+
+    def test_cursor_pagination_walks_whole_list(self):
+        """
+        Garante que seguir os links `next` percorre toda a lista, em ordem, sem repetir linhas e sem COUNT.
+        """
+        expected = list(AccountReceivable.objects.order_by('due_date', 'id').values_list('id', flat=True))
+
+        seen = []
+        url = f'{self.url}?pagination=cursor&page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_cursor_pagination_previous_link(self):
+        """
+        Garante que o link `previous` volta para a página anterior.
+        """
+        first_page = self.client.get(f'{self.url}?pagination=cursor&page_size=10').data
+        second_page = self.client.get(first_page['next']).data
+
+        back = self.client.get(second_page['previous']).data
+
+        self.assertEqual(back['results'], first_page['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_pagination_through_relation(self):
+        """
+        Garante que o cursor ordena por um campo de um relacionamento obrigatório (customer__name).
+        """
+        expected = list(AccountReceivable.objects.order_by('-customer__name', '-id').values_list('id', flat=True))
+
+        seen = []
+        url = f'{self.url}?pagination=cursor&page_size=10&ordering=-customer__name'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_default_pagination_is_unchanged(self):
+        """
+        Garante que, sem pedir o modo cursor, a paginação por número de página continua valendo.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class AccountReceivableExportTests(APITestCase):
+    """
+    Testes para a exportação em CSV das contas a receber.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('account-receivable-export')
+
+        customer = Customer.objects.create(name='Cliente Teste', person_type='F')
+        AccountReceivable.objects.create(
+            customer=customer, description='Parcela 1/2', amount=Decimal('150.50'), due_date=date(2025, 10, 1),
+        )
+        AccountReceivable.objects.create(
+            customer=customer, description='Aluguel', amount=Decimal('99.90'), due_date=date(2025, 11, 1),
+        )
+
+    def read_csv(self, response):
+        return b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+    def test_export_streams_csv(self):
+        """
+        Garante que a exportação é uma resposta em streaming com cabeçalho e valores no formato pt-BR.
+        """
+        response = self.client.get(self.url, {'ordering': 'due_date'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="contas_a_receber_', response['Content-Disposition'])
+        lines = self.read_csv(response)
+        self.assertEqual(lines[0], 'ID;Descrição;Cliente;OS;Valor;Vencimento;Pagamento;Status')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('Parcela 1/2;Cliente Teste;;150,50;01/10/2025;;Pendente', lines[1])
+
+    def test_export_respects_search(self):
+        """
+        Garante que a exportação aplica os mesmos filtros da listagem.
+        """
+        response = self.client.get(self.url, {'search': 'Aluguel'})
+
+        lines = self.read_csv(response)
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Aluguel', lines[1])
+
+
+class FinanceQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Orçamento de consultas das listas financeiras, com várias linhas por página.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+        seller_user = User.objects.create_user(username='vendedor', first_name='João', last_name='Silva')
+        seller = Seller.objects.create(user=seller_user, commission_rate=Decimal('10.00'))
+        for i in range(10):
+            customer = Customer.objects.create(name=f'Cliente {i}', person_type='F')
+            sale = Sale.objects.create(customer=customer, seller=seller, total_amount=Decimal('100.00'))
+            AccountReceivable.objects.create(
+                customer=customer, sale=sale, description=f'Parcela {i}', amount=Decimal('100.00'), due_date=date(2025, 10, 1),
+            )
+            AccountPayable.objects.create(
+                seller=seller, sale=sale, description=f'Comissão {i}', amount=Decimal('10.00'), due_date=date(2025, 10, 1),
+                category=AccountPayable.PayableCategory.COMMISSION,
+            )
+
+    def test_receivable_list_budget(self):
+        # COUNT + recebíveis (com cliente e venda)
+        response = self.get_within_budget(2, reverse('account-receivable-list'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_payable_list_budget(self):
+        # COUNT + contas a pagar (com vendedor, usuário e venda)
+        response = self.get_within_budget(2, reverse('account-payable-list'))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['seller_name'], 'João Silva')
+
+
+class ReceivableAgingTests(APITestCase):
+    """
+    Testes para o relatório de aging das contas a receber.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('account-receivable-aging')
+
+        self.today = timezone.localdate()
+        self.maria = Customer.objects.create(name='Maria', person_type='F')
+        self.jose = Customer.objects.create(name='José', person_type='F')
+        receivables = [
+            (self.maria, '100.00', 5, 'PENDING', None),
+            (self.maria, '50.00', -10, 'PENDING', None),
+            (self.maria, '20.00', -45, 'PENDING', None),
+            (self.maria, '10.00', -100, 'PENDING', None),
+            (self.jose, '500.00', -70, 'PENDING', None),
+            # Paga depois de vencer: fora do aging de hoje, mas em aberto há 10 dias
+            (self.jose, '300.00', -40, 'PAID', -5),
+            (self.jose, '900.00', -40, 'CANCELED', None),
+        ]
+        AccountReceivable.objects.bulk_create([
+            AccountReceivable(
+                customer=customer, description='Parcela', amount=Decimal(amount),
+                due_date=self.today + timedelta(days=due), status=receivable_status,
+                payment_date=self.today + timedelta(days=paid) if paid else None,
+            )
+            for customer, amount, due, receivable_status, paid in receivables
+        ])
+        AccountReceivable.objects.update(created_at=timezone.now() - timedelta(days=200))
+
+    def test_aging_buckets_in_total_and_per_customer(self):
+        """
+        Garante as faixas de atraso das contas pendentes, no total e por cliente (maior saldo primeiro).
+        """
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['as_of'], self.today.isoformat())
+        self.assertEqual(response.data['total'], {
+            'current': '100.00', 'days_1_30': '50.00', 'days_31_60': '20.00',
+            'days_61_90': '500.00', 'days_over_90': '10.00', 'total': '680.00',
+        })
+        self.assertEqual([row['customer_name'] for row in response.data['customers']], ['José', 'Maria'])
+        self.assertEqual(response.data['customers'][1]['total'], '180.00')
+        self.assertEqual(response.data['customers'][1]['days_61_90'], '0.00')
+
+    def test_as_of_date_and_customer_filter(self):
+        """
+        Garante que uma data passada considera as contas pagas depois dela e que o filtro de cliente restringe o relatório.
+        """
+        as_of = self.today - timedelta(days=10)
+        response = self.client.get(self.url, {'as_of': as_of.isoformat(), 'customer': self.jose.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total']['days_1_30'], '300.00')
+        self.assertEqual(response.data['total']['days_31_60'], '500.00')
+        self.assertEqual(response.data['total']['total'], '800.00')
+        self.assertEqual([row['customer_id'] for row in response.data['customers']], [self.jose.pk])
+
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CashFlowTests(APITestCase):
+    """
+    Testes para o fluxo de caixa projetado.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('cash-flow')
+
+        self.customer = Customer.objects.create(name='Cliente Teste', person_type='F')
+        AccountReceivable.objects.bulk_create([
+            AccountReceivable(customer=self.customer, description='Parcela 1', amount=Decimal('100.00'), due_date=date(2025, 10, 30)),
+            AccountReceivable(customer=self.customer, description='Parcela 2', amount=Decimal('50.00'), due_date=date(2025, 11, 1)),
+            AccountReceivable(
+                customer=self.customer, description='Paga', amount=Decimal('70.00'), due_date=date(2025, 10, 31),
+                status=AccountReceivable.StatusChoices.PAID,
+            ),
+        ])
+        AccountPayable.objects.bulk_create([
+            AccountPayable(description='Imposto', amount=Decimal('30.00'), due_date=date(2025, 10, 31), category='TAX'),
+            AccountPayable(
+                description='Cancelada', amount=Decimal('999.00'), due_date=date(2025, 10, 31),
+                status=AccountPayable.StatusChoices.CANCELED,
+            ),
+            # Fora do período
+            AccountPayable(description='Comissão', amount=Decimal('40.00'), due_date=date(2025, 10, 29), category='COMMISSION'),
+        ])
+
+    def test_daily_projection_with_running_balance(self):
+        """
+        Garante um período por dia (mesmo sem movimento) e o saldo acumulado das contas pendentes.
+        """
+        response = self.client.get(self.url, {'start': '2025-10-30', 'end': '2025-11-02'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(p['period'], p['inflow'], p['outflow'], p['net'], p['balance']) for p in response.data['periods']],
+            [
+                ('2025-10-30', '100.00', '0.00', '100.00', '100.00'),
+                ('2025-10-31', '0.00', '30.00', '-30.00', '70.00'),
+                ('2025-11-01', '50.00', '0.00', '50.00', '120.00'),
+                ('2025-11-02', '0.00', '0.00', '0.00', '120.00'),
+            ],
+        )
+
+        monthly = self.client.get(self.url, {'start': '2025-10-30', 'end': '2025-11-02', 'granularity': 'month'})
+        self.assertEqual([(p['period'], p['balance']) for p in monthly.data['periods']], [('2025-10-01', '70.00'), ('2025-11-01', '120.00')])
+
+    def test_projection_is_cached_until_accounts_change(self):
+        """
+        Garante que a projeção repetida só consulta a versão das contas e que uma alteração a recalcula.
+        """
+        params = {'start': '2025-10-30', 'end': '2025-11-02', 'granularity': 'week'}
+        self.client.get(self.url, params)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['periods'][-1]['balance'], '120.00')
+
+        new = AccountReceivable.objects.create(customer=self.customer, description='Nova', amount=Decimal('5.00'), due_date=date(2025, 11, 2))
+        self.assertEqual(self.client.get(self.url, params).data['periods'][-1]['balance'], '125.00')
+
+        # A exclusão não deixa um updated_at novo; a quantidade muda a chave
+        new.delete()
+        self.assertEqual(self.client.get(self.url, params).data['periods'][-1]['balance'], '120.00')
+
+        invalid = self.client.get(self.url, {'start': '2025-11-02', 'end': '2025-10-30'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_period_limit_applies_to_default_dates(self):
+        """
+        Garante que o limite de um ano vale também quando só uma das datas é informada.
+        """
+        today = timezone.localdate()
+        self.assertEqual(self.client.get(self.url, {'end': '2099-12-31'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'start': str(today + timedelta(days=1))}).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, {'end': str(today + timedelta(days=366))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['start'], str(today))
+
+
+class BulkSettleTests(APITestCase):
+    """
+    Testes para a baixa em lote das contas a receber e a pagar.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+        customer = Customer.objects.create(name='Cliente Teste', person_type='F')
+        self.receivables = AccountReceivable.objects.bulk_create([
+            AccountReceivable(customer=customer, description=f'Parcela {i}', amount=Decimal('10.00'), due_date=date(2025, 10, 1))
+            for i in range(3)
+        ])
+        self.canceled = AccountReceivable.objects.create(
+            customer=customer, description='Cancelada', amount=Decimal('10.00'), due_date=date(2025, 10, 1),
+            status=AccountReceivable.StatusChoices.CANCELED,
+        )
+
+    def test_bulk_settle_updates_pending_receivables(self):
+        """
+        Garante que só as contas pendentes são baixadas, com a data informada, em poucas consultas.
+        """
+        ids = [self.receivables[0].pk, self.receivables[1].pk, self.canceled.pk]
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                reverse('account-receivable-bulk-settle'), {'ids': ids, 'payment_date': '2025-10-05'}, format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'settled': ids[:2], 'skipped': [self.canceled.pk]})
+        self.assertEqual(
+            set(AccountReceivable.objects.filter(pk__in=ids[:2]).values_list('status', 'payment_date')),
+            {('PAID', date(2025, 10, 5))},
+        )
+        self.assertEqual(AccountReceivable.objects.get(pk=self.receivables[2].pk).status, 'PENDING')
+
+        payable = AccountPayable.objects.create(description='Imposto', amount=Decimal('30.00'), due_date=date(2025, 10, 1))
+        response = self.client.post(reverse('account-payable-bulk-settle'), {'ids': [payable.pk]}, format='json')
+        payable.refresh_from_db()
+        self.assertEqual((payable.status, payable.payment_date), ('PAID', timezone.localdate()))
+        self.assertEqual(self.client.post(reverse('account-payable-bulk-settle'), {'ids': []}, format='json').status_code, 400)
+
+
+class ReconcileBankStatementCommandTests(APITestCase):
+    """
+    Testes para o comando reconcile_bank_statement (conciliação do extrato por valor e vencimento).
+    """
+
+    def setUp(self):
+        customer = Customer.objects.create(name='Cliente Teste', person_type='F')
+        receivables = [('150.50', date(2025, 10, 1)), ('80.00', date(2025, 10, 2)), ('80.00', date(2025, 10, 3)), ('99.00', date(2025, 12, 1))]
+        self.receivable, self.twin_a, self.twin_b, self.far = AccountReceivable.objects.bulk_create([
+            AccountReceivable(customer=customer, description='Parcela', amount=Decimal(amount), due_date=due_date)
+            for amount, due_date in receivables
+        ])
+        self.payable = AccountPayable.objects.create(description='Imposto', amount=Decimal('1234.56'), due_date=date(2025, 10, 4))
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_bank_statement', *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_statement_matched_ambiguous_and_unmatched(self):
+        """
+        Garante que cada linha do CSV é conciliada, ambígua ou sem correspondência e que --settle baixa só as conciliadas.
+        """
+        path = self.write('extrato.csv', (
+            'Data;Histórico;Valor\n'
+            '03/10/2025;PIX RECEBIDO;150,50\n'
+            '03/10/2025;PIX RECEBIDO;80,00\n'
+            '05/10/2025;DARF;-1.234,56\n'
+            '05/10/2025;PIX RECEBIDO;99,00\n'
+        ))
+
+        output = self.run_reconcile(path, '--settle')
+
+        self.assertIn('Linhas: 4 | conciliadas: 2 | ambíguas: 1 | sem correspondência: 1', output)
+        self.assertIn('Contas baixadas: 2', output)
+        with open(f'{path}.conciliacao.csv', encoding='utf-8') as file:
+            report = list(csv.reader(file, delimiter=';'))
+        self.assertEqual(report[1][5:], ['Conciliada', 'Conta a Receber', str(self.receivable.pk)])
+        self.assertEqual(report[2][5:], ['Ambígua', 'Conta a Receber', f'{self.twin_a.pk},{self.twin_b.pk}'])
+        self.assertEqual(report[3][5:], ['Conciliada', 'Conta a Pagar', str(self.payable.pk)])
+        self.assertEqual(report[4][5], 'Sem correspondência')
+
+        self.receivable.refresh_from_db()
+        self.payable.refresh_from_db()
+        self.assertEqual((self.receivable.status, self.receivable.payment_date), ('PAID', date(2025, 10, 3)))
+        self.assertEqual((self.payable.status, self.payable.payment_date), ('PAID', date(2025, 10, 5)))
+        self.assertEqual(AccountReceivable.objects.filter(status='PENDING').count(), 3)
+
+    def test_ofx_statement(self):
+        """
+        Garante a leitura de um extrato OFX em SGML (tags sem fechamento), sem baixar nada por padrão.
+        """
+        path = self.write('extrato.ofx', (
+            'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20251002120000[-3:BRT]\n<TRNAMT>150.50\n<FITID>A1\n<MEMO>PIX\n'
+            '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20251004\n<TRNAMT>-1234.56\n<FITID>A2\n<MEMO>DARF\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        ))
+
+        output = self.run_reconcile(path, '--window', '1')
+
+        self.assertIn('Linhas: 2 | conciliadas: 2 | ambíguas: 0 | sem correspondência: 0', output)
+        self.assertNotIn('Contas baixadas', output)
+        self.assertEqual(AccountReceivable.objects.filter(status='PENDING').count(), 4)
+
+    def test_amount_formats_and_zero_lines(self):
+        """
+        Garante que valores no formato americano são lidos, que formatos misturados são recusados e que linhas zeradas ficam de fora.
+        """
+        self.assertEqual(reconciliation.parse_amount('1,234.56'), Decimal('1234.56'))
+        self.assertEqual(reconciliation.parse_amount('-1.234,56'), Decimal('-1234.56'))
+        self.assertEqual(reconciliation.parse_amount('1.234.567'), Decimal('1234567'))
+        with self.assertRaises(reconciliation.StatementError):
+            reconciliation.parse_amount('1.23,456')
+
+        path = self.write('extrato.csv', 'Data;Valor\n05/10/2025;-1,234.56\n05/10/2025;0,00\n')
+        output = self.run_reconcile(path)
+        self.assertIn('Linhas: 1 | conciliadas: 1 | ambíguas: 0 | sem correspondência: 0', output)
+
+        path = self.write('misturado.csv', 'Data;Valor\n05/10/2025;1.23,456\n')
+        self.assertIn("Extrato inválido: Linha 2: Valor inválido: '1.23,456'", self.run_reconcile(path))
+
+    def test_settle_skips_accounts_paid_after_matching(self):
+        """
+        Garante que uma conta paga por outro usuário entre a conciliação e a baixa não consta como conciliada.
+        """
+        path = self.write('extrato.csv', 'Data;Valor\n03/10/2025;150,50\n05/10/2025;-1.234,56\n')
+        reconcile = reconciliation.reconcile
+
+        def reconcile_then_pay(*args):
+            matches = reconcile(*args)
+            AccountPayable.objects.filter(pk=self.payable.pk).update(status='PAID', payment_date=date(2025, 10, 1))
+            return matches
+
+        with mock.patch.object(reconciliation, 'reconcile', side_effect=reconcile_then_pay):
+            output = self.run_reconcile(path, '--settle')
+
+        self.assertIn('Contas baixadas: 1', output)
+        self.assertIn(f'Contas já baixadas por outro usuário: 1 ({self.payable.pk})', output)
+        with open(f'{path}.conciliacao.csv', encoding='utf-8') as file:
+            report = list(csv.reader(file, delimiter=';'))
+        self.assertEqual(report[1][5], 'Conciliada')
+        self.assertEqual(report[2][5:], ['Já baixada', 'Conta a Pagar', str(self.payable.pk)])
+        self.payable.refresh_from_db()
+        self.assertEqual(self.payable.payment_date, date(2025, 10, 1))
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AccountPayableViewSet, AccountReceivableViewSet
+from .views import AccountPayableViewSet, AccountReceivableViewSet, CashFlowView
 
 router = DefaultRouter()
 router.register(r'receivables', AccountReceivableViewSet, basename='account-receivable')
 router.register(r'payables', AccountPayableViewSet, basename='account-payable')
 
 urlpatterns = [
+    path('cash-flow/', CashFlowView.as_view(), name='cash-flow'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
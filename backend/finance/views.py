@@ -1,24 +1,112 @@
+from django.db.models import Value
+from django.db.models.functions import Concat
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import reports
 from .models import AccountPayable, AccountReceivable
-from .serializers import AccountPayableSerializer, AccountReceivableSerializer
+from .serializers import (
+    AccountPayableSerializer,
+    AccountReceivableSerializer,
+    BulkSettleSerializer,
+    CashFlowQuerySerializer,
+    CashFlowSerializer,
+    ReceivableAgingQuerySerializer,
+    ReceivableAgingSerializer,
+)
+from core.exports import CSVExportMixin
+from core.pagination import OptionalKeysetPagination
 
-class AccountReceivableViewSet(viewsets.ModelViewSet):
+class BulkSettleMixin:
+    """
+    Adiciona ao viewset de contas a ação `bulk-settle/`, que baixa várias contas
+    pendentes de uma vez (status PAID e data de pagamento) em um único UPDATE.
+    """
+
+    @action(detail=False, methods=['post'], url_path='bulk-settle')
+    def bulk_settle(self, request):
+        serializer = BulkSettleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested_ids = set(serializer.validated_data['ids'])
+
+        settled_ids = self.queryset.model.settle_many(requested_ids, serializer.validated_data.get('payment_date'))
+        return Response({
+            'settled': settled_ids,
+            'skipped': sorted(requested_ids - set(settled_ids)),
+        })
+
+
+class AccountReceivableViewSet(BulkSettleMixin, CSVExportMixin, viewsets.ModelViewSet):
     """
     API endpoint para Contas a Receber.
     """
     queryset = AccountReceivable.objects.select_related('customer', 'sale').all()
     serializer_class = AccountReceivableSerializer
+    pagination_class = OptionalKeysetPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['description', 'customer__name', 'sale__id']
     ordering_fields = ['due_date', 'status', 'amount', 'customer__name']
+    export_filename = 'contas_a_receber'
+    export_fields = [
+        ('ID', 'id'),
+        ('Descrição', 'description'),
+        ('Cliente', 'customer__name'),
+        ('OS', 'sale_id'),
+        ('Valor', 'amount'),
+        ('Vencimento', 'due_date'),
+        ('Pagamento', 'payment_date'),
+        ('Status', 'status'),
+    ]
 
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        """
+        Aging das contas em aberto: saldo por faixa de atraso (a vencer, 1-30,
+        31-60, 61-90 e mais de 90 dias) no total e por cliente.
+        Parâmetros opcionais: as_of (AAAA-MM-DD, padrão hoje), customer e limit.
+        """
+        params = ReceivableAgingQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        report = reports.receivables_aging(**params.validated_data)
+        return Response(ReceivableAgingSerializer(report).data)
 
-class AccountPayableViewSet(viewsets.ModelViewSet):
+
+class AccountPayableViewSet(BulkSettleMixin, CSVExportMixin, viewsets.ModelViewSet):
     """
     API endpoint para Contas a Pagar.
     """
     queryset = AccountPayable.objects.select_related('seller__user', 'sale').all()
     serializer_class = AccountPayableSerializer
+    pagination_class = OptionalKeysetPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['description', 'category', 'seller__user__first_name', 'seller__user__last_name']
-    ordering_fields = ['due_date', 'status', 'amount', 'category']
\ No newline at end of file
+    ordering_fields = ['due_date', 'status', 'amount', 'category']
+    export_filename = 'contas_a_pagar'
+    export_fields = [
+        ('ID', 'id'),
+        ('Descrição', 'description'),
+        ('Categoria', 'category'),
+        ('Vendedor', Concat('seller__user__first_name', Value(' '), 'seller__user__last_name')),
+        ('OS', 'sale_id'),
+        ('Valor', 'amount'),
+        ('Vencimento', 'due_date'),
+        ('Pagamento', 'payment_date'),
+        ('Status', 'status'),
+    ]
+
+
+class CashFlowView(APIView):
+    """
+    Fluxo de caixa projetado: contas a receber (entradas) e a pagar (saídas)
+    pendentes por período, com o saldo acumulado.
+    Parâmetros opcionais: start, end (AAAA-MM-DD) e granularity (day, week, month).
+    Por padrão, os próximos 90 dias agrupados por dia.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        params = CashFlowQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(CashFlowSerializer(reports.cash_flow(**params.validated_data)).data)
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from catalog.models import Product
+from customers.models import Customer
+from sales.models import Installment, Sale, SaleItem
+from sales.serializers import SaleCreateSerializer, SaleUpdateSerializer
+from sellers.models import Seller
+
+TABLES = ('sales_saleitem', 'sales_installment')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede as escritas em itens e parcelas por edição de venda, comparando a estratégia antiga '
+        '(apagar e recriar) com a reconciliação atual. Roda em uma transação que é desfeita ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=50, help='Quantidade de itens da venda.')
+        parser.add_argument('--installments', type=int, default=12, help='Quantidade de parcelas da venda.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.ERROR('O benchmark usa pg_stat_xact_user_tables e exige PostgreSQL.'))
+            return
+
+        self.stdout.write(f"Venda com {options['items']} itens e {options['installments']} parcelas\n")
+        self.stdout.write(f"{'Cenário':<30} {'Estratégia':<14} {'Comandos':>9} {'Linhas':>8}")
+
+        with transaction.atomic():
+            sale = self.create_sale(options['items'], options['installments'])
+            scenarios = [
+                ('Só condição de pagamento', lambda payload: payload.update(payment_condition='30/60/90')),
+                ('Preço de um item', lambda payload: payload['items'][0].update(unit_price='99.90')),
+                ('Remoção de um item', lambda payload: payload['items'].pop()),
+            ]
+            for label, change in scenarios:
+                for strategy in ('antiga', 'reconciliação'):
+                    sid = transaction.savepoint()
+                    payload = self.payload_for(sale)
+                    change(payload)
+                    statements, rows = self.measure(lambda: self.apply(strategy, sale, payload))
+                    self.stdout.write(f'{label:<30} {strategy:<14} {statements:>9} {rows:>8}')
+                    transaction.savepoint_rollback(sid)
+                    sale.refresh_from_db()
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark concluído (nenhum dado foi gravado).'))
+
+    def create_sale(self, item_count, installment_count):
+        user = User.objects.create(username='__benchmark_sale_edit__')
+        seller = Seller.objects.create(user=user)
+        customer = Customer.objects.create(name='Cliente Benchmark', person_type='F')
+        products = Product.objects.bulk_create([
+            Product(name=f'Produto Benchmark {i}', sku=f'__BENCH-{i}', sale_price=Decimal('10.00'))
+            for i in range(item_count)
+        ])
+        serializer = SaleCreateSerializer(data={
+            'customer_id': customer.pk,
+            'seller_id': seller.pk,
+            'status': Sale.SaleStatus.PENDING,
+            'items': [
+                {'product': product.pk, 'quantity': 1, 'unit_price': '10.00', 'pays_commission': True}
+                for product in products
+            ],
+            'installments': [
+                {'installment_number': n, 'amount': '1.00', 'due_date': f'2030-01-{n:02d}'}
+                for n in range(1, installment_count + 1)
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def payload_for(self, sale):
+        # Monta o payload como o frontend envia: sem o id dos itens
+        return {
+            'customer_id': sale.customer_id,
+            'seller_id': sale.seller_id,
+            'status': sale.status,
+            'payment_condition': sale.payment_condition,
+            'items': [
+                {'product': item.product_id, 'quantity': item.quantity,
+                 'unit_price': str(item.unit_price), 'pays_commission': item.pays_commission}
+                for item in sale.items.order_by('pk')
+            ],
+            'installments': [
+                {'installment_number': inst.installment_number, 'amount': str(inst.amount),
+                 'due_date': inst.due_date.isoformat()}
+                for inst in sale.installments.order_by('installment_number')
+            ],
+        }
+
+    def apply(self, strategy, sale, payload):
+        serializer = SaleUpdateSerializer(sale, data=payload)
+        serializer.is_valid(raise_exception=True)
+        if strategy == 'reconciliação':
+            serializer.save()
+            return
+
+        # Estratégia antiga: apaga todos os itens e parcelas e recria tudo
+        data = serializer.validated_data
+        for item in data['items']:
+            item.pop('id', None)
+        sale.payment_condition = data.get('payment_condition')
+        sale.save()
+        sale.items.all().delete()
+        sale.installments.all().delete()
+        SaleItem.objects.bulk_create([SaleItem(sale=sale, **item) for item in data['items']])
+        Installment.objects.bulk_create([Installment(sale=sale, **inst) for inst in data['installments']])
+
+    def measure(self, func):
+        """
+        Executa `func` e retorna (comandos de escrita, linhas escritas) nas tabelas de itens e parcelas.
+        """
+        before = self.rows_written()
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        statements = sum(
+            1 for query in queries
+            if query['sql'].split(' ', 1)[0] in ('INSERT', 'UPDATE', 'DELETE')
+            and any(table in query['sql'] for table in TABLES)
+        )
+        return statements, self.rows_written() - before
+
+    def rows_written(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) '
+                'FROM pg_stat_xact_user_tables WHERE relname = ANY(%s)',
+                [list(TABLES)],
+            )
+            return cursor.fetchone()[0]
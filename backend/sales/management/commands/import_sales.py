@@ -0,0 +1,419 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from catalog.models import Product
+from core import counters
+from customers.models import Customer
+from sales.models import Installment, Sale, SaleItem
+from sellers.models import Seller
+
+# Tabelas temporárias de carga. ON COMMIT DELETE ROWS: ficam vazias a cada lote.
+STAGING_TABLES = {
+    'import_sale_staging': (
+        'code', 'customer_id', 'seller_id', 'status', 'category', 'entry_date', 'exit_date',
+        'payment_condition', 'total_amount', 'tax_rate', 'tax_amount', 'created_at', 'completed_at',
+    ),
+    'import_item_staging': ('code', 'product_id', 'quantity', 'unit_price', 'pays_commission'),
+    'import_installment_staging': ('code', 'installment_number', 'amount', 'due_date'),
+}
+
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS import_sale_staging (
+    code varchar(50), customer_id bigint, seller_id bigint, status varchar(10), category varchar(20),
+    entry_date date, exit_date date, payment_condition varchar(100), total_amount numeric(10, 2),
+    tax_rate numeric(5, 2), tax_amount numeric(10, 2), created_at timestamptz, completed_at timestamptz
+) ON COMMIT DELETE ROWS;
+CREATE TEMP TABLE IF NOT EXISTS import_item_staging (
+    code varchar(50), product_id bigint, quantity integer, unit_price numeric(10, 2), pays_commission boolean
+) ON COMMIT DELETE ROWS;
+CREATE TEMP TABLE IF NOT EXISTS import_installment_staging (
+    code varchar(50), installment_number integer, amount numeric(10, 2), due_date date
+) ON COMMIT DELETE ROWS;
+"""
+
+# Insere as vendas novas (ON CONFLICT pelo código antigo torna o lote reexecutável)
+# e, só para elas, os itens e as parcelas, em um único comando.
+MERGE_SQL = """
+WITH inserted AS (
+    INSERT INTO {sale} (
+        legacy_code, customer_id, seller_id, status, category, entry_date, exit_date,
+        payment_condition, total_amount, tax_rate, tax_amount, created_at, completed_at
+    )
+    SELECT code, customer_id, seller_id, status, category, entry_date, exit_date,
+           payment_condition, total_amount, tax_rate, tax_amount, created_at, completed_at
+    FROM import_sale_staging
+    ON CONFLICT (legacy_code) DO NOTHING
+    RETURNING id, legacy_code, status
+), items AS (
+    INSERT INTO {item} (sale_id, product_id, quantity, unit_price, pays_commission)
+    SELECT inserted.id, s.product_id, s.quantity, s.unit_price, s.pays_commission
+    FROM import_item_staging s JOIN inserted ON inserted.legacy_code = s.code
+    RETURNING 1
+), installments AS (
+    INSERT INTO {installment} (sale_id, installment_number, amount, due_date)
+    SELECT inserted.id, s.installment_number, s.amount, s.due_date
+    FROM import_installment_staging s JOIN inserted ON inserted.legacy_code = s.code
+    RETURNING 1
+)
+SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM items), (SELECT count(*) FROM installments),
+       (SELECT array_agg(id) FROM inserted WHERE status = %s)
+"""
+
+# Limites das colunas, para rejeitar a venda antes do COPY em vez de abortar o lote
+CODE_MAX_LENGTH = Sale._meta.get_field('legacy_code').max_length
+PAYMENT_CONDITION_MAX_LENGTH = Sale._meta.get_field('payment_condition').max_length
+
+
+class SaleRejected(Exception):
+    pass
+
+
+def only_digits(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def parse_decimal(value, default=None):
+    if value in (None, ''):
+        return default
+    text = str(value).strip()
+    if ',' in text:
+        # Formato brasileiro: 1.234,56
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        raise SaleRejected(f'valor inválido: {value!r}')
+
+
+def check_decimal(code, label, value, field):
+    """ Rejeita um valor que não cabe no numeric(max_digits, decimal_places) de `field`. """
+    if value is None:
+        return value
+    # O banco arredonda para decimal_places casas; 99999999,995 já estouraria numeric(10, 2)
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(10) ** -field.decimal_places / 2
+    if not value.is_finite() or abs(value) >= limit:
+        raise SaleRejected(f'{code}: {label} fora do limite: {value}')
+    return value
+
+
+def parse_date(value):
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(str(value).strip()[:10], fmt).date()
+        except ValueError:
+            continue
+    raise SaleRejected(f'data inválida: {value!r}')
+
+
+def parse_datetime(value):
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        moment = datetime.combine(parse_date(value), datetime.min.time())
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def parse_bool(value):
+    return str(value).strip().lower() in ('1', 'true', 's', 'sim', 'yes')
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa vendas históricas (com itens e parcelas) de um arquivo JSONL ou CSV, '
+        'usando COPY para tabelas temporárias e inserção em lote. Pode ser retomado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help="Arquivo .jsonl (uma venda por linha) ou .csv separado por ';' (ver read_jsonl/read_csv).")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Formato do arquivo. Padrão: pela extensão.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Vendas por lote/transação.')
+        parser.add_argument('--checkpoint', type=str, help='Arquivo de progresso. Padrão: <arquivo>.checkpoint')
+        parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint e começa do início.')
+        parser.add_argument('--skip-rollup', action='store_true', help='Não recalcula o resumo diário de vendas ao final.')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.ERROR('A importação usa COPY e exige PostgreSQL.'))
+            return
+        if not os.path.exists(path):
+            self.stdout.write(self.style.ERROR(f'Arquivo não encontrado: {path}'))
+            return
+
+        already_done = 0 if options['restart'] else self.read_checkpoint(checkpoint_path)
+        if already_done:
+            self.stdout.write(self.style.WARNING(f'Retomando após {already_done} vendas já processadas.'))
+
+        self.stdout.write('Carregando mapas de clientes, produtos e vendedores...')
+        self.load_maps()
+
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING_SQL)
+
+        totals = {'sales': 0, 'items': 0, 'installments': 0, 'rejected': 0, 'existing': 0}
+        processed = already_done
+        started = time.monotonic()
+        chunk = []
+        with open(path, mode='r', encoding='utf-8', newline='') as file:
+            records = self.read_csv(file) if file_format == 'csv' else self.read_jsonl(file)
+            for index, record in enumerate(records):
+                if index < already_done:
+                    continue
+                chunk.append(record)
+                if len(chunk) >= options['chunk_size']:
+                    processed += self.import_chunk(chunk, totals)
+                    self.write_checkpoint(checkpoint_path, processed)
+                    self.report_progress(processed, totals, started)
+                    chunk = []
+            if chunk:
+                processed += self.import_chunk(chunk, totals)
+                self.write_checkpoint(checkpoint_path, processed)
+                self.report_progress(processed, totals, started)
+
+        counters.invalidate(Sale)
+        if totals['sales'] and not options['skip_rollup']:
+            self.stdout.write('Recalculando o resumo diário de vendas...')
+            call_command('rebuild_sales_rollup', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS('\nImportação concluída!'))
+        self.stdout.write(f"Vendas criadas: {totals['sales']}")
+        self.stdout.write(f"Itens criados: {totals['items']}")
+        self.stdout.write(f"Parcelas criadas: {totals['installments']}")
+        self.stdout.write(f"Vendas já existentes (ignoradas): {totals['existing']}")
+        self.stdout.write(f"Vendas rejeitadas: {totals['rejected']}")
+
+    # --- Leitura -----------------------------------------------------------
+
+    def read_jsonl(self, file):
+        """
+        Uma venda por linha:
+        {"code": "OS-1", "customer_code": "10", "customer_cpf_cnpj": "...", "seller": "username",
+         "status": "COMPLETED", "category": "SERVICE", "entry_date": "2021-03-01", "exit_date": "...",
+         "created_at": "...", "completed_at": "...", "payment_condition": "...", "tax_rate": "6.00",
+         "tax_amount": "...", "total_amount": "...",
+         "items": [{"sku": "...", "quantity": 1, "unit_price": "10.00", "pays_commission": true}],
+         "installments": [{"number": 1, "amount": "10.00", "due_date": "2021-04-01"}]}
+        """
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {'_error': f'linha {line_number}: JSON inválido ({e})'}
+
+    def read_csv(self, file):
+        """
+        CSV separado por ';' com a coluna `record` (sale, item ou installment) e as
+        mesmas colunas do JSONL. As linhas de item e parcela vêm logo depois da
+        venda a que pertencem (mesmo `code`).
+        """
+        sale = None
+        for row in csv.DictReader(file, delimiter=';'):
+            record = (row.get('record') or '').strip().lower()
+            if record == 'sale':
+                if sale is not None:
+                    yield sale
+                sale = {**row, 'items': [], 'installments': []}
+            elif sale is not None and row.get('code') == sale.get('code') and record in ('item', 'installment'):
+                sale['items' if record == 'item' else 'installments'].append(row)
+            else:
+                yield {'_error': f"registro '{record}' do código {row.get('code')!r} fora de uma venda"}
+        if sale is not None:
+            yield sale
+
+    # --- Resolução -----------------------------------------------------------
+
+    def load_maps(self):
+        self.customers_by_code = {}
+        self.customers_by_document = {}
+        for pk, code, document in Customer.objects.values_list('pk', 'code', 'cpf_cnpj').iterator(chunk_size=10000):
+            if code:
+                self.customers_by_code[code] = pk
+            if document:
+                self.customers_by_document[only_digits(document)] = pk
+        self.products_by_sku = dict(Product.objects.values_list('sku', 'pk').iterator(chunk_size=10000))
+        self.sellers_by_username = dict(Seller.objects.values_list('user__username', 'pk'))
+
+    def resolve(self, record):
+        """ Converte um registro lido do arquivo nas linhas das tabelas temporárias. """
+        if '_error' in record:
+            raise SaleRejected(record['_error'])
+        code = str(record.get('code') or '').strip()
+        if not code:
+            raise SaleRejected('venda sem código')
+        if len(code) > CODE_MAX_LENGTH:
+            raise SaleRejected(f'{code[:CODE_MAX_LENGTH]}...: código excede {CODE_MAX_LENGTH} caracteres')
+
+        customer_id = self.customers_by_code.get(str(record.get('customer_code') or '').strip())
+        if customer_id is None:
+            customer_id = self.customers_by_document.get(only_digits(record.get('customer_cpf_cnpj')))
+        if customer_id is None:
+            raise SaleRejected(f'{code}: cliente não encontrado')
+
+        seller_id = None
+        if record.get('seller'):
+            seller_id = self.sellers_by_username.get(record['seller'])
+            if seller_id is None:
+                raise SaleRejected(f"{code}: vendedor '{record['seller']}' não encontrado")
+
+        items = []
+        for item in record.get('items') or []:
+            product_id = self.products_by_sku.get(str(item.get('sku') or '').strip())
+            if product_id is None:
+                raise SaleRejected(f"{code}: produto '{item.get('sku')}' não encontrado")
+            quantity = parse_decimal(item.get('quantity'), Decimal('1'))
+            # Sem truncar: 2,5 viraria 2 e 0,4 viraria 0
+            if not quantity.is_finite() or quantity != quantity.to_integral_value() or quantity < 1:
+                raise SaleRejected(f"{code}: quantidade inválida {item.get('quantity')!r}")
+            quantity = int(quantity)
+            unit_price = check_decimal(
+                code, 'preço unitário', parse_decimal(item.get('unit_price'), Decimal('0')),
+                SaleItem._meta.get_field('unit_price'),
+            )
+            items.append((code, product_id, quantity, unit_price, parse_bool(item.get('pays_commission', False))))
+
+        installments = []
+        for number, installment in enumerate(record.get('installments') or [], start=1):
+            due_date = parse_date(installment.get('due_date'))
+            if due_date is None:
+                raise SaleRejected(f'{code}: parcela sem vencimento')
+            installments.append((
+                code, int(installment.get('number') or number),
+                check_decimal(
+                    code, 'valor da parcela', parse_decimal(installment.get('amount'), Decimal('0')),
+                    Installment._meta.get_field('amount'),
+                ),
+                due_date,
+            ))
+
+        status = (record.get('status') or Sale.SaleStatus.COMPLETED).upper()
+        if status not in Sale.SaleStatus.values:
+            raise SaleRejected(f'{code}: status inválido {status!r}')
+        category = (record.get('category') or Sale.SaleCategory.SERVICE).upper()
+        if category not in Sale.SaleCategory.values:
+            raise SaleRejected(f'{code}: categoria inválida {category!r}')
+        entry_date = parse_date(record.get('entry_date'))
+        exit_date = parse_date(record.get('exit_date'))
+        created_at = parse_datetime(record.get('created_at')) or parse_datetime(entry_date) or timezone.now()
+        completed_at = parse_datetime(record.get('completed_at'))
+        if status == Sale.SaleStatus.COMPLETED and completed_at is None:
+            completed_at = parse_datetime(exit_date) or created_at
+        total_amount = parse_decimal(record.get('total_amount'))
+        if total_amount is None:
+            total_amount = sum((quantity * price for _, _, quantity, price, _ in items), Decimal('0'))
+        payment_condition = (record.get('payment_condition') or '').strip() or None
+        if payment_condition and len(payment_condition) > PAYMENT_CONDITION_MAX_LENGTH:
+            raise SaleRejected(f'{code}: condição de pagamento excede {PAYMENT_CONDITION_MAX_LENGTH} caracteres')
+
+        sale = (
+            code, customer_id, seller_id, status, category, entry_date or created_at.date(), exit_date,
+            payment_condition, check_decimal(code, 'valor total', total_amount, Sale._meta.get_field('total_amount')),
+            check_decimal(code, 'alíquota', parse_decimal(record.get('tax_rate'), Decimal('0')), Sale._meta.get_field('tax_rate')),
+            check_decimal(code, 'imposto', parse_decimal(record.get('tax_amount'), Decimal('0')), Sale._meta.get_field('tax_amount')),
+            created_at, completed_at,
+        )
+        return sale, items, installments
+
+    # --- Carga -----------------------------------------------------------
+
+    def import_chunk(self, chunk, totals):
+        buffers = {table: io.StringIO() for table in STAGING_TABLES}
+        writers = {table: csv.writer(buffer) for table, buffer in buffers.items()}
+        accepted = 0
+        codes = set()
+        for record in chunk:
+            try:
+                sale, items, installments = self.resolve(record)
+                if sale[0] in codes:
+                    raise SaleRejected(f'{sale[0]}: código repetido no arquivo')
+                codes.add(sale[0])
+            except (SaleRejected, ValueError, TypeError) as e:
+                totals['rejected'] += 1
+                self.stdout.write(self.style.WARNING(f'Venda rejeitada: {e}'))
+                continue
+            writers['import_sale_staging'].writerow(self.copy_row(sale))
+            writers['import_item_staging'].writerows(self.copy_row(item) for item in items)
+            writers['import_installment_staging'].writerows(self.copy_row(inst) for inst in installments)
+            accepted += 1
+
+        if accepted:
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    for table, columns in STAGING_TABLES.items():
+                        buffers[table].seek(0)
+                        # O copy_expert vai direto ao psycopg2; o wrapper converte os erros em DatabaseError
+                        with connection.wrap_database_errors:
+                            cursor.copy_expert(
+                                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffers[table],
+                            )
+                    cursor.execute(MERGE_SQL.format(
+                        sale=Sale._meta.db_table, item=SaleItem._meta.db_table, installment=Installment._meta.db_table,
+                    ), [Sale.SaleStatus.COMPLETED])
+                    sales, items, installments, completed_ids = cursor.fetchone()
+                    # Vendas importadas já concluídas baixam o estoque como uma conclusão
+                    # normal; sem isso, editar ou reabrir uma delas moveria o estoque
+                    # contra um livro que nunca teve a saída
+                    if completed_ids:
+                        Sale.sync_stock(completed_ids)
+            except DatabaseError as e:
+                # O lote volta inteiro; as vendas contam como rejeitadas e o
+                # checkpoint avança, para a retomada não esbarrar no mesmo erro
+                totals['rejected'] += accepted
+                self.stdout.write(self.style.WARNING(
+                    f"Lote rejeitado ({', '.join(sorted(codes))}): erro ao gravar: {e}"
+                ))
+                return len(chunk)
+            totals['sales'] += sales
+            totals['items'] += items
+            totals['installments'] += installments
+            totals['existing'] += accepted - sales
+
+        return len(chunk)
+
+    @staticmethod
+    def copy_row(values):
+        # No COPY em CSV, um campo vazio sem aspas é NULL
+        return [
+            value.isoformat() if isinstance(value, (date, datetime))
+            else ('t' if value else 'f') if isinstance(value, bool)
+            else value
+            for value in values
+        ]
+
+    # --- Progresso -----------------------------------------------------------
+
+    def report_progress(self, processed, totals, started):
+        elapsed = time.monotonic() - started
+        rate = totals['sales'] / elapsed if elapsed else 0
+        self.stdout.write(f"{processed} vendas processadas ({totals['sales']} criadas, {rate:.0f} vendas/s)")
+
+    def read_checkpoint(self, checkpoint_path):
+        try:
+            with open(checkpoint_path, encoding='utf-8') as file:
+                return int(json.load(file)['processed'])
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    def write_checkpoint(self, checkpoint_path, processed):
+        # Grava em um arquivo temporário e troca de uma vez, para não corromper o checkpoint
+        temporary = f'{checkpoint_path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'processed': processed}, file)
+        os.replace(temporary, checkpoint_path)
@@ -0,0 +1,40 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from sales.models import Sale, SalesDailyRollup
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o resumo diário de vendas (SalesDailyRollup) a partir da tabela de vendas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='Data inicial (AAAA-MM-DD). Padrão: desde o início.')
+        parser.add_argument('--end', type=date.fromisoformat, help='Data final (AAAA-MM-DD). Padrão: até hoje.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+
+        # Bloqueia as atualizações incrementais enquanto o resumo é refeito
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {SalesDailyRollup._meta.db_table} IN EXCLUSIVE MODE')
+
+        rollups = SalesDailyRollup.objects.all()
+        sales = Sale.objects.annotate(day=SalesDailyRollup.date_expression())
+        if start:
+            rollups = rollups.filter(date__gte=start)
+            sales = sales.filter(day__gte=start)
+        if end:
+            rollups = rollups.filter(date__lte=end)
+            sales = sales.filter(day__lte=end)
+
+        deleted, _ = rollups.delete()
+        created = SalesDailyRollup.objects.bulk_create(
+            [SalesDailyRollup(**entry) for entry in SalesDailyRollup.entries_for(sales)],
+            batch_size=1000,
+        )
+
+        self.stdout.write(self.style.SUCCESS('Resumo diário de vendas recalculado!'))
+        self.stdout.write(f'Linhas removidas: {deleted}')
+        self.stdout.write(f'Linhas criadas: {len(created)}')
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    """
+    Vendas concluídas antes deste campo existir assumem a data de criação como
+    data de conclusão (era a data usada pelo resumo) e o resumo diário é
+    preenchido a partir das vendas existentes.
+    """
+    Sale = apps.get_model('sales', 'Sale')
+    SalesDailyRollup = apps.get_model('sales', 'SalesDailyRollup')
+
+    Sale.objects.filter(status='COMPLETED', completed_at__isnull=True).update(completed_at=F('created_at'))
+
+    rows = (
+        Sale.objects
+        .annotate(rollup_date=Case(
+            When(status='COMPLETED', then=TruncDate('completed_at')),
+            default=TruncDate('created_at'),
+        ))
+        .order_by()
+        .values('rollup_date', 'status', 'category', 'seller_id')
+        .annotate(sale_count=Count('id'), amount=Sum('total_amount'))
+    )
+    SalesDailyRollup.objects.bulk_create([
+        SalesDailyRollup(
+            date=row['rollup_date'], status=row['status'], category=row['category'],
+            seller_id=row['seller_id'], sale_count=row['sale_count'], total_amount=row['amount'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sale_category_sale_entry_date_sale_exit_date_and_more'),
+        ('sellers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Concluída em'),
+        ),
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendente'), ('COMPLETED', 'Concluída'), ('CANCELED', 'Cancelada')], max_length=10, verbose_name='Status')),
+                ('category', models.CharField(choices=[('SERVICE', 'Serviços')], max_length=20, verbose_name='Categoria')),
+                ('sale_count', models.IntegerField(default=0, verbose_name='Quantidade de Vendas')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Total')),
+                ('seller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='sellers.seller', verbose_name='Vendedor')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Vendas',
+                'verbose_name_plural': 'Resumos Diários de Vendas',
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'status', 'category', 'seller'), name='sales_rollup_unique_key', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
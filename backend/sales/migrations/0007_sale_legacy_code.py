@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_sale_completed_at_salesdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='legacy_code',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True, verbose_name='Código no Sistema Anterior'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_prefix_indexes'),
+        ('sales', '0007_sale_legacy_code'),
+        ('sellers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['customer', 'status'], include=('total_amount', 'created_at'), name='sale_customer_status_idx'),
+        ),
+    ]
@@ -1,10 +1,15 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
 from django.db import models
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import TruncDate
 from django.utils import timezone
-from catalog.models import Product
+from catalog.models import Product, StockMovement
 from customers.models import Customer
 from sellers.models import Seller
-from django.db import transaction
-from finance.models import AccountReceivable, AccountPayable # Importe os modelos financeiros
+from django.db import connection, transaction
+from finance.models import AccountReceivable, AccountPayable, FinancialPostingOutbox # Importe os modelos financeiros
 
 class Sale(models.Model):
     class SaleStatus(models.TextChoices):
@@ -33,8 +38,13 @@ class Sale(models.Model):
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Valor do Imposto")
     payment_condition = models.CharField(max_length=100, blank=True, null=True, verbose_name="Condição de Pagamento")
 
+    # --- Importação ---
+    # Número da OS no sistema anterior (ver comando import_sales)
+    legacy_code = models.CharField(max_length=50, unique=True, blank=True, null=True, verbose_name="Código no Sistema Anterior")
+
     # --- Timestamps ---
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data da Venda")
+    completed_at = models.DateTimeField(blank=True, null=True, verbose_name="Concluída em")
 
     def __str__(self):
         return f"Venda #{self.id} - {self.customer.name}"
@@ -43,63 +53,224 @@ class Sale(models.Model):
         verbose_name = "Venda"
         verbose_name_plural = "Vendas"
         ordering = ['-created_at']
+        indexes = [
+            # Resumo do cliente (customers.summary): as colunas incluídas permitem index-only scan
+            models.Index(fields=['customer', 'status'], include=['total_amount', 'created_at'], name='sale_customer_status_idx'),
+        ]
+
+    # Campos que definem em qual linha do resumo diário (SalesDailyRollup) a venda entra
+    ROLLUP_FIELDS = ('status', 'category', 'seller_id', 'total_amount', 'created_at', 'completed_at')
 
     # Dentro da classe Sale(models.Model):
     # Substitua o seu método save() existente (se houver) por este
+    @transaction.atomic
     def save(self, *args, **kwargs):
         is_new = self._state.adding
-        super().save(*args, **kwargs) # Salva a venda primeiro
+        # Lê os valores gravados ANTES de salvar; depois do save o banco já teria os novos
+        previous = None
+        if not is_new:
+            previous = Sale.objects.filter(pk=self.pk).values(*self.ROLLUP_FIELDS).first()
+        original_status = previous['status'] if previous else None
+        completing = original_status != self.SaleStatus.COMPLETED and self.status == self.SaleStatus.COMPLETED
+        reopening = original_status == self.SaleStatus.COMPLETED and self.status != self.SaleStatus.COMPLETED
 
-        # Se for uma nova venda, não há o que processar ainda
-        if is_new:
-            return
+        if completing:
+            self.completed_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'completed_at'}
+
+        super().save(*args, **kwargs)
+
+        SalesDailyRollup.apply([
+            *([SalesDailyRollup.entry_for(previous, sign=-1)] if previous else []),
+            SalesDailyRollup.entry_for(self.rollup_values(), sign=1),
+        ])
+
+        # Baixa (ou estorna) o estoque dos itens na mudança de status
+        if completing or reopening:
+            Sale.sync_stock([self.pk])
 
         # Dispara a lógica financeira APENAS quando o status muda para 'Concluída'
-        original_status = Sale.objects.get(pk=self.pk).status
-        if original_status != self.SaleStatus.COMPLETED and self.status == self.SaleStatus.COMPLETED:
-            self.generate_financial_entries()
+        if completing:
+            if settings.FINANCE_ASYNC_POSTING:
+                Sale.enqueue_financial_posting([self.pk])
+            else:
+                # Roda após o commit para enxergar os itens e parcelas gravados
+                # na mesma transação (ver BaseSaleModifySerializer._process_sale).
+                transaction.on_commit(self.generate_financial_entries)
+
+    def rollup_values(self):
+        return {field: getattr(self, field) for field in self.ROLLUP_FIELDS}
 
-    # Adicione este novo método dentro da classe Sale(models.Model)
-    @transaction.atomic
     def generate_financial_entries(self):
-        # Limpa lançamentos antigos para o caso de uma revenda
-        AccountReceivable.objects.filter(sale=self).delete()
-        AccountPayable.objects.filter(sale=self).delete()
-
-        # 1. Cria as Contas a Receber a partir das parcelas
-        for installment in self.installments.all():
-            AccountReceivable.objects.create(
-                sale=self,
-                customer=self.customer,
-                description=f"Parcela {installment.installment_number} da OS #{self.id}",
-                amount=installment.amount,
-                due_date=installment.due_date,
+        Sale.post_financial_entries([self.pk])
+
+    @classmethod
+    @transaction.atomic
+    def complete_many(cls, sale_ids):
+        """
+        Conclui várias vendas em uma única transação e gera os lançamentos
+        financeiros de todas elas de uma vez. Vendas já concluídas são ignoradas.
+        Retorna a lista de ids efetivamente concluídos.
+        """
+        # Bloqueia as linhas em ordem de pk para evitar deadlocks entre lotes concorrentes
+        ids = list(
+            cls.objects.select_for_update()
+            .filter(pk__in=sale_ids)
+            .exclude(status=cls.SaleStatus.COMPLETED)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        if not ids:
+            return []
+
+        # Tira as vendas das linhas antigas do resumo diário e soma na data de hoje
+        completed_at = timezone.now()
+        old_entries = SalesDailyRollup.entries_for(cls.objects.filter(pk__in=ids))
+        SalesDailyRollup.apply([
+            *[dict(entry, sale_count=-entry['sale_count'], total_amount=-entry['total_amount']) for entry in old_entries],
+            *[
+                dict(entry, date=timezone.localdate(completed_at), status=cls.SaleStatus.COMPLETED)
+                for entry in old_entries
+            ],
+        ])
+
+        cls.objects.filter(pk__in=ids).update(status=cls.SaleStatus.COMPLETED, completed_at=completed_at)
+        cls.sync_stock(ids)
+        if settings.FINANCE_ASYNC_POSTING:
+            cls.enqueue_financial_posting(ids)
+        else:
+            cls.post_financial_entries(ids)
+        return ids
+
+    @classmethod
+    @transaction.atomic
+    def sync_stock(cls, sale_ids, releasing=False):
+        """
+        Acerta o livro de estoque das vendas informadas: uma venda concluída
+        deve ter baixado a quantidade de cada produto dos seus itens; as demais
+        (ou todas, com `releasing`, usado na exclusão), nada. Só a diferença para
+        o que já foi lançado é movimentada, então a chamada pode ser repetida e
+        cobre conclusão, estorno e edição dos itens de uma venda concluída.
+        """
+        sale_ids = list(sale_ids)
+        pending = defaultdict(int)
+        if not releasing:
+            items = (
+                SaleItem.objects
+                .filter(sale_id__in=sale_ids, sale__status=cls.SaleStatus.COMPLETED)
+                .values_list('sale_id', 'product_id')
+                .annotate(total=Sum('quantity'))
+                .order_by()
             )
+            for sale_id, product_id, quantity in items:
+                pending[sale_id, product_id] -= quantity
+        posted = (
+            StockMovement.objects
+            .filter(sale_id__in=sale_ids)
+            .values_list('sale_id', 'product_id')
+            .annotate(total=Sum('quantity'))
+            .order_by()
+        )
+        for sale_id, product_id, quantity in posted:
+            pending[sale_id, product_id] -= quantity
+
+        StockMovement.apply([
+            StockMovement(
+                sale_id=sale_id,
+                product_id=product_id,
+                quantity=quantity,
+                kind=StockMovement.MovementKind.SALE if quantity < 0 else StockMovement.MovementKind.SALE_REVERSAL,
+            )
+            for (sale_id, product_id), quantity in sorted(pending.items())
+            if quantity
+        ])
+
+    @classmethod
+    def enqueue_financial_posting(cls, sale_ids):
+        """
+        Registra no outbox, dentro da transação corrente, as vendas cujos
+        lançamentos serão gerados pelo worker `process_financial_outbox`.
+        """
+        FinancialPostingOutbox.objects.bulk_create(
+            [FinancialPostingOutbox(sale_id=sale_id) for sale_id in sale_ids]
+        )
+
+    @classmethod
+    @transaction.atomic
+    def post_financial_entries(cls, sale_ids):
+        """
+        Gera as contas a receber (parcelas) e a pagar (comissão e imposto) das
+        vendas informadas. O número de queries é constante, independente da
+        quantidade de vendas: comissões são somadas no banco e os lançamentos
+        são gravados com bulk_create.
+        """
+        sale_ids = list(sale_ids)
+
+        # Limpa lançamentos antigos para o caso de uma revenda
+        AccountReceivable.objects.filter(sale_id__in=sale_ids).delete()
+        AccountPayable.objects.filter(sale_id__in=sale_ids).delete()
 
-        # 2. Cria a Conta a Pagar da Comissão
-        total_commission = sum(
-            (item.quantity * item.unit_price) * (self.seller.commission_rate / 100)
-            for item in self.items.filter(pays_commission=True)
+        # 1. Contas a Receber a partir das parcelas
+        installments = (
+            Installment.objects
+            .filter(sale_id__in=sale_ids)
+            .order_by('sale_id', 'installment_number')
+            .values_list('sale_id', 'sale__customer_id', 'installment_number', 'amount', 'due_date')
         )
-        if total_commission > 0:
-            AccountPayable.objects.create(
-                sale=self,
-                seller=self.seller,
-                category=AccountPayable.PayableCategory.COMMISSION,
-                description=f"Comissão para {self.seller.user.get_full_name()} da OS #{self.id}",
-                amount=total_commission,
-                due_date=self.exit_date, # Pode ser ajustado conforme a regra de negócio
+        receivables = [
+            AccountReceivable(
+                sale_id=sale_id,
+                customer_id=customer_id,
+                description=f"Parcela {number} da OS #{sale_id}",
+                amount=amount,
+                due_date=due_date,
             )
+            for sale_id, customer_id, number, amount, due_date in installments
+        ]
 
-        # 3. Cria a Conta a Pagar do Imposto
-        if self.tax_amount > 0:
-            AccountPayable.objects.create(
-                sale=self,
-                category=AccountPayable.PayableCategory.TAX,
-                description=f"Imposto (SN) referente à OS #{self.id}",
-                amount=self.tax_amount,
-                due_date=self.exit_date, # Pode ser ajustado
+        # 2 e 3. Comissão (calculada no banco) e imposto de cada venda
+        commission = Sum(
+            F('items__quantity') * F('items__unit_price') * F('seller__commission_rate') / 100,
+            filter=Q(items__pays_commission=True),
+            output_field=models.DecimalField(max_digits=16, decimal_places=4),
+        )
+        sales = (
+            cls.objects
+            .filter(pk__in=sale_ids)
+            .order_by()
+            .values(
+                'pk', 'seller_id', 'exit_date', 'tax_amount',
+                'seller__user__first_name', 'seller__user__last_name',
             )
+            .annotate(commission=commission)
+        )
+        payables = []
+        for sale in sales:
+            # Sem data de saída, o vencimento cai no dia do lançamento
+            due_date = sale['exit_date'] or timezone.localdate()
+            total_commission = (sale['commission'] or Decimal('0')).quantize(Decimal('0.01'))
+            if sale['seller_id'] and total_commission > 0:
+                seller_name = f"{sale['seller__user__first_name']} {sale['seller__user__last_name']}".strip()
+                payables.append(AccountPayable(
+                    sale_id=sale['pk'],
+                    seller_id=sale['seller_id'],
+                    category=AccountPayable.PayableCategory.COMMISSION,
+                    description=f"Comissão para {seller_name} da OS #{sale['pk']}",
+                    amount=total_commission,
+                    due_date=due_date,
+                ))
+            if sale['tax_amount'] > 0:
+                payables.append(AccountPayable(
+                    sale_id=sale['pk'],
+                    category=AccountPayable.PayableCategory.TAX,
+                    description=f"Imposto (SN) referente à OS #{sale['pk']}",
+                    amount=sale['tax_amount'],
+                    due_date=due_date,
+                ))
+
+        AccountReceivable.objects.bulk_create(receivables)
+        AccountPayable.objects.bulk_create(payables)
 
 
 class SaleItem(models.Model):
@@ -125,3 +296,114 @@ class Installment(models.Model):
         verbose_name = "Parcela"
         verbose_name_plural = "Parcelas"
         ordering = ['due_date']
+
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Totais diários de vendas por status, categoria e vendedor. É mantido de forma
+    incremental a cada mudança de uma venda (ver Sale.save e Sale.complete_many)
+    e pode ser recalculado com o comando `rebuild_sales_rollup`.
+
+    A data é a da conclusão para vendas concluídas e a da criação para as demais.
+    """
+    date = models.DateField(verbose_name="Data")
+    status = models.CharField(max_length=10, choices=Sale.SaleStatus.choices, verbose_name="Status")
+    category = models.CharField(max_length=20, choices=Sale.SaleCategory.choices, verbose_name="Categoria")
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Vendedor")
+    sale_count = models.IntegerField(default=0, verbose_name="Quantidade de Vendas")
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Valor Total")
+
+    def __str__(self):
+        return f"Resumo de {self.date} - {self.status}"
+
+    class Meta:
+        verbose_name = "Resumo Diário de Vendas"
+        verbose_name_plural = "Resumos Diários de Vendas"
+        ordering = ['date']
+        constraints = [
+            # NULLS NOT DISTINCT: vendas sem vendedor também caem em uma única linha por dia
+            models.UniqueConstraint(
+                fields=['date', 'status', 'category', 'seller'],
+                name='sales_rollup_unique_key',
+                nulls_distinct=False,
+            ),
+        ]
+
+    @staticmethod
+    def date_expression():
+        """ Expressão SQL equivalente à data usada em entry_for. """
+        return Case(
+            When(status=Sale.SaleStatus.COMPLETED, completed_at__isnull=False, then=TruncDate('completed_at')),
+            default=TruncDate('created_at'),
+        )
+
+    @staticmethod
+    def entry_for(values, sign):
+        """ Monta a contribuição de uma venda (dicionário com Sale.ROLLUP_FIELDS) para o resumo. """
+        moment = values['created_at']
+        if values['status'] == Sale.SaleStatus.COMPLETED and values['completed_at']:
+            moment = values['completed_at']
+        return {
+            'date': timezone.localdate(moment),
+            'status': values['status'],
+            'category': values['category'],
+            'seller_id': values['seller_id'],
+            'sale_count': sign,
+            'total_amount': sign * Decimal(str(values['total_amount'])),
+        }
+
+    @classmethod
+    def entries_for(cls, sales):
+        """ Agrega um queryset de vendas nas chaves do resumo, direto no banco. """
+        rows = (
+            sales
+            .annotate(rollup_date=cls.date_expression())
+            .order_by()
+            .values('rollup_date', 'status', 'category', 'seller_id')
+            .annotate(sale_count=Count('id'), total_amount=Sum('total_amount'))
+        )
+        return [
+            {
+                'date': row['rollup_date'],
+                'status': row['status'],
+                'category': row['category'],
+                'seller_id': row['seller_id'],
+                'sale_count': row['sale_count'],
+                'total_amount': row['total_amount'],
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    def apply(cls, entries):
+        """
+        Soma as contribuições (positivas ou negativas) nas linhas do resumo com
+        um único INSERT ... ON CONFLICT DO UPDATE. O incremento é feito pelo
+        banco, então atualizações concorrentes não se perdem.
+        """
+        deltas = {}
+        for entry in entries:
+            key = (entry['date'], entry['status'], entry['category'], entry['seller_id'])
+            count, amount = deltas.get(key, (0, Decimal('0')))
+            deltas[key] = (count + entry['sale_count'], amount + entry['total_amount'])
+        # Contribuições que se anulam (ex: edição que não muda valor nem data) não geram escrita
+        rows = [(*key, count, amount) for key, (count, amount) in deltas.items() if count or amount]
+        if not rows:
+            return
+        # Ordem fixa das linhas para que transações concorrentes não entrem em deadlock
+        rows.sort(key=lambda row: (row[0], row[1], row[2], row[3] or 0))
+
+        table = cls._meta.db_table
+        placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (date, status, category, seller_id, sale_count, total_amount)
+                VALUES {placeholders}
+                ON CONFLICT (date, status, category, seller_id) DO UPDATE SET
+                    sale_count = {table}.sale_count + EXCLUDED.sale_count,
+                    total_amount = {table}.total_amount + EXCLUDED.total_amount
+                """,
+                [value for row in rows for value in row],
+            )
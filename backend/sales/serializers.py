@@ -1,28 +1,82 @@
+from decimal import Decimal
+from django.db import transaction
 from rest_framework import serializers
 from .models import Sale, SaleItem, Installment # 1. Importe o Installment
+from customers.models import Customer
 from customers.serializers import CustomerSerializer
+from catalog.models import Product
 from catalog.serializers import ProductSerializer
+from sellers.models import Seller
 from sellers.serializers import SellerSerializer
 from configuration.models import CompanySettings
+from core.fieldsets import SparseFieldsetMixin
 
-class SaleItemDetailSerializer(serializers.ModelSerializer):
+class SaleItemDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     class Meta:
         model = SaleItem
         fields = ['id', 'product', 'quantity', 'unit_price', 'pays_commission']
 
+class ProductIdField(serializers.IntegerField):
+    """
+    Id do produto do item, recebido sem consultar o banco: a existência é
+    verificada em lote por SaleItemListSerializer.
+    """
+
+    def get_attribute(self, instance):
+        return instance.product_id
+
+class SaleItemListSerializer(serializers.ListSerializer):
+    """
+    Resolve os produtos de todos os itens com uma única consulta (IN), em vez
+    de uma consulta por item, e completa o preço e a comissão a partir do produto
+    quando o item não os informa.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+
+        products = (
+            Product.objects
+            .only('id', 'sale_price', 'pays_commission')
+            .in_bulk({item['product'] for item in items})
+        )
+        errors = [
+            {} if item['product'] in products
+            else {'product': [f'Pk inválido "{item["product"]}" - objeto não existe.']}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for item in items:
+            product = products[item['product']]
+            item['product'] = product
+            item.setdefault('unit_price', product.sale_price)
+            item.setdefault('pays_commission', product.pays_commission)
+        return items
+
 class SaleItemCreateSerializer(serializers.ModelSerializer):
+    # Opcional: identifica o item existente em edições (ver _sync_related)
+    id = serializers.IntegerField(required=False)
+    # Só o id: o produto é buscado em lote por SaleItemListSerializer
+    product = ProductIdField(min_value=1)
+    # Sem preço ou comissão, valem os do cadastro do produto
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    pays_commission = serializers.BooleanField(required=False)
+
     class Meta:
         model = SaleItem
-        fields = ['product', 'quantity', 'unit_price', 'pays_commission']
+        fields = ['id', 'product', 'quantity', 'unit_price', 'pays_commission']
+        list_serializer_class = SaleItemListSerializer
 
 # 2. Crie um serializer para as parcelas
-class InstallmentSerializer(serializers.ModelSerializer):
+class InstallmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Installment
         fields = ['installment_number', 'amount', 'due_date']
 
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = SaleItemDetailSerializer(many=True, read_only=True)
     installments = InstallmentSerializer(many=True, read_only=True) # 3. Mostre as parcelas
     customer = CustomerSerializer(read_only=True)
@@ -36,6 +90,34 @@ class SaleSerializer(serializers.ModelSerializer):
             'entry_date', 'exit_date', 'payment_condition', 'category' # 4. Adicione os novos campos
         ]
 
+class SaleListCustomerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = ['id', 'name']
+
+class SaleListSellerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    name = serializers.CharField(source='__str__', read_only=True)
+
+    class Meta:
+        model = Seller
+        fields = ['id', 'name']
+
+class SaleListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Versão enxuta da venda para a listagem: apenas o nome do cliente e do
+    vendedor, sem os itens. O detalhe completo continua no SaleSerializer.
+    """
+    customer = SaleListCustomerSerializer(read_only=True)
+    seller = SaleListSellerSerializer(read_only=True)
+    installments = InstallmentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Sale
+        fields = [
+            'id', 'customer', 'seller', 'status', 'category', 'total_amount', 'tax_amount',
+            'entry_date', 'exit_date', 'payment_condition', 'created_at', 'installments',
+        ]
+
 class BaseSaleModifySerializer(serializers.ModelSerializer):
     items = SaleItemCreateSerializer(many=True)
     installments = InstallmentSerializer(many=True) # 5. Receba as parcelas do frontend
@@ -50,38 +132,107 @@ class BaseSaleModifySerializer(serializers.ModelSerializer):
             'entry_date', 'exit_date', 'payment_condition', 'category' # 6. Adicione os novos campos
         ]
 
+    @transaction.atomic
     def _process_sale(self, instance, validated_data):
-        items_data = validated_data.pop('items')
-        installments_data = validated_data.pop('installments') # 7. Obtenha os dados das parcelas
-        apply_tax = validated_data.pop('apply_tax')
+        # Em PATCH os itens, parcelas e apply_tax podem não vir na requisição
+        items_data = validated_data.pop('items', None)
+        installments_data = validated_data.pop('installments', None) # 7. Obtenha os dados das parcelas
+        apply_tax = validated_data.pop('apply_tax', None)
+        is_new = instance._state.adding
 
         # Atribui os dados restantes à instância da venda
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        total_amount = sum(item['quantity'] * item['unit_price'] for item in items_data)
-        instance.total_amount = total_amount
+        if items_data is not None:
+            instance.total_amount = sum(item['quantity'] * item['unit_price'] for item in items_data)
 
-        if apply_tax:
-            settings = CompanySettings.load()
-            instance.tax_rate = settings.tax_rate
-            instance.tax_amount = total_amount * (settings.tax_rate / 100)
-        else:
-            instance.tax_rate = 0
-            instance.tax_amount = 0
+        if items_data is not None or apply_tax is not None:
+            if apply_tax is None or apply_tax:
+                settings = CompanySettings.load()
+                # Decimal(str()) cobre o valor padrão (float) de configurações recém-criadas
+                tax_rate = Decimal(str(settings.tax_rate))
+                instance.tax_rate = tax_rate
+                instance.tax_amount = instance.total_amount * (tax_rate / 100)
+            else:
+                instance.tax_rate = 0
+                instance.tax_amount = 0
 
         instance.save() # Salva a venda para ter um ID
 
-        # Apaga itens e parcelas antigas (importante para edições)
-        instance.items.all().delete()
-        instance.installments.all().delete()
+        if items_data is not None:
+            self._sync_related(
+                instance, SaleItem, [] if is_new else list(instance.items.all()), items_data,
+                natural_key='product_id', fields=['product', 'quantity', 'unit_price', 'pays_commission'],
+            )
+        if installments_data is not None:
+            self._sync_related(
+                instance, Installment, [] if is_new else list(instance.installments.all()), installments_data,
+                natural_key='installment_number', fields=['installment_number', 'amount', 'due_date'],
+            )
 
-        # Cria os novos itens e parcelas
-        SaleItem.objects.bulk_create([SaleItem(sale=instance, **item) for item in items_data])
-        Installment.objects.bulk_create([Installment(sale=instance, **inst) for inst in installments_data])
+        # Itens alterados (ou gravados agora) em venda concluída: ajusta a baixa de estoque
+        if items_data is not None and instance.status == Sale.SaleStatus.COMPLETED:
+            Sale.sync_stock([instance.pk])
 
         return instance
 
+    def _sync_related(self, instance, model, existing, incoming, natural_key, fields):
+        """
+        Reconcilia as linhas recebidas com as já gravadas, em vez de apagar e
+        recriar tudo a cada edição. Cada linha recebida é casada pelo `id`, se
+        informado, ou pela chave natural (produto do item / número da parcela).
+        Linhas iguais não são tocadas, as alteradas vão em um único bulk_update,
+        as novas em um bulk_create e só as removidas de fato são apagadas.
+        Retorna um dicionário com a quantidade de linhas criadas, alteradas e apagadas.
+        """
+        # Normaliza os dados recebidos pelo nome da coluna (ex: product -> product_id),
+        # para comparar chaves estrangeiras sem carregar os objetos relacionados.
+        attnames = {field: model._meta.get_field(field).attname for field in fields}
+        normalized = []
+        for data in incoming:
+            values = {attnames[field]: getattr(data[field], 'pk', data[field]) for field in fields if field in data}
+            if data.get('id'):
+                values['id'] = data['id']
+            normalized.append(values)
+        incoming = normalized
+
+        remaining = {row.pk: row for row in existing}
+        matches = [remaining.pop(data['id'], None) if 'id' in data else None for data in incoming]
+
+        # Segunda passada: casa pela chave natural o que não veio com id
+        by_key = {}
+        for row in remaining.values():
+            by_key.setdefault(getattr(row, natural_key), []).append(row)
+        for index, data in enumerate(incoming):
+            candidates = by_key.get(data.get(natural_key))
+            while matches[index] is None and candidates:
+                row = candidates.pop(0)
+                matches[index] = remaining.pop(row.pk, None)
+
+        to_create, to_update = [], []
+        for row, data in zip(matches, incoming):
+            values = {attname: value for attname, value in data.items() if attname != 'id'}
+            if row is None:
+                to_create.append(model(sale=instance, **values))
+                continue
+            changed = False
+            for field, value in values.items():
+                if getattr(row, field) != value:
+                    setattr(row, field, value)
+                    changed = True
+            if changed:
+                to_update.append(row)
+
+        if remaining:
+            model.objects.filter(pk__in=list(remaining)).delete()
+        if to_update:
+            model.objects.bulk_update(to_update, fields)
+        if to_create:
+            model.objects.bulk_create(to_create)
+
+        return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(remaining)}
+
 class SaleCreateSerializer(BaseSaleModifySerializer):
     def create(self, validated_data):
         # Cria uma instância de Venda e passa para o processador
@@ -98,6 +249,27 @@ class SaleStatusUpdateSerializer(serializers.ModelSerializer):
         fields = ['status']
 
 
+class SaleBulkCompleteSerializer(serializers.Serializer):
+    """
+    Recebe a lista de vendas a serem concluídas em lote.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
+
+
+class SalesSummaryQuerySerializer(serializers.Serializer):
+    """
+    Valida os parâmetros de consulta do resumo de vendas.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('A data inicial deve ser anterior à data final.')
+        return attrs
+
+
 class DashboardSaleSerializer(serializers.ModelSerializer):
     """
     Um serializer simplificado para mostrar vendas recentes no dashboard.
@@ -0,0 +1,24 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from catalog.models import Product
+from core import counters
+from customers.models import Customer
+from .models import Sale, SalesDailyRollup
+
+# Totais exibidos no dashboard (ver DashboardStatsView)
+counters.track(Customer, Product, Sale)
+
+
+@receiver(pre_delete, sender=Sale)
+def remove_sale_from_rollup(sender, instance, **kwargs):
+    # Lê os valores gravados (a instância em memória pode estar desatualizada,
+    # ex: após Sale.complete_many). Vale também para exclusões via queryset.
+    stored = Sale.objects.filter(pk=instance.pk).values(*Sale.ROLLUP_FIELDS).first()
+    if stored:
+        SalesDailyRollup.apply([SalesDailyRollup.entry_for(stored, sign=-1)])
+
+
+@receiver(pre_delete, sender=Sale)
+def return_sale_stock(sender, instance, **kwargs):
+    # Devolve ao estoque o que a venda tinha baixado
+    Sale.sync_stock([instance.pk], releasing=True)
@@ -1,3 +1,765 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from catalog.models import Product, StockMovement
+from core.testing import QueryBudgetMixin
+from customers.models import Customer
+from finance.models import AccountPayable, AccountReceivable, FinancialPostingOutbox
+from sellers.models import Seller
+from .models import Installment, Sale, SaleItem, SalesDailyRollup
+
+
+class SaleTestDataMixin:
+    """
+    Cria os dados básicos (usuário, vendedor, cliente e produto) usados nos testes de vendas.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+        seller_user = User.objects.create_user(username='vendedor', first_name='João', last_name='Silva')
+        self.seller = Seller.objects.create(user=seller_user, commission_rate=Decimal('10.00'))
+        self.customer = Customer.objects.create(name='Cliente Teste', person_type='F')
+        self.product = Product.objects.create(name='Serviço', sku='SRV-001', sale_price=Decimal('100.00'))
+
+    def create_sale(self, installments=2, **kwargs):
+        sale = Sale.objects.create(
+            customer=self.customer,
+            seller=self.seller,
+            total_amount=Decimal('300.00'),
+            tax_amount=Decimal('18.00'),
+            exit_date=date(2025, 9, 30),
+            **kwargs,
+        )
+        SaleItem.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('100.00'), pays_commission=True)
+        SaleItem.objects.create(sale=sale, product=self.product, quantity=1, unit_price=Decimal('100.00'), pays_commission=False)
+        for number in range(1, installments + 1):
+            Installment.objects.create(
+                sale=sale, installment_number=number, amount=Decimal('300.00') / installments,
+                due_date=date(2025, 9 + number, 10),
+            )
+        return sale
+
+
+class SaleBulkCompleteTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para a conclusão de vendas em lote.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('sale-bulk-complete')
+
+    def test_bulk_complete_generates_financial_entries(self):
+        """
+        Garante que as vendas são concluídas e os lançamentos financeiros gerados.
+        """
+        sales = [self.create_sale() for _ in range(3)]
+        ids = [sale.pk for sale in sales]
+
+        response = self.client.post(self.url, {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data['completed']), sorted(ids))
+        self.assertEqual(Sale.objects.filter(status=Sale.SaleStatus.COMPLETED).count(), 3)
+        self.assertEqual(FinancialPostingOutbox.objects.count(), 3)
+
+        call_command('process_financial_outbox', '--once', stdout=StringIO())
+
+        self.assertFalse(FinancialPostingOutbox.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(AccountReceivable.objects.count(), 6)
+
+        commission = AccountPayable.objects.get(sale=sales[0], category=AccountPayable.PayableCategory.COMMISSION)
+        self.assertEqual(commission.amount, Decimal('20.00'))  # 10% de 2 x 100,00
+        self.assertEqual(commission.description, f"Comissão para João Silva da OS #{sales[0].pk}")
+        tax = AccountPayable.objects.get(sale=sales[0], category=AccountPayable.PayableCategory.TAX)
+        self.assertEqual(tax.amount, Decimal('18.00'))
+
+    def test_bulk_complete_skips_already_completed(self):
+        """
+        Garante que vendas já concluídas não são reprocessadas.
+        """
+        pending = self.create_sale()
+        completed = self.create_sale(status=Sale.SaleStatus.COMPLETED)
+
+        response = self.client.post(self.url, {'ids': [pending.pk, completed.pk]}, format='json')
+
+        self.assertEqual(response.data['completed'], [pending.pk])
+        self.assertEqual(response.data['skipped'], [completed.pk])
+        self.assertFalse(AccountReceivable.objects.filter(sale=completed).exists())
+
+    def test_bulk_complete_query_count_is_constant(self):
+        """
+        Garante que o número de queries não cresce com a quantidade de vendas.
+        """
+        small_batch = [self.create_sale().pk for _ in range(2)]
+        large_batch = [self.create_sale().pk for _ in range(10)]
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, {'ids': small_batch}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, {'ids': large_batch}, format='json')
+
+        self.assertEqual(len(small), len(large))
+
+
+class SaleCompletionTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para a geração dos lançamentos ao concluir uma única venda.
+    """
+
+    def test_completing_sale_enqueues_financial_posting(self):
+        """
+        Garante que a conclusão apenas registra o pedido no outbox, sem gerar lançamentos na requisição.
+        """
+        sale = self.create_sale()
+
+        sale.status = Sale.SaleStatus.COMPLETED
+        sale.save()
+
+        self.assertTrue(FinancialPostingOutbox.objects.filter(sale=sale, processed_at__isnull=True).exists())
+        self.assertFalse(AccountReceivable.objects.filter(sale=sale).exists())
+
+    def test_outbox_worker_does_not_duplicate_entries(self):
+        """
+        Garante que eventos repetidos da mesma venda não duplicam os lançamentos.
+        """
+        sale = self.create_sale(status=Sale.SaleStatus.COMPLETED)
+        Sale.enqueue_financial_posting([sale.pk, sale.pk])
+
+        call_command('process_financial_outbox', '--once', '--batch-size=1', stdout=StringIO())
+
+        self.assertEqual(AccountReceivable.objects.filter(sale=sale).count(), 2)
+        self.assertEqual(AccountPayable.objects.filter(sale=sale).count(), 2)
+
+    @override_settings(FINANCE_ASYNC_POSTING=False)
+    def test_completing_sale_generates_financial_entries(self):
+        """
+        Garante que, sem o outbox, a mudança de status para 'Concluída' gera as contas a receber e a pagar.
+        """
+        sale = self.create_sale()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.status = Sale.SaleStatus.COMPLETED
+            sale.save()
+
+        self.assertEqual(AccountReceivable.objects.filter(sale=sale).count(), 2)
+        self.assertEqual(AccountPayable.objects.filter(sale=sale).count(), 2)
+
+
+class SaleUpdateTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para a edição de vendas (reconciliação de itens e parcelas).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.sale = self.create_sale()
+        self.url = reverse('sale-detail', kwargs={'pk': self.sale.pk})
+
+    def payload(self, **changes):
+        data = {
+            'customer_id': self.customer.pk,
+            'seller_id': self.seller.pk,
+            'status': self.sale.status,
+            'apply_tax': False,
+            'items': [
+                {'product': item.product_id, 'quantity': item.quantity,
+                 'unit_price': str(item.unit_price), 'pays_commission': item.pays_commission}
+                for item in self.sale.items.order_by('pk')
+            ],
+            'installments': [
+                {'installment_number': inst.installment_number, 'amount': str(inst.amount),
+                 'due_date': inst.due_date.isoformat()}
+                for inst in self.sale.installments.all()
+            ],
+        }
+        data.update(changes)
+        return data
+
+    def test_update_keeps_unchanged_rows(self):
+        """
+        Garante que uma edição sem mudança nos itens não apaga nem recria as linhas.
+        """
+        item_ids = set(self.sale.items.values_list('pk', flat=True))
+        installment_ids = set(self.sale.installments.values_list('pk', flat=True))
+
+        response = self.client.put(self.url, self.payload(payment_condition='30/60'), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.sale.items.values_list('pk', flat=True)), item_ids)
+        self.assertEqual(set(self.sale.installments.values_list('pk', flat=True)), installment_ids)
+
+    def test_update_changes_and_removes_only_affected_rows(self):
+        """
+        Garante que apenas o item alterado é atualizado e apenas o removido é apagado.
+        """
+        first, second = self.sale.items.order_by('pk')
+        data = self.payload()
+        data['items'] = [dict(data['items'][0], id=first.pk, quantity=5)]
+
+        response = self.client.put(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.sale.items.values_list('pk', 'quantity')), [(first.pk, 5)])
+        self.assertFalse(SaleItem.objects.filter(pk=second.pk).exists())
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.total_amount, Decimal('500.00'))
+
+    def test_partial_update_without_items(self):
+        """
+        Garante que um PATCH sem itens e parcelas mantém os existentes.
+        """
+        response = self.client.patch(self.url, {'payment_condition': 'À vista'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.sale.items.count(), 2)
+        self.assertEqual(self.sale.installments.count(), 2)
+
+
+class SaleCreateTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para a criação de vendas (resolução dos produtos em lote).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('sale-list')
+        self.products = [
+            Product.objects.create(name=f'Produto {i}', sku=f'PRD-{i}', sale_price=Decimal('10.00') + i, pays_commission=i % 2 == 0)
+            for i in range(30)
+        ]
+
+    def payload(self, items):
+        return {
+            'customer_id': self.customer.pk,
+            'seller_id': self.seller.pk,
+            'apply_tax': False,
+            'entry_date': '2025-10-01',
+            'items': items,
+            'installments': [{'installment_number': 1, 'amount': '100.00', 'due_date': '2025-10-10'}],
+        }
+
+    def test_products_are_resolved_in_a_single_query(self):
+        """
+        Garante que a quantidade de consultas ao catálogo não depende da quantidade de itens.
+        """
+        items = [{'product': product.pk, 'quantity': 1, 'unit_price': '10.00'} for product in self.products]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.payload(items), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        product_queries = [q for q in queries if q['sql'].startswith('SELECT') and 'FROM "catalog_product"' in q['sql']]
+        self.assertEqual(len(product_queries), 1)
+        self.assertEqual(SaleItem.objects.filter(sale__customer=self.customer).count(), 30)
+
+    def test_price_and_commission_default_to_the_product(self):
+        product = self.products[3]
+
+        response = self.client.post(self.url, self.payload([{'product': product.pk, 'quantity': 2}]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        item = SaleItem.objects.get(product=product)
+        self.assertEqual(item.unit_price, Decimal('13.00'))
+        self.assertFalse(item.pays_commission)
+        self.assertEqual(item.sale.total_amount, Decimal('26.00'))
+
+    def test_unknown_product_is_reported_on_the_item(self):
+        items = [{'product': self.product.pk, 'quantity': 1}, {'product': 999999, 'quantity': 1}]
+
+        response = self.client.post(self.url, self.payload(items), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('product', response.data['items'][1])
+        self.assertFalse(Sale.objects.exists())
+
+
+class SaleListTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para a listagem de vendas.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('sale-list')
+
+    def test_list_returns_lean_representation(self):
+        """
+        Garante que a listagem traz o nome do cliente e do vendedor, sem os itens.
+        """
+        self.create_sale()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sale = response.data['results'][0]
+        self.assertEqual(sale['customer'], {'id': self.customer.pk, 'name': 'Cliente Teste'})
+        self.assertEqual(sale['seller']['name'], 'João Silva')
+        self.assertEqual(len(sale['installments']), 2)
+        self.assertNotIn('items', sale)
+
+    def test_list_query_count_does_not_grow_with_page(self):
+        """
+        Garante que o número de queries não depende da quantidade de vendas na página.
+        """
+        self.create_sale()
+        with CaptureQueriesContext(connection) as one_sale:
+            self.client.get(self.url)
+
+        for _ in range(9):
+            self.create_sale()
+        with CaptureQueriesContext(connection) as full_page:
+            self.client.get(self.url)
+
+        self.assertEqual(len(one_sale), len(full_page))
+
+
+class SaleSparseFieldsetTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para os campos esparsos (?fields= / ?omit=) em vendas, inclusive aninhados.
+    """
+
+    def test_nested_fields_limit_embedded_customer(self):
+        """
+        Garante que `customer.name` devolve só o nome do cliente e não lê as demais colunas dele.
+        """
+        sale = self.create_sale()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('sale-detail', kwargs={'pk': sale.pk}), {'fields': 'id,status,customer.name,items.quantity'},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'id', 'status', 'customer', 'items'})
+        self.assertEqual(response.data['customer'], {'name': 'Cliente Teste'})
+        self.assertEqual(response.data['items'], [{'quantity': 2}, {'quantity': 1}])
+        sale_query = queries.captured_queries[0]['sql']
+        self.assertIn('"customers_customer"."name"', sale_query)
+        self.assertNotIn('"customers_customer"."observations"', sale_query)
+        self.assertNotIn('"sales_sale"."payment_condition"', sale_query)
+
+    def test_omit_nested_field_in_list(self):
+        """
+        Garante que ?omit= também alcança os serializers aninhados da listagem.
+        """
+        self.create_sale()
+
+        response = self.client.get(reverse('sale-list'), {'omit': 'installments,seller.name'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sale = response.data['results'][0]
+        self.assertNotIn('installments', sale)
+        self.assertEqual(sale['seller'], {'id': self.seller.pk})
+        self.assertEqual(sale['customer']['name'], 'Cliente Teste')
+
+
+class SalesDailyRollupTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para o resumo diário de vendas e o endpoint de resumo do dashboard.
+    """
+
+    def rollup(self):
+        return {
+            (row.status, row.sale_count, row.total_amount)
+            for row in SalesDailyRollup.objects.exclude(sale_count=0)
+        }
+
+    def test_rollup_follows_status_transitions(self):
+        """
+        Garante que o resumo acompanha a criação, a conclusão e a exclusão das vendas.
+        """
+        sale = self.create_sale()
+        other = self.create_sale()
+        self.assertEqual(self.rollup(), {('PENDING', 2, Decimal('600.00'))})
+
+        sale.status = Sale.SaleStatus.COMPLETED
+        sale.save()
+        Sale.complete_many([other.pk])
+        self.assertEqual(self.rollup(), {('COMPLETED', 2, Decimal('600.00'))})
+
+        FinancialPostingOutbox.objects.all().delete()
+        other.delete()
+        self.assertEqual(self.rollup(), {('COMPLETED', 1, Decimal('300.00'))})
+
+    def test_rebuild_matches_incremental_rollup(self):
+        """
+        Garante que o comando de recálculo chega aos mesmos totais da manutenção incremental.
+        """
+        self.create_sale()
+        Sale.complete_many([self.create_sale().pk, self.create_sale().pk])
+        incremental = self.rollup()
+
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_summary_groups_by_granularity(self):
+        """
+        Garante que o resumo agrupa as vendas concluídas por dia ou por mês.
+        """
+        Sale.complete_many([self.create_sale().pk, self.create_sale().pk])
+        url = reverse('sales-summary')
+
+        daily = self.client.get(url)
+        monthly = self.client.get(url, {'granularity': 'month'})
+
+        self.assertEqual(daily.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['total'], row['count']) for row in daily.data], [(Decimal('600.00'), 2)])
+        self.assertEqual(len(monthly.data), 1)
+        self.assertEqual(self.client.get(url, {'granularity': 'year'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardStatsTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para as estatísticas do dashboard (contadores em cache).
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('dashboard-stats')
+
+    def test_dashboard_stats(self):
+        """
+        Garante que os totais e as vendas recentes são retornados, indicando se os totais são exatos.
+        """
+        self.create_sale()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sale_count'], 1)
+        self.assertEqual(response.data['customer_count'], 1)
+        self.assertEqual(response.data['count_accuracy']['sale_count'], 'exact')
+        self.assertEqual(len(response.data['recent_sales']), 1)
+
+    def test_counters_follow_signals_without_recounting(self):
+        """
+        Garante que criar e excluir registros atualiza os contadores sem novo COUNT(*).
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Outro Cliente', person_type='J')
+            self.product.delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data['customer_count'], 2)
+        self.assertEqual(response.data['product_count'], 0)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+
+class StockLedgerTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para a baixa de estoque pelo livro de movimentações.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.product.stock_quantity = 10
+        self.product.save()
+
+    def stock(self):
+        return Product.objects.values_list('stock_quantity', flat=True).get(pk=self.product.pk)
+
+    def ledger(self):
+        return sum(StockMovement.objects.filter(product=self.product).values_list('quantity', flat=True))
+
+    def test_completion_and_cancellation_move_stock(self):
+        """
+        Garante que concluir a venda baixa os itens do estoque e que cancelá-la estorna a baixa.
+        """
+        sale = self.create_sale()
+
+        sale.status = Sale.SaleStatus.COMPLETED
+        sale.save()
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(StockMovement.objects.get(sale=sale).kind, StockMovement.MovementKind.SALE)
+
+        sale.status = Sale.SaleStatus.CANCELED
+        sale.save()
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.ledger(), 10)
+
+    def test_bulk_complete_moves_stock_once(self):
+        """
+        Garante que a conclusão em lote baixa o estoque de todas as vendas e não baixa de novo as já concluídas.
+        """
+        ids = [self.create_sale().pk for _ in range(3)]
+
+        Sale.complete_many(ids)
+        Sale.complete_many(ids)
+
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(self.ledger(), 1)
+
+    def test_editing_completed_sale_moves_only_the_difference(self):
+        """
+        Garante que alterar os itens de uma venda concluída movimenta só a diferença de quantidade.
+        """
+        sale = self.create_sale()
+        sale.status = Sale.SaleStatus.COMPLETED
+        sale.save()
+
+        response = self.client.patch(reverse('sale-detail', args=[sale.pk]), {
+            'items': [{'product': self.product.pk, 'quantity': 5, 'unit_price': '100.00', 'pays_commission': True}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(
+            list(StockMovement.objects.filter(sale=sale).order_by('pk').values_list('quantity', flat=True)),
+            [-3, -2],
+        )
+
+    def test_deleting_completed_sale_returns_stock(self):
+        sale = self.create_sale()
+        sale.status = Sale.SaleStatus.COMPLETED
+        sale.save()
+
+        sale.delete()
+
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.ledger(), 10)
+
+    def test_saving_stale_product_keeps_stock(self):
+        """
+        Garante que salvar um produto lido antes da venda não desfaz a baixa, e que um ajuste manual entra no livro.
+        """
+        stale = Product.objects.get(pk=self.product.pk)
+        sale = self.create_sale()
+        sale.status = Sale.SaleStatus.COMPLETED
+        sale.save()
+
+        stale.name = 'Serviço Renomeado'
+        stale.save()
+        self.assertEqual(self.stock(), 7)
+
+        stale.stock_quantity = 20
+        stale.save()
+        self.assertEqual(self.stock(), 20)
+        self.assertEqual(self.ledger(), 20)
+
+    def test_reconcile_stock_rebuilds_balances_from_ledger(self):
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=99)
+        out = StringIO()
+
+        call_command('reconcile_stock', '--dry-run', stdout=out)
+        self.assertEqual(self.stock(), 99)
+        self.assertIn('1 produtos com saldo divergente', out.getvalue())
+
+        call_command('reconcile_stock', stdout=out)
+        self.assertEqual(self.stock(), 10)
+
+
+class ImportSalesCommandTests(SaleTestDataMixin, APITestCase):
+    """
+    Testes para o comando import_sales (COPY em tabelas temporárias, checkpoint e livro de estoque).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.customer.code = '10'
+        self.customer.save()
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'vendas.jsonl')
+
+    def sale_record(self, code, **kwargs):
+        return {
+            'code': code, 'customer_code': '10', 'seller': 'vendedor', 'status': 'COMPLETED',
+            'entry_date': '2024-03-01', 'created_at': '2024-03-01T10:00:00', 'total_amount': '200.00',
+            'items': [{'sku': 'SRV-001', 'quantity': 2, 'unit_price': '100.00'}],
+            'installments': [{'number': 1, 'amount': '200.00', 'due_date': '2024-04-01'}],
+            **kwargs,
+        }
+
+    def write(self, records):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_sales', self.path, '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_is_idempotent_by_legacy_code(self):
+        """
+        Garante que as vendas são criadas com itens e parcelas e que reexecutar a carga não as duplica.
+        """
+        self.write([self.sale_record('OS-1'), self.sale_record('OS-2', status='PENDING')])
+
+        output = self.run_import()
+
+        self.assertIn('Vendas criadas: 2', output)
+        self.assertIn('Itens criados: 2', output)
+        self.assertIn('Parcelas criadas: 2', output)
+        sale = Sale.objects.get(legacy_code='OS-1')
+        self.assertEqual((sale.customer, sale.seller, sale.status), (self.customer, self.seller, 'COMPLETED'))
+        self.assertIsNotNone(sale.completed_at)
+
+        output = self.run_import('--restart')
+
+        self.assertIn('Vendas criadas: 0', output)
+        self.assertIn('Vendas já existentes (ignoradas): 2', output)
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(SaleItem.objects.count(), 2)
+
+    def test_invalid_records_are_rejected(self):
+        """
+        Garante que status, categoria ou cliente inválidos rejeitam só a venda correspondente.
+        """
+        self.write([
+            self.sale_record('OS-1'),
+            self.sale_record('OS-2', status='PAGA'),
+            self.sale_record('OS-3', category='PRODUTO'),
+            self.sale_record('OS-4', customer_code='999'),
+        ])
+
+        output = self.run_import()
+
+        self.assertIn('Vendas criadas: 1', output)
+        self.assertIn('Vendas rejeitadas: 3', output)
+        self.assertIn("OS-2: status inválido 'PAGA'", output)
+        self.assertIn("OS-3: categoria inválida 'PRODUTO'", output)
+        self.assertIn('OS-4: cliente não encontrado', output)
+        self.assertEqual(list(Sale.objects.values_list('legacy_code', flat=True)), ['OS-1'])
+        self.assertEqual(SalesDailyRollup.objects.filter(category='PRODUTO').count(), 0)
+
+    def test_resume_from_checkpoint(self):
+        """
+        Garante que a carga retoma depois das vendas registradas no checkpoint.
+        """
+        self.write([self.sale_record(f'OS-{number}') for number in range(1, 6)])
+        with open(f'{self.path}.checkpoint', 'w', encoding='utf-8') as file:
+            json.dump({'processed': 2}, file)
+
+        output = self.run_import()
+
+        self.assertIn('Retomando após 2 vendas já processadas.', output)
+        self.assertEqual(sorted(Sale.objects.values_list('legacy_code', flat=True)), ['OS-3', 'OS-4', 'OS-5'])
+        with open(f'{self.path}.checkpoint', encoding='utf-8') as file:
+            self.assertEqual(json.load(file), {'processed': 5})
+
+    def test_completed_imports_post_stock_movements(self):
+        """
+        Garante que vendas importadas como concluídas baixam o estoque e que reabri-las estorna só o que foi baixado.
+        """
+        self.write([self.sale_record('OS-1'), self.sale_record('OS-2', status='PENDING')])
+
+        self.run_import()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, -2)
+        sale = Sale.objects.get(legacy_code='OS-1')
+        self.assertEqual(list(sale.stock_movements.values_list('kind', 'quantity')), [('SALE', -2)])
+        self.assertFalse(StockMovement.objects.filter(sale__legacy_code='OS-2').exists())
+
+        sale.status = Sale.SaleStatus.PENDING
+        sale.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+    def test_values_that_do_not_fit_the_columns_are_rejected(self):
+        """
+        Garante que códigos e textos longos, valores fora do numeric e quantidades não inteiras rejeitam só a venda.
+        """
+        self.write([
+            self.sale_record('OS-1'),
+            self.sale_record('X' * 51),
+            self.sale_record('OS-3', payment_condition='P' * 101),
+            self.sale_record('OS-4', total_amount='100000000.00'),
+            self.sale_record('OS-5', items=[{'sku': 'SRV-001', 'quantity': -1, 'unit_price': '100.00'}]),
+            self.sale_record('OS-6', items=[{'sku': 'SRV-001', 'quantity': '2.5', 'unit_price': '100.00'}]),
+            self.sale_record('OS-7', items=[{'sku': 'SRV-001', 'quantity': '0.4', 'unit_price': '100.00'}]),
+            self.sale_record('OS-8', installments=[{'number': 1, 'amount': '1e9', 'due_date': '2024-04-01'}]),
+        ])
+
+        output = self.run_import()
+
+        self.assertIn('Vendas criadas: 1', output)
+        self.assertIn('Vendas rejeitadas: 7', output)
+        self.assertIn('código excede 50 caracteres', output)
+        self.assertIn('OS-3: condição de pagamento excede 100 caracteres', output)
+        self.assertIn('OS-4: valor total fora do limite', output)
+        self.assertIn("OS-5: quantidade inválida -1", output)
+        self.assertIn("OS-6: quantidade inválida '2.5'", output)
+        self.assertIn("OS-7: quantidade inválida '0.4'", output)
+        self.assertIn('OS-8: valor da parcela fora do limite', output)
+        self.assertEqual(list(Sale.objects.values_list('legacy_code', flat=True)), ['OS-1'])
+
+    def test_database_error_rejects_only_its_chunk(self):
+        """
+        Garante que um erro do banco rejeita o lote, avança o checkpoint e não interrompe a importação.
+        """
+        self.write([
+            self.sale_record('OS-1'),
+            self.sale_record('OS-2', installments=[{'number': 2 ** 31, 'amount': '200.00', 'due_date': '2024-04-01'}]),
+            self.sale_record('OS-3'),
+        ])
+
+        output = self.run_import()
+
+        self.assertIn('Lote rejeitado (OS-1, OS-2)', output)
+        self.assertIn('Vendas criadas: 1', output)
+        self.assertIn('Vendas rejeitadas: 2', output)
+        self.assertEqual(list(Sale.objects.values_list('legacy_code', flat=True)), ['OS-3'])
+        with open(f'{self.path}.checkpoint', encoding='utf-8') as file:
+            self.assertEqual(json.load(file), {'processed': 3})
+
+
+class SaleQueryBudgetTests(QueryBudgetMixin, SaleTestDataMixin, APITestCase):
+    """
+    Orçamento de consultas dos endpoints de vendas. Cada teste cria várias
+    vendas, então uma consulta por linha (N+1) estoura o orçamento.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for _ in range(10):
+            self.create_sale()
+
+    def test_sale_list_budget(self):
+        # COUNT + vendas (com cliente e vendedor) + parcelas
+        response = self.get_within_budget(3, reverse('sale-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sale_detail_budget(self):
+        # venda (com cliente e vendedor) + itens + produtos + parcelas
+        sale = Sale.objects.first()
+        response = self.get_within_budget(4, reverse('sale-detail', args=[sale.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_dashboard_stats_budget(self):
+        # Com o cache vazio: estimativa + COUNT de cada um dos três totais + as vendas recentes
+        response = self.get_within_budget(7, reverse('dashboard-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Com o cache preenchido, nenhuma consulta
+        self.get_within_budget(0, reverse('dashboard-stats'))
+
+    def test_responses_carry_server_timing(self):
+        response = self.client.get(reverse('sale-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries, 0 duplicated", app;dur=[\d.]+$')
@@ -1,72 +1,172 @@
 from datetime import timedelta
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Sum
-from django.db.models.functions import TruncDate
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Concat, TruncMonth, TruncWeek
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
-from .models import Sale
+from .models import Sale, SalesDailyRollup
+from core.exports import CSVExportMixin
+from core.fieldsets import SparseFieldsetViewMixin
+from core.pagination import OptionalKeysetPagination
 from customers.models import Customer
 from catalog.models import Product
+from core import counters
 from .serializers import (
     SaleSerializer, 
+    SaleListSerializer,
     SaleCreateSerializer, 
     SaleUpdateSerializer, 
+    SaleBulkCompleteSerializer,
+    SalesSummaryQuerySerializer,
     DashboardSaleSerializer
 )
 
-class SaleViewSet(viewsets.ModelViewSet):
-    queryset = Sale.objects.all().prefetch_related('items__product', 'customer', 'seller')
+class SaleViewSet(SparseFieldsetViewMixin, CSVExportMixin, viewsets.ModelViewSet):
+    queryset = Sale.objects.select_related('customer', 'seller__user').prefetch_related('items__product', 'installments')
+    pagination_class = OptionalKeysetPagination
+
+    # Colunas lidas na listagem (ver SaleListSerializer)
+    list_fields = [
+        'id', 'status', 'category', 'total_amount', 'tax_amount', 'entry_date', 'exit_date',
+        'payment_condition', 'created_at',
+        'customer', 'customer__name',
+        'seller', 'seller__user', 'seller__user__username', 'seller__user__first_name', 'seller__user__last_name',
+    ]
+
+    export_filename = 'vendas'
+    export_fields = [
+        ('OS', 'id'),
+        ('Cliente', 'customer__name'),
+        ('CPF / CNPJ', 'customer__cpf_cnpj'),
+        ('Vendedor', Concat('seller__user__first_name', Value(' '), 'seller__user__last_name')),
+        ('Status', 'status'),
+        ('Categoria', 'category'),
+        ('Entrada', 'entry_date'),
+        ('Saída', 'exit_date'),
+        ('Condição de Pagamento', 'payment_condition'),
+        ('Valor Total', 'total_amount'),
+        ('Imposto', 'tax_amount'),
+        ('Data da Venda', 'created_at'),
+    ]
+
+    def get_queryset(self):
+        if self.action == 'list':
+            return (
+                Sale.objects
+                .select_related('customer', 'seller__user')
+                .prefetch_related('installments')
+                .only(*self.list_fields)
+            )
+        return super().get_queryset()
 
     def get_serializer_class(self):
+        if self.action == 'list':
+            return SaleListSerializer
         if self.action == 'create':
             return SaleCreateSerializer
         if self.action in ['update', 'partial_update']:
             return SaleUpdateSerializer
+        if self.action == 'bulk_complete':
+            return SaleBulkCompleteSerializer
         return SaleSerializer
 
+    @action(detail=False, methods=['post'], url_path='bulk-complete')
+    def bulk_complete(self, request):
+        """
+        Conclui várias vendas de uma vez (ex: fechamento do mês), gerando os
+        lançamentos financeiros de todas elas em uma única transação.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested_ids = set(serializer.validated_data['ids'])
+
+        completed_ids = Sale.complete_many(requested_ids)
+        return Response({
+            'completed': completed_ids,
+            'skipped': sorted(requested_ids - set(completed_ids)),
+        })
+
 class SalesSummaryView(APIView):
     """
-    Fornece um resumo das vendas concluídas dos últimos 30 dias para o dashboard.
+    Fornece um resumo das vendas concluídas para o dashboard, lido do resumo
+    diário (SalesDailyRollup) em vez da tabela de vendas.
+    Parâmetros opcionais: start, end (AAAA-MM-DD) e granularity (day, week, month).
+    Por padrão, os últimos 30 dias agrupados por dia.
     """
     permission_classes = [IsAuthenticated]
 
+    truncations = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+    label_formats = {'day': '%d/%m', 'week': '%d/%m', 'month': '%m/%Y'}
+
     def get(self, request, *args, **kwargs):
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
-        
+        params = SalesSummaryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        end = params.validated_data.get('end') or timezone.localdate()
+        start = params.validated_data.get('start') or end - timedelta(days=30)
+        granularity = params.validated_data['granularity']
+
+        rollups = SalesDailyRollup.objects.filter(
+            date__range=(start, end), status=Sale.SaleStatus.COMPLETED,
+        )
+        truncation = self.truncations[granularity]
         sales_data = (
-            Sale.objects
-            .filter(created_at__gte=thirty_days_ago, status='COMPLETED')
-            .annotate(date=TruncDate('created_at'))
-            .values('date')
-            .annotate(daily_total=Sum('total_amount'))
-            .order_by('date')
+            rollups
+            .annotate(period=truncation('date') if truncation else F('date'))
+            .values('period')
+            .annotate(period_total=Sum('total_amount'), period_count=Sum('sale_count'))
+            .order_by('period')
         )
-        
-        formatted_data = [{'date': item['date'].strftime('%d/%m'), 'total': item['daily_total']} for item in sales_data]
-        
+
+        label_format = self.label_formats[granularity]
+        formatted_data = [
+            {
+                'date': item['period'].strftime(label_format),
+                'period': item['period'],
+                'total': item['period_total'],
+                'count': item['period_count'],
+            }
+            for item in sales_data
+        ]
+
         return Response(formatted_data)
 
 class DashboardStatsView(APIView):
     """
     Endpoint otimizado para fornecer as estatísticas do Dashboard.
+    Os totais vêm dos contadores em cache (core.counters) e as vendas recentes
+    ficam em cache por alguns segundos, já que a tela é atualizada por todos os usuários.
     """
     permission_classes = [IsAuthenticated]
 
+    recent_sales_cache_key = 'dashboard:recent_sales'
+    recent_sales_timeout = 15
+
     def get(self, request, *args, **kwargs):
-        customer_count = Customer.objects.count()
-        product_count = Product.objects.count()
-        sale_count = Sale.objects.count()
+        customer_count, customer_exact = counters.get_count(Customer)
+        product_count, product_exact = counters.get_count(Product)
+        sale_count, sale_exact = counters.get_count(Sale)
 
-        recent_sales = Sale.objects.select_related('customer').order_by('-created_at')[:5]
-        recent_sales_serializer = DashboardSaleSerializer(recent_sales, many=True)
+        recent_sales = cache.get(self.recent_sales_cache_key)
+        if recent_sales is None:
+            queryset = Sale.objects.select_related('customer').order_by('-created_at')[:5]
+            recent_sales = DashboardSaleSerializer(queryset, many=True).data
+            cache.set(self.recent_sales_cache_key, recent_sales, self.recent_sales_timeout)
 
         data = {
             'customer_count': customer_count,
             'product_count': product_count,
             'sale_count': sale_count,
-            'recent_sales': recent_sales_serializer.data,
+            # Indica se cada total é exato ou a estimativa do banco (tabelas muito grandes)
+            'count_accuracy': {
+                'customer_count': 'exact' if customer_exact else 'estimated',
+                'product_count': 'exact' if product_exact else 'estimated',
+                'sale_count': 'exact' if sale_exact else 'estimated',
+            },
+            'recent_sales': recent_sales,
         }
         return Response(data)
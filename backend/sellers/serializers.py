@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from core.fieldsets import SparseFieldsetMixin
 from .models import Seller
 
 # Serializer para o modelo User, focando nos dados do vendedor
-class UserSellerSerializer(serializers.ModelSerializer):
+class UserSellerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
 
 # Serializer principal para o modelo Seller
-class SellerSerializer(serializers.ModelSerializer):
+class SellerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSellerSerializer()
 
     class Meta: